@@ -1,8 +1,14 @@
 from flask import Flask
 from flask_smorest import Api
 from configs.db import db
+from configs.schema import upgrade_schema
+from helpers.serializer import FastJSONProvider
 from routes.user_route import user_blp
 from routes.notification_route import notification_blp
+from routes.metrics_route import metrics_blp
+from routes.export_route import export_blp
+from routes.template_route import template_blp
+from routes.preference_route import preference_blp
 import os
 from dotenv import load_dotenv
 
@@ -16,6 +22,7 @@ from models import (
     notification_webhook,
     notification,
     notification_dlq,
+    notification_outbox,
     provider_config,
     rate_limit,
     webhook_delivery,
@@ -25,6 +32,7 @@ load_dotenv()
 
 def create_app():
     app = Flask(__name__, static_folder="static", template_folder="templates")
+    app.json = FastJSONProvider(app)
     app.secret_key = os.getenv("FLASK_KEY")
     app.config["PROPAGATE_EXCEPTIONS"] = True
     app.config["API_TITLE"] = "Notification REST API"
@@ -40,8 +48,15 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        if os.getenv("DB_AUTO_MIGRATE", "true").lower() == "true":
+            for change in upgrade_schema(db.engine, db.metadata):
+                print(f"Schema upgrade: {change}")
     api.register_blueprint(user_blp)
     api.register_blueprint(notification_blp)
+    api.register_blueprint(metrics_blp)
+    api.register_blueprint(export_blp)
+    api.register_blueprint(template_blp)
+    api.register_blueprint(preference_blp)
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /notifications/bulk
+Compares the per-item create_notification loop against the set-based bulk_create path
+
+Usage: python -m benchmarks.bench_bulk_create --items 5000
+Requires DATABASE_URL, REDIS_URL and an existing user (see seed_test_user.py)
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from app import create_app
+from configs.db import db
+from handlers.notification_handler import NotificationHandler
+from models.notification import Notification
+
+USER_ID = "64cf1551-81b5-4199-913c-61a99e170540"
+
+
+def build_items(count: int, user_id: str, prefix: str):
+    return [
+        {
+            "user_id": user_id,
+            "message_type": "email",
+            "provider": "local",
+            "payload": json.dumps({"to": f"user{i}@example.com", "subject": "Bench", "body": f"Message {i}"}),
+            "idempotency_key": f"{prefix}-{i}",
+        }
+        for i in range(count)
+    ]
+
+
+def run_loop(handler: NotificationHandler, items):
+    for item in items:
+        handler.create_notification(
+            user_id=item["user_id"],
+            message_type=item["message_type"],
+            provider=item["provider"],
+            payload=item["payload"],
+            idempotency_key=item["idempotency_key"],
+        )
+
+
+def run_bulk(handler: NotificationHandler, items):
+    results = handler.bulk_create(items)
+    created = sum(1 for r in results if r["status"] == "created")
+    if created != len(items):
+        raise RuntimeError(f"bulk_create only created {created}/{len(items)} items")
+
+
+def cleanup(prefix: str):
+    Notification.query.filter(Notification.idempotency_key.like(f"{prefix}-%")).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def timed(label: str, fn, handler, items, prefix: str):
+    start = time.perf_counter()
+    fn(handler, items)
+    elapsed = time.perf_counter() - start
+    cleanup(prefix)
+    rate = len(items) / elapsed if elapsed else float("inf")
+    print(f"{label:<12} {len(items):>7} items  {elapsed:8.3f}s  {rate:10.1f} items/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--user-id", default=USER_ID)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        handler = NotificationHandler()
+        run_id = uuid.uuid4().hex[:8]
+
+        loop_prefix = f"bench-loop-{run_id}"
+        bulk_prefix = f"bench-bulk-{run_id}"
+        loop_rate = timed("loop", run_loop, handler, build_items(args.items, args.user_id, loop_prefix), loop_prefix)
+        bulk_rate = timed("bulk", run_bulk, handler, build_items(args.items, args.user_id, bulk_prefix), bulk_prefix)
+        print(f"speedup: {bulk_rate / loop_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
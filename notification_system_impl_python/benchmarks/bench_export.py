@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /exports/notifications
+Streams every notification of a user through ExportHandler and reports
+rows/s and compressed size for NDJSON and CSV, full rows and projected
+
+Usage: python -m benchmarks.bench_export --seed 1000000 --payload-bytes 300
+Requires DATABASE_URL, REDIS_URL and an existing user (see seed_test_user.py);
+--seed inserts that many rows for the user first (removed with --cleanup)
+"""
+
+import argparse
+import json
+import resource
+import time
+import uuid
+
+from app import create_app
+from configs.db import db
+from handlers.export_handler import ExportHandler, FORMAT_NDJSON, FORMAT_CSV
+from helpers.enums import MessageType, ProviderType, NotificationStatus
+from helpers.helpers import now_ms
+from models.notification import Notification
+from sqlalchemy import insert
+
+USER_ID = "64cf1551-81b5-4199-913c-61a99e170540"
+SEED_PREFIX = "bench-export"
+SEED_CHUNK = 10000
+EXPORT_FIELDS = ["id", "status", "provider", "attempt_count", "created_at", "sent_at"]
+
+
+def seed(count: int, user_id: str, payload_bytes: int):
+    payload = json.dumps({"to": "user@example.com", "subject": "Bench", "body": "x" * payload_bytes})
+    start_ms = now_ms() - count
+    run_id = uuid.uuid4().hex[:8]
+    for start in range(0, count, SEED_CHUNK):
+        db.session.execute(insert(Notification), [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "idempotency_key": f"{SEED_PREFIX}-{run_id}-{i}",
+                "message_type": MessageType.EMAIL,
+                "provider": ProviderType.LOCAL,
+                "status": NotificationStatus.SENT,
+                "payload": payload,
+                "attempt_count": 1,
+                "max_retries": 5,
+                "createdAt": start_ms + i,
+                "updatedAt": start_ms + i,
+                "sent_at": start_ms + i,
+            }
+            for i in range(start, min(count, start + SEED_CHUNK))
+        ])
+        db.session.commit()
+
+
+def cleanup():
+    Notification.query.filter(Notification.idempotency_key.like(f"{SEED_PREFIX}-%")).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run(label: str, handler: ExportHandler, user_id: str, fmt: str, fields, rows: int):
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in handler.export_notifications(fmt=fmt, user_id=user_id, fields=fields))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {rows:>9} rows  {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/s  {size / 1e6:8.1f} MB gz")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", default=USER_ID)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--payload-bytes", type=int, default=300)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.seed:
+            seed(args.seed, args.user_id, args.payload_bytes)
+
+        rows = Notification.query.filter(Notification.user_id == args.user_id).count()
+        handler = ExportHandler()
+        run("ndjson", handler, args.user_id, FORMAT_NDJSON, None, rows)
+        run("ndjson, fields", handler, args.user_id, FORMAT_NDJSON, EXPORT_FIELDS, rows)
+        run("csv", handler, args.user_id, FORMAT_CSV, None, rows)
+        run("csv, fields", handler, args.user_id, FORMAT_CSV, EXPORT_FIELDS, rows)
+        print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        if args.cleanup:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the shared keep-alive HTTP client used by FCM and Textbelt
+Runs a local stub HTTP/1.1 server and compares a new connection per request
+(module-level requests.post, the previous behaviour) with the pooled client
+
+Usage: python -m benchmarks.bench_http_client --requests 2000
+Against a real provider the gain is larger, since every new connection there
+also pays a TLS handshake
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from providers.http_client import get_http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # avoid Nagle / delayed-ACK stalls on the kept-alive connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps({"success": 1, "failure": 0, "results": [{"message_id": "stub"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label: str, post, url: str, count: int):
+    StubHandler.connections = 0
+    payload = {"to": "token", "notification": {"title": "Bench", "body": "Hello"}}
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        response = post(url, json=payload, timeout=10)
+        response.json()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<10} {count / elapsed:9.1f} req/s  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:6.3f}ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.3f}ms  "
+        f"connections opened {StubHandler.connections}"
+    )
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/fcm/send"
+
+    try:
+        baseline = run("per-call", requests.post, url, args.requests)
+        pooled = run("pooled", get_http_client().post, url, args.requests)
+        print(f"speedup: {pooled / baseline:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
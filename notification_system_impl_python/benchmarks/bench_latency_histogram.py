@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for LatencyRecorder.record
+Reports the cost of one recorded event next to an empty method call of the
+same arity, and the percentile error of the log-linear buckets
+
+Usage: python -m benchmarks.bench_latency_histogram --events 2000000
+Needs no database or Redis
+"""
+
+import argparse
+import random
+import timeit
+
+from helpers.latency_histogram import LatencyRecorder, PROVIDER_CALL, bucket_index, percentiles
+
+
+class _Noop:
+    def record(self, metric, provider, message_type, value_ms):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000000)
+    args = parser.parse_args()
+
+    recorder = LatencyRecorder()
+    noop = _Noop()
+    values = [int(random.lognormvariate(4.5, 1.0)) for _ in range(10000)]
+
+    for label, target in (("empty call", noop), ("record", recorder)):
+        elapsed = timeit.timeit(
+            "for value in values: target.record(metric, 'TEXTBELT', 'SMS', value)",
+            globals={"target": target, "values": values, "metric": PROVIDER_CALL},
+            number=args.events // len(values),
+        )
+        print(f"{label:<12} {elapsed / args.events * 1e9:8.1f} ns/event")
+
+    counts = {}
+    for value in values:
+        index = bucket_index(value)
+        counts[index] = counts.get(index, 0) + 1
+    exact = sorted(values)
+    for quantile, estimate in percentiles(counts, [0.5, 0.95, 0.99, 0.999]).items():
+        actual = exact[max(0, int(quantile * len(exact) + 0.999999) - 1)]
+        print(f"p{quantile * 100:g}: {estimate} ms (exact {actual} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /notifications paging
+Compares LIMIT/OFFSET against the (created_at, id) keyset cursor at a deep
+page, with full rows and with a fields= projection that skips payload and
+provider_response
+
+Usage: python -m benchmarks.bench_list_pagination --seed 10000000 --page 1000
+Requires DATABASE_URL, REDIS_URL and an existing user (see seed_test_user.py);
+--seed inserts that many rows for the user first (tagged for --cleanup)
+"""
+
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+from app import create_app
+from configs.db import db
+from handlers.notification_handler import NotificationHandler
+from helpers.enums import MessageType, ProviderType, NotificationStatus
+from helpers.helpers import encode_cursor, now_ms
+from models.notification import Notification
+from sqlalchemy import insert
+
+USER_ID = "64cf1551-81b5-4199-913c-61a99e170540"
+SEED_PREFIX = "bench-page"
+SEED_CHUNK = 10000
+LIST_FIELDS = ["id", "status", "message_type", "provider", "created_at"]
+
+
+def seed(count: int, user_id: str):
+    payload = json.dumps({"to": "user@example.com", "subject": "Bench", "body": "x" * 2000})
+    start_ms = now_ms() - count
+    run_id = uuid.uuid4().hex[:8]
+    for start in range(0, count, SEED_CHUNK):
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "idempotency_key": f"{SEED_PREFIX}-{run_id}-{i}",
+                "message_type": MessageType.EMAIL,
+                "provider": ProviderType.LOCAL,
+                "status": NotificationStatus.SENT,
+                "payload": payload,
+                "attempt_count": 1,
+                "max_retries": 5,
+                "createdAt": start_ms + i,
+                "updatedAt": start_ms + i,
+            }
+            for i in range(start, min(count, start + SEED_CHUNK))
+        ]
+        db.session.execute(insert(Notification), rows)
+        db.session.commit()
+        print(f"seeded {min(count, start + SEED_CHUNK)}/{count}", end="\r")
+    print()
+
+
+def cleanup():
+    Notification.query.filter(Notification.idempotency_key.like(f"{SEED_PREFIX}-%")).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def cursor_before(user_id: str, status, offset: int):
+    # the cursor a client holds after paging to `offset`; found once, not timed
+    if offset == 0:
+        return None
+    query = db.session.query(Notification.createdAt, Notification.id).filter(Notification.user_id == user_id)
+    if status:
+        query = query.filter(Notification.status == status)
+    row = query.order_by(Notification.createdAt.desc(), Notification.id.desc()).offset(offset - 1).limit(1).first()
+    return encode_cursor(row[0], row[1]) if row else None
+
+
+def timed(label: str, fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows, _ = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    print(f"{label:<24} {len(rows):>4} rows  median {statistics.median(samples):9.2f} ms  max {max(samples):9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", default=USER_ID)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--status", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.seed:
+            seed(args.seed, args.user_id)
+
+        handler = NotificationHandler()
+        status = NotificationStatus(args.status) if args.status else None
+        offset = (args.page - 1) * args.limit
+        cursor = cursor_before(args.user_id, status, offset)
+        print(f"page {args.page} (offset {offset}), limit {args.limit}")
+
+        def by_offset(fields=None):
+            return lambda: handler.list_notifications(args.user_id, status, args.limit, offset=offset, fields=fields)
+
+        def by_cursor(fields=None):
+            return lambda: handler.list_notifications(args.user_id, status, args.limit, cursor=cursor, fields=fields)
+
+        timed("offset, full rows", by_offset(), args.repeat)
+        timed("offset, fields", by_offset(LIST_FIELDS), args.repeat)
+        timed("cursor, full rows", by_cursor(), args.repeat)
+        timed("cursor, fields", by_cursor(LIST_FIELDS), args.repeat)
+
+        if args.cleanup:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
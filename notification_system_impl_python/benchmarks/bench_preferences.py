@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for preference evaluation on bulk requests
+Evaluates --users users (one notification each) with a cold preference
+cache, a warm one, and the one-query-per-user lookup it replaces; reports
+time and the number of SQL statements of each
+
+Usage: python -m benchmarks.bench_preferences --users 10000
+       python -m benchmarks.bench_preferences --cleanup
+Requires DATABASE_URL and REDIS_URL; seeds --users users with a preference
+each (a third opted out, a third with quiet hours, a third with a cap)
+"""
+
+import argparse
+import time
+import uuid
+from datetime import time as clock
+
+from app import create_app
+from configs.db import db
+from handlers.preference_handler import PreferenceHandler, ALLOW, DEFER, SUPPRESS
+from helpers.enums import MessageType
+from helpers.helpers import now_ms
+from models.notification_preferences import NotificationPreferences
+from models.users import Users
+from sqlalchemy import event, insert
+
+SEED_PREFIX = "bench-pref"
+SEED_CHUNK = 5000
+
+
+def seed(count: int) -> list:
+    user_ids = [f"{SEED_PREFIX}-{uuid.uuid4().hex[:24]}" for _ in range(count)]
+    now = now_ms()
+    for start in range(0, count, SEED_CHUNK):
+        chunk = user_ids[start:start + SEED_CHUNK]
+        db.session.execute(insert(Users), [
+            {"id": user_id, "email": f"{user_id}@example.com", "username": user_id, "password": "x",
+             "createdAt": now, "updatedAt": now}
+            for user_id in chunk
+        ])
+        db.session.execute(insert(NotificationPreferences), [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "channel": MessageType.EMAIL,
+                "enabled": i % 3 != 0,
+                "frequency_cap": 5 if i % 3 == 2 else None,
+                "quiet_hours_start": clock(22, 0) if i % 3 == 1 else None,
+                "quiet_hours_end": clock(7, 0) if i % 3 == 1 else None,
+                "timezone": "Europe/Berlin",
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            for i, user_id in enumerate(chunk, start)
+        ])
+        db.session.commit()
+    return user_ids
+
+
+def cleanup():
+    deleted = Users.query.filter(Users.id.like(f"{SEED_PREFIX}-%")).delete(synchronize_session=False)
+    db.session.commit()
+    print(f"deleted {deleted} benchmark users")
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def timed(counter: StatementCounter, fn):
+    counter.count = 0
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.cleanup:
+            cleanup()
+            return
+
+        user_ids = seed(args.users)
+        handler = PreferenceHandler()
+        counter = StatementCounter(db.engine)
+        now = now_ms()
+        items = [(user_id, MessageType.EMAIL, now) for user_id in user_ids]
+
+        handler.cache.invalidate(user_ids)
+        time.sleep(handler.cache.hold_ms / 1000)
+        decisions, cold_ms, cold_statements = timed(counter, lambda: handler.evaluate_many(items))
+        _, warm_ms, warm_statements = timed(counter, lambda: handler.evaluate_many(items))
+
+        def per_user():
+            for user_id in user_ids:
+                NotificationPreferences.query.filter_by(user_id=user_id, channel=MessageType.EMAIL).first()
+        _, naive_ms, naive_statements = timed(counter, per_user)
+
+        counts = {action: sum(1 for decided, _ in decisions if decided == action) for action in (ALLOW, DEFER, SUPPRESS)}
+        print(f"decisions for {args.users} users: {counts}")
+        print(f"cold cache:      {cold_ms:9.1f} ms, {cold_statements} SQL statements")
+        print(f"warm cache:      {warm_ms:9.1f} ms, {warm_statements} SQL statements")
+        print(f"query per user:  {naive_ms:9.1f} ms, {naive_statements} SQL statements")
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the per-task provider setup in send_notification
+Compares building the provider map on every task (get_provider_map, the
+previous behaviour) with the warmed per-process ProviderRegistry
+
+Usage: python -m benchmarks.bench_provider_registry --tasks 2000
+Requires DATABASE_URL; REDIS_URL is optional (the reload version check is skipped without it)
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from app import create_app
+from handlers.notification_provider_handler import NotificationHandler as ProviderHandler
+from providers.provider_factory import get_provider_map
+from providers.provider_registry import get_provider_registry
+
+
+def per_task_map():
+    get_provider_map()
+
+
+def registry_handler():
+    ProviderHandler()
+
+
+def timed(label: str, fn, tasks: int):
+    # the old path prints several lines per call; send them to /dev/null
+    # so the terminal does not dominate, but keep the cost of formatting them
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(tasks):
+            fn()
+        elapsed = time.perf_counter() - start
+    per_task_us = elapsed / tasks * 1_000_000
+    print(f"{label:<16} {tasks:>7} tasks  {elapsed:8.3f}s  {per_task_us:10.1f} us/task")
+    return per_task_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            get_provider_registry().get_providers()
+
+        before = timed("get_provider_map", per_task_map, args.tasks)
+        after = timed("registry", registry_handler, args.tasks)
+        print(f"overhead removed: {before - after:.1f} us/task ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
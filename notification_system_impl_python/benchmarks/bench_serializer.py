@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for model serialization
+Compares the old per-model to_dict + stdlib jsonify against the precompiled
+helpers.serializer plans rendered through FastJSONProvider
+
+Usage: python -m benchmarks.bench_serializer --rows 100 --repeat 2000
+Needs no database or Redis; rows are transient Notification instances
+"""
+
+import argparse
+import json
+import time
+import uuid
+from enum import Enum
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from helpers.enums import MessageType, ProviderType, NotificationStatus
+from helpers.helpers import now_ms
+from helpers.serializer import FastJSONProvider, orjson, serialize_many
+from models import (  # every model, so relationships resolve without create_app
+    users,
+    api_keys,
+    audit_logs,
+    notification_metrics,
+    notification_preferences,
+    notification_template,
+    notification_webhook,
+    notification,
+    notification_dlq,
+    notification_outbox,
+    provider_config,
+    rate_limit,
+    webhook_delivery,
+)
+from models.notification import Notification
+
+
+def legacy_to_dict(obj):
+    # the loop every model used before helpers.serializer, keyed by attribute
+    # so that renamed columns (createdAt -> created_at) resolve
+    data = {}
+    for attr in obj.__mapper__.column_attrs:
+        value = getattr(obj, attr.key)
+        if isinstance(value, Enum):
+            value = value.value
+        data[attr.columns[0].name] = value
+    return data
+
+
+def build_rows(count: int):
+    now = now_ms()
+    return [
+        Notification(
+            id=str(uuid.uuid4()),
+            user_id=str(uuid.uuid4()),
+            idempotency_key=f"bench-{i}",
+            message_type=MessageType.EMAIL,
+            provider=ProviderType.LOCAL,
+            status=NotificationStatus.SENT,
+            payload=json.dumps({"to": f"user{i}@example.com", "subject": "Bench", "body": "x" * 200}),
+            attempt_count=1,
+            max_retries=5,
+            createdAt=now,
+            updatedAt=now,
+            sent_at=now,
+            send_at=None,
+            last_attempted=now,
+            failed_at=None,
+            error_message=None,
+            provider_response='{"message_id": "bench"}',
+        )
+        for i in range(count)
+    ]
+
+
+def timed(label: str, app: Flask, fn, rows, repeat: int) -> float:
+    with app.test_request_context():
+        fn(rows)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(rows)
+        elapsed = time.perf_counter() - start
+    per_row_us = elapsed / (repeat * len(rows)) * 1e6
+    print(f"{label:<28} {per_row_us:8.2f} us/row  {repeat * len(rows) / elapsed:12,.0f} rows/s")
+    return per_row_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    legacy_app = Flask("legacy")
+    legacy_app.json = DefaultJSONProvider(legacy_app)
+    fast_app = Flask("fast")
+    fast_app.json = FastJSONProvider(fast_app)
+    rows = build_rows(args.rows)
+
+    print(f"{args.rows} rows per response, encoder: {'orjson' if orjson else 'stdlib json'}")
+    timed("to_dict only (old)", legacy_app, lambda batch: [legacy_to_dict(row) for row in batch], rows, args.repeat)
+    timed("serialize_many only", fast_app, serialize_many, rows, args.repeat)
+    old = timed("to_dict + jsonify (old)", legacy_app,
+                lambda batch: jsonify({"status": True, "data": [legacy_to_dict(row) for row in batch]}), rows, args.repeat)
+    new = timed("serialize_many + jsonify", fast_app,
+                lambda batch: jsonify({"status": True, "data": serialize_many(batch)}), rows, args.repeat)
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
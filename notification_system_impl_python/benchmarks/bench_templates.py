@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark for template rendering
+Reports renders per second for a cached CompiledTemplate (what a worker does
+per notification), for a worker that would compile on every send, and for a
+campaign rendered through render_bulk's process pool; then the payload bytes
+stored per notification with templates against pre-rendered payloads
+
+Usage: python -m benchmarks.bench_templates --renders 200000 --campaign 500000
+Needs no database or Redis
+"""
+
+import argparse
+import json
+import os
+import time
+
+from helpers.enums import MessageType
+from helpers.serializer import dumps
+from helpers.template_engine import CompiledTemplate, render_bulk
+
+SUBJECT = "{{first_name}}, your order {{order_id}} has shipped"
+BODY = (
+    "<html><body><p>Hi {{first_name}} {{last_name}},</p>"
+    "<p>Good news: order <b>{{order_id}}</b> left our warehouse today and is on its way to "
+    "{{city}}. It is expected on {{eta}}. You can follow it at any time from your account "
+    "page or with the tracking number {{tracking}}.</p>"
+    + "<p>Thank you for shopping with us. Returns are free within 30 days of delivery; start "
+      "one from the order page and print the prepaid label. Questions? Reply to this email "
+      "and our support team will get back to you within one business day.</p>" * 4
+    + "<p style=\"font-size:11px;color:#888\">You receive this email because you placed an order. "
+      "Manage notification preferences in your account settings.</p></body></html>"
+)
+
+
+def variables_for(index: int) -> dict:
+    return {
+        "to": f"customer{index}@example.com",
+        "first_name": f"Name{index}",
+        "last_name": "Example",
+        "order_id": f"ORD-{index:08d}",
+        "city": "Berlin",
+        "eta": "Thursday",
+        "tracking": f"1Z{index:016d}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=200000)
+    parser.add_argument("--campaign", type=int, default=500000)
+    args = parser.parse_args()
+
+    compiled = CompiledTemplate("t1", 1, "order_shipped", MessageType.EMAIL, SUBJECT, BODY)
+    # worker input: the stored variables payload, decoded per notification
+    stored = [dumps(variables_for(index)).decode() for index in range(1000)]
+
+    start = time.perf_counter()
+    for index in range(args.renders):
+        compiled.render_json(json.loads(stored[index % 1000]))
+    cached = args.renders / (time.perf_counter() - start)
+
+    uncached_renders = max(1, args.renders // 10)
+    start = time.perf_counter()
+    for index in range(uncached_renders):
+        CompiledTemplate("t1", 1, "order_shipped", MessageType.EMAIL, SUBJECT, BODY).render_json(
+            json.loads(stored[index % 1000])
+        )
+    uncached = uncached_renders / (time.perf_counter() - start)
+
+    campaign = [variables_for(index) for index in range(args.campaign)]
+    os.environ["TEMPLATE_POOL_MIN_ITEMS"] = str(args.campaign + 1)
+    start = time.perf_counter()
+    inline = render_bulk(compiled, campaign)
+    inline_rate = args.campaign / (time.perf_counter() - start)
+    os.environ["TEMPLATE_POOL_MIN_ITEMS"] = "1"
+    os.environ.setdefault("TEMPLATE_RENDER_PROCESSES", str(max(2, os.cpu_count() or 1)))
+    render_bulk(compiled, campaign[:1000])  # start the pool processes
+    start = time.perf_counter()
+    pooled = render_bulk(compiled, campaign)
+    pooled_rate = args.campaign / (time.perf_counter() - start)
+    assert pooled == inline
+
+    print(f"cached render + JSON:     {cached:12,.0f} renders/s")
+    print(f"compile on every render:  {uncached:12,.0f} renders/s")
+    print(f"campaign inline:          {inline_rate:12,.0f} renders/s ({args.campaign} variable sets)")
+    print(
+        f"campaign process pool:    {pooled_rate:12,.0f} renders/s "
+        f"({os.environ['TEMPLATE_RENDER_PROCESSES']} processes on {os.cpu_count()} CPUs)"
+    )
+
+    templated_bytes = sum(len(payload.encode()) for payload in stored)
+    rendered_bytes = sum(len(compiled.render_json(json.loads(payload)).encode()) for payload in stored)
+    print(
+        f"payload per notification: {rendered_bytes / 1000:8.0f} B pre-rendered, "
+        f"{templated_bytes / 1000:8.0f} B with a template "
+        f"({100 - templated_bytes * 100 / rendered_bytes:.1f}% saved)"
+    )
+
+
+if __name__ == "__main__":
+    main()
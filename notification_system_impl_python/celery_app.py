@@ -34,11 +34,25 @@ celery_app.conf.beat_schedule = {
         'task': 'workers.tasks.cleanup_old_retries',
         'schedule': crontab(hour=2, minute=0),
     },
+    'flush-rate-limits': {
+        'task': 'workers.tasks.flush_rate_limits',
+        'schedule': 10.0,
+    },
+    'rollup-delivery-metrics': {
+        'task': 'workers.tasks.rollup_delivery_metrics',
+        'schedule': 30.0,
+    },
     'process-dlq': {
         'task': 'workers.tasks.process_dlq_notifications',
         'schedule': 300.0,
     },
 }
 
+if os.getenv('NOTIFICATION_CREATE_MODE', 'redis').lower() == 'outbox':
+    celery_app.conf.beat_schedule['relay-outbox'] = {
+        'task': 'workers.tasks.relay_outbox',
+        'schedule': 5.0,
+    }
+
 if __name__ == '__main__':
     celery_app.start()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Schema upgrades for existing databases
+db.create_all() only creates missing tables, so columns and indexes that
+models add to an existing table are applied here: nullable columns with
+ALTER TABLE ... ADD COLUMN (foreign key included) and every model index
+with CREATE INDEX. Each step is skipped when the object already exists, so
+create_app() runs this on every start (DB_AUTO_MIGRATE=false turns that off,
+e.g. to build indexes of a large table in a maintenance window instead)
+
+Usage: python -m configs.schema
+"""
+
+from typing import Callable, List
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+
+def _column_ddl(column, dialect) -> str:
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        ddl += f" REFERENCES {target.table.name} ({target.name})"
+        if foreign_key.ondelete:
+            ddl += f" ON DELETE {foreign_key.ondelete}"
+        if foreign_key.onupdate:
+            ddl += f" ON UPDATE {foreign_key.onupdate}"
+    return ddl
+
+
+def _apply(engine, statement, applied: Callable[[], bool]) -> None:
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(statement) if isinstance(statement, str) else statement)
+    except Exception:
+        # another process starting at the same time may have applied it first
+        if not applied():
+            raise
+
+
+def upgrade_schema(engine, metadata) -> List[str]:
+    """Add the columns and indexes of `metadata` missing from existing tables; returns what was applied"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    changes = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(
+                    f"cannot add NOT NULL column {table.name}.{column.name} without a server default"
+                )
+            _apply(
+                engine,
+                f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, engine.dialect)}",
+                lambda table=table, column=column: column.name in {
+                    found["name"] for found in inspect(engine).get_columns(table.name)
+                },
+            )
+            changes.append(f"added column {table.name}.{column.name}")
+
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in indexes:
+                continue
+            try:
+                _apply(
+                    engine,
+                    CreateIndex(index),
+                    lambda table=table, index=index: index.name in {
+                        found["name"] for found in inspect(engine).get_indexes(table.name)
+                    },
+                )
+            except Exception as e:
+                if not index.unique:
+                    raise
+                columns = ", ".join(column.name for column in index.columns)
+                raise RuntimeError(
+                    f"cannot create unique index {index.name}: {table.name} has duplicate ({columns}) rows, "
+                    f"merge them and restart ({getattr(e, 'orig', e)})"
+                )
+            changes.append(f"created index {index.name} on {table.name}")
+    return changes
+
+
+if __name__ == "__main__":
+    import os
+    os.environ["DB_AUTO_MIGRATE"] = "false"
+    from app import create_app
+    from configs.db import db
+
+    app = create_app()
+    with app.app_context():
+        applied = upgrade_schema(db.engine, db.metadata)
+    print("\n".join(applied) if applied else "schema is up to date")
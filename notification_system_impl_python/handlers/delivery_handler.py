@@ -0,0 +1,399 @@
+from configs.db import db
+from handlers.dlq_handler import DLQHandler
+from handlers.notification_provider_handler import NotificationHandler as ProviderHandler
+from handlers.preference_handler import PreferenceHandler, ALLOW, DEFER, SUPPRESS
+from handlers.retry_handlers import RetryHandler
+from handlers.template_handler import TemplateHandler
+from helpers.custom_exceptions import DeliveryHandlerException, PreferenceHandlerException, TemplateHandlerException, TemplateRenderException
+from helpers.enums import NotificationStatus
+from helpers.helpers import now_ms
+from helpers.instrumentation import DELIVERIES, db_commit_timer
+from helpers.delivery_metrics import get_delivery_metrics
+from helpers.latency_histogram import get_latency_recorder, CREATE_TO_SEND, QUEUE_WAIT, PROVIDER_CALL
+from helpers.notification_cache import get_notification_cache
+from models.notification import Notification
+from sqlalchemy import update
+from typing import Dict, List, Tuple
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryHandler:
+    """
+    Sends notifications in batches: one SELECT ... WHERE id IN (...) to load
+    them, a conditional UPDATE to claim them, one send per provider group
+    (routed with failover, see ProviderRouter) and one bulk UPDATE by
+    primary key to write every status change and the provider used back.
+
+    A notification can reach several workers (a retry backfill or a stream
+    reclaim queues it again), so the claim only takes rows that are still
+    PENDING with the attempt count the worker loaded. Rows another worker
+    claimed less than DELIVERY_CLAIM_LEASE_SECONDS ago are deferred to the
+    end of that lease on the delay queue rather than dropped, so a worker
+    that dies mid-send does not strand them.
+    """
+
+    def __init__(self, provider_handler: ProviderHandler = None):
+        self.db = db
+        if not self.db:
+            raise DeliveryHandlerException("database not initialized")
+        self._provider_handler = provider_handler
+        self.retry_handler = RetryHandler()
+        self.cache = get_notification_cache()
+        self.metrics = get_delivery_metrics()
+        self.latency = get_latency_recorder()
+        self.templates = TemplateHandler()
+        self.preferences = PreferenceHandler()
+        self.claim_lease_ms = int(os.getenv("DELIVERY_CLAIM_LEASE_SECONDS", "300")) * 1000
+
+    @property
+    def provider_handler(self) -> ProviderHandler:
+        # only needed by send(); the asyncio worker claims and records without it
+        if self._provider_handler is None:
+            self._provider_handler = ProviderHandler()
+        return self._provider_handler
+
+    def deliver(self, notification_ids: List[str]) -> Dict[str, dict]:
+        """
+        Deliver the given notifications and return an outcome per id with a
+        status of success, failed, deferred, suppressed, skipped or missing.
+        """
+        outcomes = {
+            notification_id: {"status": "missing", "message": "notification not found"}
+            for notification_id in notification_ids
+        }
+        notifications = self.claim(notification_ids, outcomes)
+        if notifications:
+            self.record(self.send(notifications), outcomes)
+        return outcomes
+
+    def claim(self, notification_ids: List[str], outcomes: Dict[str, dict]) -> List[Notification]:
+        session = self.db.session
+        try:
+            rows = Notification.query.filter(Notification.id.in_(notification_ids)).all()
+            lease_cutoff = now_ms() - self.claim_lease_ms
+            sendable = []
+            leased: Dict[str, int] = {}
+            for notification in rows:
+                # detach so the commits below do not expire and reload every row
+                session.expunge(notification)
+                if notification.status != NotificationStatus.PENDING:
+                    outcomes[notification.id] = {
+                        "status": "skipped",
+                        "message": f"already {notification.status.value}",
+                    }
+                    continue
+                if self._in_flight(notification, lease_cutoff):
+                    leased[notification.id] = notification.last_attempted + self.claim_lease_ms
+                    continue
+                sendable.append(notification)
+
+            if not sendable:
+                self._await_leases(leased, outcomes)
+                return []
+
+            sendable, deferred, suppressed = self.check_preferences(sendable, outcomes)
+            if deferred:
+                session.execute(update(Notification), [
+                    {"id": notification_id, "send_at": send_at} for notification_id, send_at in deferred.items()
+                ])
+            if suppressed:
+                session.execute(update(Notification), [
+                    {"id": notification_id, "status": NotificationStatus.CANCELLED, "failed_at": now_ms(), "error_message": reason}
+                    for notification_id, reason in suppressed.items()
+                ])
+            attempted_at = now_ms()
+            if sendable:
+                claimed = self._claim_attempts(sendable, attempted_at)
+                for notification in sendable:
+                    if notification.id not in claimed:
+                        leased[notification.id] = attempted_at + self.claim_lease_ms
+                sendable = [notification for notification in sendable if notification.id in claimed]
+            with db_commit_timer("DeliveryHandler.claim"):
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            raise DeliveryHandlerException(f"failed to claim notifications: {e}")
+
+        self._await_leases(leased, outcomes)
+        if deferred or suppressed:
+            self.cache.invalidate([*deferred, *suppressed])
+        if deferred:
+            try:
+                self.retry_handler.delay_queue.schedule_many(deferred)
+            except Exception as e:
+                # the pending rows keep their new send_at for the retry backfill
+                logger.warning(f"failed to reschedule notifications deferred by quiet hours: {e}")
+
+        for notification in sendable:
+            notification.attempt_count += 1
+            notification.last_attempted = attempted_at
+        return self.render(sendable, outcomes)
+
+    @staticmethod
+    def _in_flight(notification: Notification, lease_cutoff: int) -> bool:
+        # claimed since it was last (re)scheduled, and recently enough that the worker may still be sending it
+        last_attempted = notification.last_attempted
+        return (
+            last_attempted is not None
+            and last_attempted > lease_cutoff
+            and last_attempted >= (notification.send_at or 0)
+        )
+
+    def _await_leases(self, leased: Dict[str, int], outcomes: Dict[str, dict]) -> None:
+        """
+        Queue notifications another worker holds for when its lease runs
+        out: the queue entry that brought them here is acknowledged, and a
+        worker that crashed mid-send would otherwise leave them PENDING for
+        good. A retry the holder already scheduled keeps its time.
+        """
+        if not leased:
+            return
+        for notification_id, lease_end in leased.items():
+            outcomes[notification_id] = {
+                "status": "deferred",
+                "message": "being sent by another worker",
+                "retry_at": lease_end,
+            }
+        try:
+            self.retry_handler.delay_queue.schedule_many(leased, nx=True)
+        except Exception as e:
+            # the retry backfill picks up rows whose lease ran out
+            logger.warning(f"failed to queue notifications held by another worker: {e}")
+
+    def _claim_attempts(self, notifications: List[Notification], attempted_at: int) -> set:
+        """
+        Count the attempt of every notification whose row still has the
+        status and attempt count it was loaded with; one UPDATE ... RETURNING
+        per distinct attempt count (usually one). A worker that lost the race
+        gets no row back for that notification.
+        """
+        by_attempt: Dict[int, List[str]] = {}
+        for notification in notifications:
+            by_attempt.setdefault(notification.attempt_count, []).append(notification.id)
+        claimed = set()
+        for seen, notification_ids in by_attempt.items():
+            result = self.db.session.execute(
+                update(Notification)
+                .where(
+                    Notification.id.in_(notification_ids),
+                    Notification.status == NotificationStatus.PENDING,
+                    Notification.attempt_count == seen,
+                )
+                .values(attempt_count=Notification.attempt_count + 1, last_attempted=attempted_at)
+                .returning(Notification.id)
+                .execution_options(synchronize_session=False)
+            )
+            claimed.update(result.scalars())
+        return claimed
+
+    def check_preferences(
+        self, notifications: List[Notification], outcomes: Dict[str, dict]
+    ) -> Tuple[List[Notification], Dict[str, int], Dict[str, str]]:
+        """
+        Re-check the users' preferences right before sending, as they may
+        have changed since the notification was queued. Returns the
+        notifications to send, the new send_at of those inside quiet hours
+        and the reason for those to cancel (opted out or over the frequency
+        cap, which counts each notification once, on its first attempt).
+        """
+        now = now_ms()
+        items = [(notification.user_id, notification.message_type, now) for notification in notifications]
+        try:
+            preferences = self.preferences.load_many(notification.user_id for notification in notifications)
+            decisions = self.preferences.evaluate_many(items, preferences)
+            allowed = [
+                (notification.id, *item)
+                for notification, item, (action, _) in zip(notifications, items, decisions)
+                if action == ALLOW
+            ]
+            capped = iter(self.preferences.consume_frequency_caps(allowed, preferences))
+        except PreferenceHandlerException as e:
+            raise DeliveryHandlerException(str(e))
+
+        sendable = []
+        deferred: Dict[str, int] = {}
+        suppressed: Dict[str, str] = {}
+        for notification, (action, value) in zip(notifications, decisions):
+            if action == ALLOW:
+                value = next(capped)
+                if value is None:
+                    sendable.append(notification)
+                    continue
+                action = SUPPRESS
+            if action == DEFER:
+                deferred[notification.id] = value
+                outcomes[notification.id] = {"status": "deferred", "message": "quiet hours", "retry_at": value}
+            else:
+                suppressed[notification.id] = value
+                outcomes[notification.id] = {"status": "suppressed", "message": value}
+        return sendable, deferred, suppressed
+
+    def render(self, notifications: List[Notification], outcomes: Dict[str, dict]) -> List[Notification]:
+        """
+        Replace the variables payload of templated notifications with the
+        rendered one (on the detached instances only, the row keeps the
+        variables). A notification that cannot render goes to the DLQ, as
+        retrying would fail the same way.
+        """
+        templated = [notification for notification in notifications if notification.template_id]
+        if not templated:
+            return notifications
+        try:
+            compiled = self.templates.compiled_by_id(notification.template_id for notification in templated)
+        except TemplateHandlerException as e:
+            raise DeliveryHandlerException(str(e))
+
+        failed = {}
+        for notification in templated:
+            template = compiled.get(notification.template_id)
+            try:
+                if template is None:
+                    raise TemplateRenderException(f"template {notification.template_id} not found")
+                notification.payload = template.render_json(json.loads(notification.payload))
+            except (TemplateRenderException, ValueError) as e:
+                failed[notification.id] = str(e)
+        if not failed:
+            return notifications
+
+        dlq_handler = DLQHandler()
+        for notification_id, error_message in failed.items():
+            dlq_handler.move_to_dlq(notification_id=notification_id, reason="template_render_failed", error_details=error_message)
+            outcomes[notification_id] = {"status": "failed", "message": error_message, "will_retry": False}
+        return [notification for notification in notifications if notification.id not in failed]
+
+    def send(self, notifications: List[Notification]) -> List[Tuple[Notification, dict]]:
+        return list(zip(notifications, self.provider_handler.send_routed(notifications)))
+
+    def record(self, results: List[Tuple[Notification, dict]], outcomes: Dict[str, dict]) -> None:
+        rows = []
+        retries = []
+        exhausted = []
+        observed = []
+        delivered: Dict[Tuple[str, str], int] = {}
+        sent_at = now_ms()
+
+        for notification, result in results:
+            # the router may have failed over to another provider of the channel
+            provider = result.get("provider", notification.provider)
+            if result.get("success"):
+                rows.append({
+                    "id": notification.id,
+                    "provider": provider,
+                    "status": NotificationStatus.SENT,
+                    "attempt_count": notification.attempt_count,
+                    "sent_at": sent_at,
+                    "send_at": notification.send_at,
+                    "error_message": notification.error_message,
+                    "provider_response": json.dumps(result.get("response", {})),
+                })
+                outcomes[notification.id] = {"status": "success", "provider": provider.value}
+                observed.append((provider, notification, "sent"))
+                delivered[(provider.value, "sent")] = delivered.get((provider.value, "sent"), 0) + 1
+                continue
+
+            if result.get("deferred"):
+                # nothing was sent (open circuit), so hand back the attempt claim() counted
+                rows.append({
+                    "id": notification.id,
+                    "provider": notification.provider,
+                    "status": NotificationStatus.PENDING,
+                    "attempt_count": notification.attempt_count - 1,
+                    "sent_at": notification.sent_at,
+                    "send_at": result["retry_at"],
+                    "error_message": notification.error_message,
+                    "provider_response": notification.provider_response,
+                })
+                retries.append({
+                    "notification_id": notification.id,
+                    "attempt": notification.attempt_count - 1,
+                    "retry_at": result["retry_at"],
+                })
+                observed.append((notification.provider, notification, "pending"))
+                delivered[(provider.value, "deferred")] = delivered.get((provider.value, "deferred"), 0) + 1
+                outcomes[notification.id] = {
+                    "status": "deferred",
+                    "message": result.get("message"),
+                    "retry_at": result["retry_at"],
+                }
+                continue
+
+            error_message = result.get("message", "Unknown error")
+            # a permanent failure would fail the same way on every retry
+            if result.get("permanent") or notification.attempt_count >= notification.max_retries:
+                reason = "permanent_failure" if result.get("permanent") else "max_retries_exceeded"
+                exhausted.append((notification.id, reason, error_message))
+                observed.append((provider, notification, "failed"))
+                delivered[(provider.value, "failed")] = delivered.get((provider.value, "failed"), 0) + 1
+                outcomes[notification.id] = {"status": "failed", "message": error_message, "will_retry": False}
+                continue
+
+            retry_at = self.retry_handler.next_retry_at(notification.attempt_count)
+            rows.append({
+                "id": notification.id,
+                "provider": provider,
+                "status": NotificationStatus.PENDING,
+                "attempt_count": notification.attempt_count,
+                "sent_at": notification.sent_at,
+                "send_at": retry_at,
+                "error_message": error_message,
+                "provider_response": notification.provider_response,
+            })
+            retries.append({
+                "notification_id": notification.id,
+                "attempt": notification.attempt_count,
+                "retry_at": retry_at,
+            })
+            outcomes[notification.id] = {"status": "failed", "message": error_message, "will_retry": True}
+            observed.append((provider, notification, "pending"))
+            delivered[(provider.value, "retry")] = delivered.get((provider.value, "retry"), 0) + 1
+
+        session = self.db.session
+        if rows:
+            try:
+                session.execute(update(Notification), rows)
+                with db_commit_timer("DeliveryHandler.record"):
+                    session.commit()
+            except Exception as e:
+                session.rollback()
+                raise DeliveryHandlerException(f"failed to record delivery results: {e}")
+            self.cache.invalidate(row["id"] for row in rows)
+
+        for provider, notification, outcome in observed:
+            # delivery time counts from when the notification was due, so
+            # scheduled sends do not report their scheduling delay
+            due_at = max(notification.createdAt, notification.send_at or 0)
+            message_type = notification.message_type.value
+            self.metrics.observe(
+                sent_at, provider.value, message_type, outcome,
+                sent_at - due_at if outcome == "sent" else 0,
+            )
+            self.latency.record(QUEUE_WAIT, provider.value, message_type, notification.last_attempted - due_at)
+        for notification, result in results:
+            if "elapsed_ms" not in result:
+                continue
+            provider = result["provider"].value
+            message_type = notification.message_type.value
+            self.latency.record(PROVIDER_CALL, provider, message_type, result["elapsed_ms"])
+            # a first attempt of a scheduled send would report its schedule, not latency
+            scheduled = notification.attempt_count == 1 and (notification.send_at or 0) > notification.createdAt
+            if result.get("success") and not scheduled:
+                self.latency.record(CREATE_TO_SEND, provider, message_type, sent_at - notification.createdAt)
+        for (provider, outcome), count in delivered.items():
+            DELIVERIES.labels(provider, outcome).inc(count)
+        self.metrics.maybe_flush()
+        self.latency.maybe_flush()
+
+        self.retry_handler.track_retries(retries)
+
+        if exhausted:
+            dlq_handler = DLQHandler()
+            for notification_id, reason, error_message in exhausted:
+                dlq_handler.move_to_dlq(
+                    notification_id=notification_id,
+                    reason=reason,
+                    error_details=error_message or "max retry attempts exceeded",
+                )
@@ -1,19 +1,26 @@
 import uuid
 import json
+import logging
 from datetime import timedelta, datetime, timezone
 from configs.db import db
 from helpers.custom_exceptions import DLQHandlerException
-from helpers.helpers import now_ms
+from helpers.helpers import now_ms, encode_cursor, decode_cursor, project_columns, row_to_dict
+from helpers.instrumentation import DLQ_MOVES, db_commit_timer
+from helpers.notification_cache import get_notification_cache
 from helpers.enums import NotificationStatus
 from models.notification import Notification
 from models.notification_dlq import NotificationDLQ
+from queues.queue_factory import get_delay_queue
+from sqlalchemy import tuple_
 
+logger = logging.getLogger(__name__)
 
 class DLQHandler:
     def __init__(self):
         self.db = db
         if not self.db:
             raise DLQHandlerException("database not initialized")
+        self.cache = get_notification_cache()
 
     def move_to_dlq(self, notification_id: str, reason: str, error_details: str) -> None:
         if not notification_id:
@@ -42,10 +49,13 @@ class DLQHandler:
             session.add(dlq_entry)
             notification.status = NotificationStatus.FAILED
             notification.failed_at = now_ms()
-            session.commit()
+            with db_commit_timer("DLQHandler.move_to_dlq"):
+                session.commit()
         except Exception as e:
             session.rollback()
             raise DLQHandlerException(str(e))
+        DLQ_MOVES.labels(reason).inc()
+        self.cache.invalidate([notification_id])
 
     def retry_from_dlq(self, dlq_id: str) -> None:
         if not dlq_id:
@@ -58,7 +68,8 @@ class DLQHandler:
             if dlq_entry.resolved:
                 raise DLQHandlerException("DLQ entry already resolved")
 
-            notification = Notification.query.filter_by(id=dlq_entry.notification_id).first()
+            notification_id = dlq_entry.notification_id
+            notification = Notification.query.filter_by(id=notification_id).first()
             if not notification:
                 raise DLQHandlerException("notification not found")
 
@@ -66,11 +77,19 @@ class DLQHandler:
             notification.attempt_count = 0
             notification.failed_at = None
             notification.error_message = None
-            notification.send_at = now_ms()
-            session.commit()
+            send_at = notification.send_at = now_ms()
+            with db_commit_timer("DLQHandler.retry_from_dlq"):
+                session.commit()
         except Exception as e:
             session.rollback()
             raise DLQHandlerException(str(e))
+        self.cache.invalidate([notification_id])
+        try:
+            # the delay queue moves it to the work queue on the mover's next pass
+            get_delay_queue().schedule_many({notification_id: send_at})
+        except Exception as e:
+            # the retry backfill picks the row up after DELAY_QUEUE_BACKFILL_GRACE_SECONDS
+            logger.warning(f"failed to schedule {notification_id} retried from the DLQ: {e}")
 
     def resolve_dlq_entry(self, dlq_id: str, resolved_by: str | None = None) -> None:
         if not dlq_id:
@@ -90,20 +109,43 @@ class DLQHandler:
             session.rollback()
             raise DLQHandlerException(str(e))
 
-    def list_dlq_entries(self, resolved: bool | None = None, limit: int = 20, offset: int = 0):
-        query = NotificationDLQ.query
+    def list_dlq_entries(
+        self,
+        resolved: bool | None = None,
+        limit: int = 20,
+        offset: int = 0,
+        cursor: str | None = None,
+        fields: list[str] | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """
+        Newest first on (moved_to_dlq_at, id), paged with the cursor returned
+        for the previous page (offset is only used without one); `fields`
+        limits the columns loaded, e.g. to leave out retry_history.
+        """
+        try:
+            attrs = project_columns(NotificationDLQ, fields, required=["id", "moved_to_dlq_at"])
+        except ValueError as e:
+            raise DLQHandlerException(str(e))
+        query = self.db.session.query(*[getattr(NotificationDLQ, attr.key) for attr in attrs])
         if resolved is not None:
             query = query.filter(NotificationDLQ.resolved == resolved)
 
+        query = query.order_by(NotificationDLQ.moved_to_dlq_at.desc(), NotificationDLQ.id.desc())
         safe_limit = 20 if limit <= 0 or limit > 100 else limit
-        safe_offset = 0 if offset < 0 else offset
-
-        return (
-            query.order_by(NotificationDLQ.moved_to_dlq_at.desc())
-            .limit(safe_limit)
-            .offset(safe_offset)
-            .all()
-        )
+        if cursor:
+            try:
+                moved_at, last_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise DLQHandlerException(str(e))
+            query = query.filter(tuple_(NotificationDLQ.moved_to_dlq_at, NotificationDLQ.id) < tuple_(moved_at, last_id))
+        elif offset > 0:
+            query = query.offset(offset)
+
+        rows = [row_to_dict(row, attrs) for row in query.limit(safe_limit + 1)]
+        if len(rows) <= safe_limit:
+            return rows, None
+        rows = rows[:safe_limit]
+        return rows, encode_cursor(rows[-1]["moved_to_dlq_at"], rows[-1]["id"])
 
     def cleanup_old_dlq_entries(self, days_old: int) -> int:
         cutoff_ms = int((datetime.now(timezone.utc) - timedelta(days=days_old)).timestamp() * 1000)
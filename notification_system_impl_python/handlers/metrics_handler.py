@@ -0,0 +1,252 @@
+from configs.db import db
+from configs.redis import get_redis_pool
+from helpers.custom_exceptions import MetricsHandlerException
+from helpers.delivery_metrics import PENDING_KEY
+from helpers.enums import MessageType, ProviderType
+from helpers.helpers import now_ms
+from helpers.latency_histogram import HISTOGRAM_KEY, SERIES_KEY, METRICS, percentiles
+from models.notification_metrics import NotificationMetrics
+from providers.circuit_breaker import CircuitBreaker
+from datetime import date
+from sqlalchemy import BigInteger, Float, case, cast, func
+from typing import Dict, Optional, Tuple
+import os
+import time
+import uuid
+
+GRANULARITY_HOUR = "hour"
+GRANULARITY_DAY = "day"
+LATENCY_QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99, "p99_9": 0.999}
+
+
+def _delivery_ms_sum(metrics):
+    # rows rolled up before total_delivery_ms existed only have their average
+    return func.coalesce(metrics.total_delivery_ms, func.coalesce(metrics.avg_delivery_ms, 0) * metrics.total_sent)
+
+
+class MetricsHandler:
+    def __init__(self):
+        self.db = db
+        self.redis_client = get_redis_pool()
+        if not self.db:
+            raise MetricsHandlerException("cannot connect to database")
+        if not self.redis_client:
+            raise MetricsHandlerException("cannot connect to redis")
+
+    def provider_circuits(self) -> dict:
+        """Circuit state of every provider and the number of state changes so far"""
+        try:
+            breaker = CircuitBreaker(self.redis_client)
+            return {
+                "circuits": breaker.states([provider_type.value for provider_type in ProviderType]),
+                "transitions": breaker.transitions(),
+            }
+        except Exception as e:
+            raise MetricsHandlerException(f"failed to read circuit breakers: {e}")
+
+    def rollup_delivery_metrics(self) -> int:
+        """
+        Move the delivery counters workers added to Redis into
+        notification_metrics; returns the number of hourly rows written
+        """
+        flushing_key = f"{PENDING_KEY}:flushing:{uuid.uuid4().hex}"
+        try:
+            # RENAME is atomic, so counters flushed from here on land in a fresh hash
+            self.redis_client.rename(PENDING_KEY, flushing_key)
+        except Exception as e:
+            if "no such key" in str(e).lower():
+                return 0
+            raise MetricsHandlerException(f"failed to read pending delivery metrics: {e}")
+
+        pending = self.redis_client.hgetall(flushing_key)
+        try:
+            written = self._write_rollup(pending)
+        except Exception as e:
+            # put the counters back so the next rollup retries them
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, value in pending.items():
+                pipe.hincrby(PENDING_KEY, field, int(value))
+            pipe.delete(flushing_key)
+            pipe.execute()
+            raise MetricsHandlerException(f"failed to roll up delivery metrics: {e}")
+
+        self.redis_client.delete(flushing_key)
+        return written
+
+    def _write_rollup(self, pending: Dict[str, str]) -> int:
+        buckets: Dict[Tuple[str, int, str, str], Dict[str, int]] = {}
+        for field, value in pending.items():
+            day, hour, provider, message_type, counter = field.split("|")
+            bucket = buckets.setdefault((day, int(hour), provider, message_type), {})
+            bucket[counter] = bucket.get(counter, 0) + int(value)
+        if not buckets:
+            return 0
+
+        session = self.db.session
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise MetricsHandlerException(f"delivery metrics rollup does not support {dialect}")
+
+        now = now_ms()
+        statement = insert(NotificationMetrics).values([
+            {
+                "id": str(uuid.uuid4()),
+                "date": date.fromisoformat(day),
+                "hour": hour,
+                "provider": provider,
+                "message_type": MessageType(message_type),
+                "total_sent": counts.get("sent", 0),
+                "total_failed": counts.get("failed", 0),
+                "total_pending": counts.get("pending", 0),
+                "avg_delivery_ms": round(counts.get("delivery_ms", 0) / counts["sent"]) if counts.get("sent") else None,
+                "total_delivery_ms": counts.get("delivery_ms", 0),
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            for (day, hour, provider, message_type), counts in buckets.items()
+        ])
+        excluded = statement.excluded
+        total_sent = NotificationMetrics.total_sent + excluded.total_sent
+        total_delivery_ms = _delivery_ms_sum(NotificationMetrics) + excluded.total_delivery_ms
+        statement = statement.on_conflict_do_update(
+            index_elements=["date", "hour", "provider", "message_type"],
+            set_={
+                "total_sent": total_sent,
+                "total_failed": NotificationMetrics.total_failed + excluded.total_failed,
+                "total_pending": NotificationMetrics.total_pending + excluded.total_pending,
+                "total_delivery_ms": total_delivery_ms,
+                "avg_delivery_ms": case(
+                    (total_sent == 0, NotificationMetrics.avg_delivery_ms),
+                    else_=cast(func.round(cast(total_delivery_ms, Float) / total_sent), BigInteger),
+                ),
+                "updated_at": now,
+            },
+        )
+        try:
+            session.execute(statement)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return len(buckets)
+
+    def delivery_totals(
+        self,
+        start: date,
+        end: date,
+        granularity: str = GRANULARITY_HOUR,
+        provider: Optional[str] = None,
+        message_type: Optional[MessageType] = None,
+    ) -> list:
+        """Hourly or daily totals per provider and message type for start..end (inclusive)"""
+        if granularity not in (GRANULARITY_HOUR, GRANULARITY_DAY):
+            raise MetricsHandlerException("granularity must be hour or day")
+
+        metrics = NotificationMetrics
+        group = [metrics.date, metrics.provider, metrics.message_type]
+        if granularity == GRANULARITY_HOUR:
+            group.insert(1, metrics.hour)
+        total_sent = func.sum(metrics.total_sent)
+        query = (
+            self.db.session.query(
+                *group,
+                total_sent.label("total_sent"),
+                func.sum(metrics.total_failed).label("total_failed"),
+                func.sum(metrics.total_pending).label("total_pending"),
+                (
+                    cast(func.sum(_delivery_ms_sum(metrics)), Float) / func.nullif(total_sent, 0)
+                ).label("avg_delivery_ms"),
+            )
+            .filter(metrics.date >= start, metrics.date <= end)
+            .group_by(*group)
+            .order_by(*group)
+        )
+        if provider:
+            query = query.filter(metrics.provider == provider)
+        if message_type:
+            query = query.filter(metrics.message_type == message_type)
+
+        try:
+            rows = query.all()
+        except Exception as e:
+            raise MetricsHandlerException(f"failed to read delivery metrics: {e}")
+        return [
+            {
+                "date": row.date.isoformat(),
+                **({"hour": row.hour} if granularity == GRANULARITY_HOUR else {}),
+                "provider": row.provider,
+                "message_type": row.message_type.value,
+                "total_sent": int(row.total_sent or 0),
+                "total_failed": int(row.total_failed or 0),
+                "total_pending": int(row.total_pending or 0),
+                "avg_delivery_ms": None if row.avg_delivery_ms is None else round(float(row.avg_delivery_ms), 2),
+            }
+            for row in rows
+        ]
+
+    def latency_percentiles(
+        self,
+        window_seconds: int = 300,
+        metric: Optional[str] = None,
+        provider: Optional[str] = None,
+        message_type: Optional[str] = None,
+    ) -> list:
+        """
+        p50/p95/p99/p99.9 (ms) of every latency series over the last
+        window_seconds, merged from the per-window histograms workers flush
+        """
+        if metric and metric not in METRICS:
+            raise MetricsHandlerException(f"metric must be one of {', '.join(METRICS)}")
+        bucket_seconds = int(os.getenv("LATENCY_WINDOW_SECONDS", "60"))
+        now = int(time.time())
+        windows = range(
+            (now - window_seconds) // bucket_seconds * bucket_seconds + bucket_seconds,
+            now // bucket_seconds * bucket_seconds + 1,
+            bucket_seconds,
+        )
+
+        try:
+            series_list = sorted(
+                series for series in self.redis_client.smembers(SERIES_KEY)
+                if self._series_matches(series, metric, provider, message_type)
+            )
+            pipe = self.redis_client.pipeline(transaction=False)
+            for series in series_list:
+                for window in windows:
+                    pipe.hgetall(HISTOGRAM_KEY.format(series=series, window=window))
+            histograms = pipe.execute()
+        except Exception as e:
+            raise MetricsHandlerException(f"failed to read latency histograms: {e}")
+
+        results = []
+        per_series = len(windows)
+        for position, series in enumerate(series_list):
+            counts: Dict[int, int] = {}
+            for histogram in histograms[position * per_series:(position + 1) * per_series]:
+                for index, count in histogram.items():
+                    counts[int(index)] = counts.get(int(index), 0) + int(count)
+            if not counts:
+                continue
+            series_metric, series_provider, series_message_type = series.split("|")
+            values = percentiles(counts, list(LATENCY_QUANTILES.values()))
+            results.append({
+                "metric": series_metric,
+                "provider": series_provider,
+                "message_type": series_message_type,
+                "count": sum(counts.values()),
+                **{name: values[quantile] for name, quantile in LATENCY_QUANTILES.items()},
+            })
+        return results
+
+    @staticmethod
+    def _series_matches(series: str, metric: Optional[str], provider: Optional[str], message_type: Optional[str]) -> bool:
+        series_metric, series_provider, series_message_type = series.split("|")
+        return (
+            (not metric or series_metric == metric)
+            and (not provider or series_provider == provider)
+            and (not message_type or series_message_type == message_type)
+        )
@@ -1,14 +1,32 @@
 from configs.db import db
 from configs.redis import get_redis_pool
-from helpers.custom_exceptions import NotificationHandlerException
+from handlers.preference_handler import PreferenceHandler, DEFER, SUPPRESS
+from handlers.template_handler import TemplateHandler
+from helpers.constants import Constants
+from helpers.custom_exceptions import NotificationHandlerException, PreferenceHandlerException, TemplateHandlerException
 from helpers.enums import MessageType, ProviderType, NotificationStatus
-from helpers.helpers import now_ms
+from helpers.helpers import now_ms, encode_cursor, decode_cursor, project_columns, row_to_dict
+from helpers.instrumentation import IDEMPOTENCY_REJECTS, db_commit_timer
+from helpers.notification_cache import get_notification_cache
+from helpers.serializer import dumps
+from helpers.template_engine import CompiledTemplate
 from models.notification import Notification
-from typing import List, Optional
-import uuid
+from models.notification_outbox import NotificationOutbox
+from models.users import Users
+from queues.queue_factory import get_notification_queue, get_delay_queue
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Tuple
+import csv
+import io
 import json
+import logging
+import os
+import uuid
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
 
 class NotificationHandler:
     def __init__(self):
@@ -18,12 +36,67 @@ class NotificationHandler:
             raise NotificationHandlerException("cannot connect to database")
         if not self.redis_client:
             raise NotificationHandlerException("redis client is cannot be connected")
-        
+        self.queue = get_notification_queue(self.redis_client)
+        self.delay_queue = get_delay_queue(self.redis_client, self.queue)
+        self.cache = get_notification_cache()
+        self.templates = TemplateHandler()
+        self.preferences = PreferenceHandler()
+        # outbox: idempotency from the unique index, queueing by workers/outbox_relay.py
+        self.outbox_mode = os.getenv("NOTIFICATION_CREATE_MODE", "redis").lower() == "outbox"
 
-    def _reserve_idempotency(self, key: str, ttl_seconds: int = 86400) -> bool:
+    @staticmethod
+    def _is_due(send_at: Optional[int]) -> bool:
+        return send_at is None or send_at <= now_ms()
+
+    def _reserve_idempotency(self, key: str, ttl_seconds: int = Constants.IDEMPOTENCY_TTL) -> bool:
         return self.redis_client.set(name=f"notification:idemp:{key}", value="1", nx=True, ex=ttl_seconds)
 
-    def create_notification(
+    def _reserve_idempotency_many(self, keys: List[str], ttl_seconds: int = Constants.IDEMPOTENCY_TTL) -> List[bool]:
+        # one pipelined round trip for the whole batch instead of a SET NX per item
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(name=f"notification:idemp:{key}", value="1", nx=True, ex=ttl_seconds)
+        return [bool(reserved) for reserved in pipe.execute()]
+
+    def _schedule(self, send_times: dict) -> None:
+        # a send_at already past is moved on the mover's next pass; the DB
+        # backfill in RetryHandler.process_due_retries covers a failure here
+        try:
+            self.delay_queue.schedule_many(
+                {notification_id: send_at for notification_id, send_at in send_times.items() if send_at is not None}
+            )
+        except Exception as e:
+            logger.warning(f"failed to schedule notifications: {e}")
+
+    def _release_idempotency_many(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        try:
+            self.redis_client.delete(*[f"notification:idemp:{key}" for key in keys])
+        except Exception as e:
+            logger.warning(f"failed to release idempotency keys: {e}")
+
+    def _check_preferences(self, rows: List[dict]) -> List[Optional[str]]:
+        """
+        Apply the users' preferences to built rows: a send time inside quiet
+        hours moves to the end of the window. Returns the suppression reason
+        (opt-out) of each row, None when it may be created.
+        """
+        now = now_ms()
+        try:
+            decisions = self.preferences.evaluate_many([
+                (row["user_id"], row["message_type"], max(now, row["send_at"] or 0)) for row in rows
+            ])
+        except PreferenceHandlerException as e:
+            raise NotificationHandlerException(str(e))
+        reasons = []
+        for row, (action, value) in zip(rows, decisions):
+            if action == DEFER:
+                row["send_at"] = value
+            reasons.append(value if action == SUPPRESS else None)
+        return reasons
+
+    def _build_values(
         self,
         user_id: str,
         message_type: MessageType,
@@ -32,7 +105,26 @@ class NotificationHandler:
         idempotency_key: Optional[str] = None,
         send_at: Optional[int] = None,
         max_retries: Optional[int] = None,
-    ) -> Notification:
+        template: Optional[CompiledTemplate] = None,
+    ) -> dict:
+        template_id = None
+        if template is not None:
+            # the template fixes the channel; the payload only carries its variables
+            message_type = message_type or template.message_type
+            variables = payload
+            if isinstance(variables, str):
+                try:
+                    variables = json.loads(variables)
+                except ValueError:
+                    variables = None
+            if not isinstance(variables, dict):
+                raise NotificationHandlerException("payload must be a JSON object of template variables")
+            missing = template.missing(variables)
+            if missing:
+                raise NotificationHandlerException(f"missing template variables: {', '.join(missing)}")
+            payload = dumps(variables).decode()
+            template_id = template.id
+
         if not user_id or not payload:
             raise NotificationHandlerException("user_id, payload, message_type, and provider are required")
 
@@ -50,48 +142,349 @@ class NotificationHandler:
 
         if not isinstance(message_type, Enum) or not isinstance(provider, Enum):
             raise NotificationHandlerException("message_type and provider are required")
+        if template is not None and message_type != template.message_type:
+            raise NotificationHandlerException(f"template {template.name} is for {template.message_type.value}")
+
+        created_at = now_ms()
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "message_type": message_type,
+            "provider": provider,
+            "status": NotificationStatus.PENDING,
+            "template_id": template_id,
+            "payload": payload,
+            "max_retries": max_retries if max_retries is not None else 5,
+            "attempt_count": 0,
+            "send_at": send_at,
+            "idempotency_key": idempotency_key or str(uuid.uuid4()),
+            "createdAt": created_at,
+            "updatedAt": created_at,
+        }
+
+    def create_notification(
+        self,
+        user_id: str,
+        message_type: MessageType,
+        provider: ProviderType,
+        payload: str,
+        idempotency_key: Optional[str] = None,
+        send_at: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        enqueue: bool = False,
+        template: Optional[str] = None,
+    ) -> Notification:
+        """
+        Create a notification. With enqueue=True an immediate notification is
+        published to the work queue once it is committed, so no separate
+        enqueue_for_send call (and DB re-read) is needed; if that publish
+        fails it goes on the delay queue for now. Any other send_at goes on
+        the delay queue.
+        In outbox mode the notification and its outbox row are written in one
+        commit without a Redis call; the outbox relay publishes it.
+        With a template name the payload is the template's variables and the
+        worker renders it at send time. A user who opted out of the channel
+        is refused; a send time inside the user's quiet hours moves to the
+        end of the window.
+        """
+        compiled = None
+        if template:
+            try:
+                compiled = self.templates.compiled_by_name([template]).get(template)
+            except TemplateHandlerException as e:
+                raise NotificationHandlerException(str(e))
+            if compiled is None:
+                raise NotificationHandlerException("template not found or inactive")
 
-        notif = Notification(
-            id=str(uuid.uuid4()),
+        values = self._build_values(
             user_id=user_id,
             message_type=message_type,
             provider=provider,
-            status=NotificationStatus.PENDING,
             payload=payload,
-            max_retries=max_retries if max_retries is not None else 5,
-            attempt_count=0,
+            idempotency_key=idempotency_key,
             send_at=send_at,
-            idempotency_key=idempotency_key or str(uuid.uuid4()),
+            max_retries=max_retries,
+            template=compiled,
         )
+        suppressed = self._check_preferences([values])[0]
+        if suppressed:
+            raise NotificationHandlerException(suppressed)
+        notif = Notification(**values)
 
-        if self.redis_client:
-            reserved = self._reserve_idempotency(notif.idempotency_key)
-            if not reserved:
-                raise NotificationHandlerException("duplicate notification (idempotency)")
+        if self.outbox_mode:
+            return self._create_with_outbox(notif, enqueue)
+
+        if self.redis_client and not self._reserve_idempotency(notif.idempotency_key):
+            IDEMPOTENCY_REJECTS.inc()
+            raise NotificationHandlerException("duplicate notification (idempotency)")
 
         try:
             self.db.session.add(notif)
-            self.db.session.commit()
-            return notif
+            with db_commit_timer("NotificationHandler.create_notification"):
+                self.db.session.commit()
         except Exception as e:
             self.db.session.rollback()
+            self._release_idempotency_many([notif.idempotency_key])
+            raise NotificationHandlerException(str(e))
+
+        send_at = notif.send_at
+        if enqueue and self._is_due(send_at):
+            # published only after the commit, so a worker always finds the row
+            try:
+                self.queue.publish(notif.id)
+                return notif
+            except Exception as e:
+                logger.warning(f"failed to enqueue notification {notif.id}, scheduling it instead: {e}")
+                send_at = now_ms()
+        self._schedule({notif.id: send_at})
+        return notif
+
+    def _create_with_outbox(self, notif: Notification, enqueue: bool) -> Notification:
+        # one commit and no Redis round trip; the relay publishes the outbox row
+        session = self.db.session
+        session.add(notif)
+        if enqueue or notif.send_at is not None:
+            session.add(NotificationOutbox(notification_id=notif.id, send_at=notif.send_at, createdAt=notif.createdAt))
+        try:
+            with db_commit_timer("NotificationHandler.create_notification"):
+                session.commit()
+            return notif
+        except IntegrityError as e:
+            session.rollback()
+            if "idempotency" in str(e.orig).lower():
+                IDEMPOTENCY_REJECTS.inc()
+                raise NotificationHandlerException("duplicate notification (idempotency)")
+            raise NotificationHandlerException(str(e))
+        except Exception as e:
+            session.rollback()
             raise NotificationHandlerException(str(e))
 
-    def bulk_create(self, notifications: List[dict]) -> List[Notification]:
-        created = []
-        for payload in notifications:
-            created.append(
-                self.create_notification(
-                    user_id=payload.get("user_id"),
-                    message_type=payload.get("message_type"),
-                    provider=payload.get("provider"),
-                    payload=payload.get("payload"),
-                    idempotency_key=payload.get("idempotency_key"),
-                    send_at=payload.get("send_at"),
-                    max_retries=payload.get("max_retries"),
+    def bulk_create(self, notifications: List[dict], enqueue: bool = False) -> List[dict]:
+        """
+        Create a batch of notifications in a single transaction.
+
+        Idempotency keys are reserved with one pipelined Redis call and the
+        accepted rows are written with one multi-row INSERT (COPY for large
+        batches on PostgreSQL). Returns one result per input item, in order,
+        with status "created", "duplicate", "invalid" or "suppressed" (opt-out,
+        from one batched preference lookup). With enqueue=True the
+        immediate notifications are pushed with enqueue_many after the commit.
+        In outbox mode duplicates are found with one query on the unique
+        idempotency index and the outbox rows go in the same transaction.
+        """
+        if not isinstance(notifications, list):
+            raise NotificationHandlerException("bulk request must be a list of notifications")
+
+        results: List[Optional[dict]] = [None] * len(notifications)
+        try:
+            templates = self.templates.compiled_by_name(
+                item["template"] for item in notifications if isinstance(item, dict) and item.get("template")
+            )
+        except TemplateHandlerException as e:
+            raise NotificationHandlerException(str(e))
+        candidates = []
+        seen_keys = set()
+        for index, item in enumerate(notifications):
+            if not isinstance(item, dict):
+                results[index] = {"index": index, "status": "invalid", "error": "notification must be an object"}
+                continue
+            if item.get("template") and item["template"] not in templates:
+                results[index] = {"index": index, "status": "invalid", "error": "template not found or inactive"}
+                continue
+            try:
+                values = self._build_values(
+                    user_id=item.get("user_id"),
+                    message_type=item.get("message_type"),
+                    provider=item.get("provider"),
+                    payload=item.get("payload"),
+                    idempotency_key=item.get("idempotency_key"),
+                    send_at=item.get("send_at"),
+                    max_retries=item.get("max_retries"),
+                    template=templates.get(item.get("template")),
                 )
+            except NotificationHandlerException as e:
+                results[index] = {"index": index, "status": "invalid", "error": str(e)}
+                continue
+
+            if values["idempotency_key"] in seen_keys:
+                results[index] = {
+                    "index": index,
+                    "status": "duplicate",
+                    "idempotency_key": values["idempotency_key"],
+                    "error": "duplicate notification (idempotency)",
+                }
+                IDEMPOTENCY_REJECTS.inc()
+                continue
+            seen_keys.add(values["idempotency_key"])
+            candidates.append((index, values))
+
+        # Unknown users would fail the foreign key and abort the whole batch.
+        user_ids = {values["user_id"] for _, values in candidates}
+        known_users = set()
+        if user_ids:
+            known_users = {
+                row[0] for row in self.db.session.query(Users.id).filter(Users.id.in_(user_ids)).all()
+            }
+        valid = []
+        for index, values in candidates:
+            if values["user_id"] not in known_users:
+                results[index] = {"index": index, "status": "invalid", "error": "user not found"}
+                continue
+            valid.append((index, values))
+
+        # one batched preference lookup for every user of the request
+        if valid:
+            allowed = []
+            for (index, values), reason in zip(valid, self._check_preferences([values for _, values in valid])):
+                if reason:
+                    results[index] = {"index": index, "status": "suppressed", "error": reason}
+                    continue
+                allowed.append((index, values))
+            valid = allowed
+
+        if self.outbox_mode:
+            return self._bulk_create_with_outbox(valid, results, enqueue)
+
+        reserved = self._reserve_idempotency_many([values["idempotency_key"] for _, values in valid]) if valid else []
+        accepted = []
+        for (index, values), ok in zip(valid, reserved):
+            if not ok:
+                results[index] = {
+                    "index": index,
+                    "status": "duplicate",
+                    "idempotency_key": values["idempotency_key"],
+                    "error": "duplicate notification (idempotency)",
+                }
+                IDEMPOTENCY_REJECTS.inc()
+                continue
+            accepted.append((index, values))
+
+        if accepted:
+            rows = [values for _, values in accepted]
+            try:
+                self._insert_notifications(rows)
+                with db_commit_timer("NotificationHandler.bulk_create"):
+                    self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                self._release_idempotency_many([row["idempotency_key"] for row in rows])
+                raise NotificationHandlerException(str(e))
+
+        enqueued = set()
+        send_times = {values["id"]: values["send_at"] for _, values in accepted}
+        if enqueue and accepted:
+            due_ids = [values["id"] for _, values in accepted if self._is_due(values["send_at"])]
+            try:
+                self.enqueue_many(due_ids)
+                enqueued.update(due_ids)
+            except NotificationHandlerException as e:
+                # the delay queue moves them to the work queue on its next pass
+                logger.warning(f"{e}, scheduling {len(due_ids)} notifications instead")
+                now = now_ms()
+                send_times.update({notification_id: now for notification_id in due_ids})
+
+        if accepted:
+            self._schedule({
+                notification_id: send_at for notification_id, send_at in send_times.items()
+                if notification_id not in enqueued
+            })
+
+        for index, values in accepted:
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": values["id"],
+                "idempotency_key": values["idempotency_key"],
+            }
+            if enqueue:
+                results[index]["enqueued"] = values["id"] in enqueued
+        return results
+
+    def _bulk_create_with_outbox(self, valid: List, results: List[Optional[dict]], enqueue: bool) -> List[dict]:
+        keys = [values["idempotency_key"] for _, values in valid]
+        existing = set()
+        if keys:
+            existing = {
+                row[0] for row in
+                self.db.session.query(Notification.idempotency_key).filter(Notification.idempotency_key.in_(keys)).all()
+            }
+
+        accepted = []
+        for index, values in valid:
+            if values["idempotency_key"] in existing:
+                results[index] = {
+                    "index": index,
+                    "status": "duplicate",
+                    "idempotency_key": values["idempotency_key"],
+                    "error": "duplicate notification (idempotency)",
+                }
+                IDEMPOTENCY_REJECTS.inc()
+                continue
+            accepted.append((index, values))
+
+        outbox_rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "notification_id": values["id"],
+                "send_at": values["send_at"],
+                "createdAt": values["createdAt"],
+            }
+            for _, values in accepted
+            if enqueue or values["send_at"] is not None
+        ]
+        if accepted:
+            try:
+                self._insert_notifications([values for _, values in accepted])
+                if outbox_rows:
+                    self.db.session.execute(insert(NotificationOutbox), outbox_rows)
+                with db_commit_timer("NotificationHandler.bulk_create"):
+                    self.db.session.commit()
+            except Exception as e:
+                # a key taken between the check and the insert aborts the batch
+                self.db.session.rollback()
+                raise NotificationHandlerException(str(e))
+
+        queued = {row["notification_id"] for row in outbox_rows}
+        for index, values in accepted:
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": values["id"],
+                "idempotency_key": values["idempotency_key"],
+            }
+            if enqueue:
+                results[index]["enqueued"] = values["id"] in queued
+        return results
+
+    def _insert_notifications(self, rows: List[dict]) -> None:
+        session = self.db.session
+        if len(rows) >= Constants.BULK_COPY_THRESHOLD and session.get_bind().dialect.name == "postgresql":
+            self._copy_notifications(rows)
+        else:
+            session.execute(insert(Notification), rows)
+
+    def _copy_notifications(self, rows: List[dict]) -> None:
+        attrs = list(rows[0].keys())
+        columns = [Notification.__mapper__.column_attrs[attr].columns[0].name for attr in attrs]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                value.value if isinstance(value, Enum) else value
+                for value in (row[attr] for attr in attrs)
+            ])
+        buffer.seek(0)
+
+        # COPY runs on the session's own connection so it shares the transaction
+        cursor = self.db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {Notification.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
             )
-        return created
+        finally:
+            cursor.close()
 
     def get_notification(self, notification_id: str) -> Notification:
         notif = Notification.query.filter_by(id=notification_id).first()
@@ -99,27 +492,58 @@ class NotificationHandler:
             raise NotificationHandlerException("notification not found")
         return notif
 
+    def get_notification_json(self, notification_id: str) -> str:
+        """Serialized notification, read through the notification cache"""
+        cached = self.cache.get(notification_id)
+        if cached is not None:
+            return cached
+        serialized = dumps(self.get_notification(notification_id).to_dict()).decode()
+        self.cache.fill(notification_id, serialized)
+        return serialized
+
     def list_notifications(
         self,
         user_id: Optional[str] = None,
         status: Optional[NotificationStatus] = None,
         limit: int = 20,
         offset: int = 0,
-    ) -> List[Notification]:
-        query = Notification.query
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Newest first, ordered by (created_at, id). Returns the page and the
+        cursor of its last row, or None on the last page. Passing that cursor
+        back seeks past the previous page on idx_status_created /
+        idx_user_created instead of scanning `offset` rows; offset is only
+        used without a cursor. `fields` selects the columns to load, so
+        listings can leave out payload and provider_response.
+        """
+        try:
+            attrs = project_columns(Notification, fields, required=["id", "created_at"])
+        except ValueError as e:
+            raise NotificationHandlerException(str(e))
+        query = self.db.session.query(*[getattr(Notification, attr.key) for attr in attrs])
         if user_id:
             query = query.filter(Notification.user_id == user_id)
         if status:
             query = query.filter(Notification.status == status)
 
+        query = query.order_by(Notification.createdAt.desc(), Notification.id.desc())
         safe_limit = 20 if limit <= 0 or limit > 100 else limit
-        safe_offset = 0 if offset < 0 else offset
-        return (
-            query.order_by(Notification.createdAt.desc())
-            .limit(safe_limit)
-            .offset(safe_offset)
-            .all()
-        )
+        if cursor:
+            try:
+                created_at, last_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise NotificationHandlerException(str(e))
+            query = query.filter(tuple_(Notification.createdAt, Notification.id) < tuple_(created_at, last_id))
+        elif offset > 0:
+            query = query.offset(offset)
+
+        rows = [row_to_dict(row, attrs) for row in query.limit(safe_limit + 1)]
+        if len(rows) <= safe_limit:
+            return rows, None
+        rows = rows[:safe_limit]
+        return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
 
     def cancel_notification(self, notification_id: str):
         notif = Notification.query.with_for_update().filter_by(id=notification_id).first()
@@ -131,14 +555,34 @@ class NotificationHandler:
         notif.status = NotificationStatus.CANCELLED
         notif.failed_at = now_ms()
         try:
-            self.db.session.commit()
+            with db_commit_timer("NotificationHandler.cancel_notification"):
+                self.db.session.commit()
         except Exception as e:
             self.db.session.rollback()
             raise NotificationHandlerException(str(e))
 
+        self.cache.invalidate([notification_id])
+        try:
+            self.delay_queue.cancel([notification_id])
+        except Exception as e:
+            # the worker skips cancelled notifications anyway
+            logger.warning(f"failed to remove {notification_id} from the delay queue: {e}")
+
     def enqueue_for_send(self, notification_id: str):
         notif = self.get_notification(notification_id)
         if self.redis_client:
-            payload = json.dumps({"id": notif.id, "action": "send"})
-            self.redis_client.lpush("notification:queue", payload)
+            self.queue.publish(notif.id)
         return notif
+
+    def enqueue_many(self, notification_ids: List[str]) -> int:
+        """
+        Publish many notification ids to the work queue without reloading
+        their rows. The list backend sends variadic LPUSH commands of up to
+        ENQUEUE_CHUNK_SIZE ids; either backend uses one pipelined round trip.
+        """
+        if not notification_ids:
+            return 0
+        try:
+            return self.queue.publish_many(notification_ids)
+        except Exception as e:
+            raise NotificationHandlerException(f"failed to enqueue notifications: {e}")
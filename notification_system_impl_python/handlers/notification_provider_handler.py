@@ -1,18 +1,21 @@
 from providers.base_provider import NotificationProvider
-from providers.provider_factory import get_provider_map
+from providers.provider_registry import get_provider_registry
+from providers.provider_router import ProviderRouter
 from helpers.enums import ProviderType
-from typing import Dict
+from typing import Dict, List
 
 
 class NotificationHandler:
     def __init__(self):
         self.providers: Dict[ProviderType, NotificationProvider] = {}
+        self.router: ProviderRouter = None
         self._load_providers()
 
     def _load_providers(self):
         try:
-            self.providers = get_provider_map()
-            print(f"Loaded {len(self.providers)} notification providers")
+            registry = get_provider_registry()
+            self.router = registry.get_router()
+            self.providers = registry.providers
         except Exception as e:
             print(f"Failed to load providers: {str(e)}")
             raise
@@ -31,3 +34,19 @@ class NotificationHandler:
             }
 
         return provider.send(notification)
+
+    def send_batch(self, provider_type: ProviderType, notifications: List) -> List[dict]:
+        provider = self.get_provider(provider_type)
+
+        if not provider:
+            print(f"No provider found for {provider_type}")
+            return [
+                {'success': False, 'message': f'No provider configured for {provider_type.value}'}
+                for _ in notifications
+            ]
+
+        return provider.send_batch(notifications)
+
+    def send_routed(self, notifications: List) -> List[dict]:
+        """Send through each notification's provider chain, with failover; results carry the provider used"""
+        return self.router.send_batch(notifications)
@@ -0,0 +1,81 @@
+from configs.db import db
+from configs.redis import get_redis_pool
+from helpers.custom_exceptions import OutboxHandlerException
+from helpers.helpers import now_ms
+from helpers.instrumentation import db_commit_timer
+from models.notification_outbox import NotificationOutbox
+from queues.queue_factory import get_notification_queue, get_delay_queue
+import os
+
+
+class OutboxHandler:
+    """
+    Relays notification_outbox rows written by NotificationHandler in outbox
+    mode (NOTIFICATION_CREATE_MODE=outbox) to Redis. Due notifications go to
+    the work queue and future ones to the delay queue, in one pipeline per
+    batch. Rows are locked with FOR UPDATE SKIP LOCKED so several relays can
+    run side by side, and are deleted in the same transaction once Redis has
+    taken them; a failed publish leaves them for the next pass.
+    """
+
+    def __init__(self, batch_size: int = None):
+        self.db = db
+        self.redis_client = get_redis_pool()
+        if not self.db:
+            raise OutboxHandlerException("cannot connect to database")
+        if not self.redis_client:
+            raise OutboxHandlerException("cannot connect to redis")
+        self.queue = get_notification_queue(self.redis_client)
+        self.delay_queue = get_delay_queue(self.redis_client, self.queue)
+        self.batch_size = batch_size or int(os.getenv("OUTBOX_BATCH_SIZE", "1000"))
+
+    def relay_batch(self) -> int:
+        """Relay up to batch_size outbox rows, oldest first; returns how many were relayed"""
+        session = self.db.session
+        try:
+            rows = (
+                session.query(NotificationOutbox.id, NotificationOutbox.notification_id, NotificationOutbox.send_at)
+                .order_by(NotificationOutbox.createdAt)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not rows:
+                session.commit()
+                return 0
+
+            now = now_ms()
+            due = [notification_id for _, notification_id, send_at in rows if send_at is None or send_at <= now]
+            scheduled = {
+                notification_id: send_at
+                for _, notification_id, send_at in rows
+                if send_at is not None and send_at > now
+            }
+            pipe = self.redis_client.pipeline(transaction=False)
+            self.queue.publish_many(due, pipe=pipe)
+            self.delay_queue.schedule_many(scheduled, pipe=pipe)
+            pipe.execute()
+
+            # a crash between the publish and this commit relays the rows again,
+            # which the delivery claim absorbs (at-least-once)
+            session.query(NotificationOutbox).filter(
+                NotificationOutbox.id.in_([outbox_id for outbox_id, _, _ in rows])
+            ).delete(synchronize_session=False)
+            with db_commit_timer("OutboxHandler.relay_batch"):
+                session.commit()
+            return len(rows)
+        except Exception as e:
+            session.rollback()
+            raise OutboxHandlerException(f"failed to relay outbox: {e}")
+
+    def relay_all(self) -> int:
+        """Relay batches until the outbox holds less than a full batch"""
+        relayed = 0
+        while True:
+            count = self.relay_batch()
+            relayed += count
+            if count < self.batch_size:
+                return relayed
+
+    def depth(self) -> int:
+        return self.db.session.query(NotificationOutbox).count()
@@ -0,0 +1,274 @@
+from configs.db import db
+from configs.redis import get_redis_pool
+from helpers.custom_exceptions import PreferenceHandlerException
+from helpers.enums import MessageType
+from helpers.preference_cache import get_preference_cache
+from models.notification_preferences import NotificationPreferences
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import json
+
+ALLOW = "allow"
+DEFER = "defer"
+SUPPRESS = "suppress"
+
+# set of the notification ids counted against a user's daily cap of a channel
+CAP_KEY = "preferences:caps:{user_id}:{channel}:{day}"
+
+# KEYS: one frequency cap set per notification (repeats allowed)
+# ARGV: the set TTL in seconds, then the cap and notification id of each key
+# Adds a notification to its set while the set is under the cap; one already
+# in the set was counted by an earlier attempt and is not counted again.
+# Returns 1 (counted) or 0 (cap reached) per key
+CONSUME_CAPS_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local results = {}
+for i, key in ipairs(KEYS) do
+    local notification_id = ARGV[2 * i + 1]
+    if redis.call('SISMEMBER', key, notification_id) == 1 then
+        results[i] = 1
+    elseif redis.call('SCARD', key) < tonumber(ARGV[2 * i]) then
+        if redis.call('SADD', key, notification_id) == 1 and redis.call('SCARD', key) == 1 then
+            redis.call('EXPIRE', key, ttl)
+        end
+        results[i] = 1
+    else
+        results[i] = 0
+    end
+end
+return results
+"""
+
+_UNSET = object()
+
+
+def _zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+class ChannelPreference:
+    __slots__ = ("enabled", "frequency_cap", "quiet_start", "quiet_end", "zone")
+
+    def __init__(self, enabled: bool, frequency_cap: Optional[int], quiet_start: Optional[str],
+                 quiet_end: Optional[str], timezone: Optional[str]):
+        self.enabled = enabled
+        self.frequency_cap = frequency_cap
+        self.quiet_start = time.fromisoformat(quiet_start) if quiet_start else None
+        self.quiet_end = time.fromisoformat(quiet_end) if quiet_end else None
+        self.zone = _zone(timezone)
+
+    def quiet_until(self, at_ms: int) -> Optional[int]:
+        """End of the quiet window (epoch ms) when at_ms falls inside it, else None"""
+        start, end = self.quiet_start, self.quiet_end
+        if start is None or end is None or start == end:
+            return None
+        local = datetime.fromtimestamp(at_ms / 1000, self.zone)
+        now = local.time()
+        if start < end:
+            if not start <= now < end:
+                return None
+            until = local.date()
+        else:
+            # the window spans midnight
+            if end <= now < start:
+                return None
+            until = local.date() if now < end else local.date() + timedelta(days=1)
+        return int(datetime.combine(until, end, tzinfo=self.zone).timestamp() * 1000)
+
+
+class PreferenceHandler:
+    """
+    Per-user, per-channel preferences (opt-out, quiet hours, daily frequency
+    cap) consulted before a notification is enqueued and again before it is
+    sent. A batch of users is resolved with one MGET on the preference cache
+    and one IN query for the misses. Frequency caps count notifications per
+    user, channel and local day in Redis, each notification once however
+    many attempts it takes.
+    """
+
+    def __init__(self):
+        self.db = db
+        self.redis_client = get_redis_pool()
+        if not self.db:
+            raise PreferenceHandlerException("cannot connect to database")
+        if not self.redis_client:
+            raise PreferenceHandlerException("cannot connect to redis")
+        self.cache = get_preference_cache()
+        self._consume_caps = self.redis_client.register_script(CONSUME_CAPS_SCRIPT)
+
+    @staticmethod
+    def _parse_channel(channel) -> MessageType:
+        if isinstance(channel, MessageType):
+            return channel
+        try:
+            return MessageType(str(channel).upper())
+        except ValueError:
+            raise PreferenceHandlerException("invalid channel")
+
+    def list_preferences(self, user_id: str) -> List[NotificationPreferences]:
+        return (
+            NotificationPreferences.query.filter_by(user_id=user_id)
+            .order_by(NotificationPreferences.channel)
+            .all()
+        )
+
+    def set_preference(
+        self,
+        user_id: str,
+        channel,
+        enabled=_UNSET,
+        frequency_cap=_UNSET,
+        quiet_hours_start=_UNSET,
+        quiet_hours_end=_UNSET,
+        timezone=_UNSET,
+    ) -> NotificationPreferences:
+        """Create or change the preference of one channel; unset fields keep their value"""
+        if not user_id:
+            raise PreferenceHandlerException("user_id is required")
+        channel = self._parse_channel(channel)
+        preference = NotificationPreferences.query.filter_by(user_id=user_id, channel=channel).first()
+        if preference is None:
+            preference = NotificationPreferences(user_id=user_id, channel=channel, enabled=True, timezone="UTC")
+            self.db.session.add(preference)
+
+        try:
+            if enabled is not _UNSET:
+                preference.enabled = bool(enabled)
+            if frequency_cap is not _UNSET:
+                if frequency_cap is not None and int(frequency_cap) < 0:
+                    raise PreferenceHandlerException("frequency_cap cannot be negative")
+                preference.frequency_cap = None if frequency_cap is None else int(frequency_cap)
+            if quiet_hours_start is not _UNSET:
+                preference.quiet_hours_start = time.fromisoformat(quiet_hours_start) if quiet_hours_start else None
+            if quiet_hours_end is not _UNSET:
+                preference.quiet_hours_end = time.fromisoformat(quiet_hours_end) if quiet_hours_end else None
+            if timezone is not _UNSET:
+                ZoneInfo(timezone or "UTC")
+                preference.timezone = timezone or "UTC"
+        except PreferenceHandlerException:
+            self.db.session.rollback()
+            raise
+        except (ValueError, TypeError, ZoneInfoNotFoundError) as e:
+            self.db.session.rollback()
+            raise PreferenceHandlerException(f"invalid preference: {e}")
+
+        try:
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            raise PreferenceHandlerException(str(e))
+        self.cache.invalidate([user_id])
+        return preference
+
+    def delete_preference(self, user_id: str, channel) -> None:
+        channel = self._parse_channel(channel)
+        try:
+            deleted = NotificationPreferences.query.filter_by(user_id=user_id, channel=channel).delete()
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            raise PreferenceHandlerException(str(e))
+        if not deleted:
+            raise PreferenceHandlerException("preference not found")
+        self.cache.invalidate([user_id])
+
+    def load_many(self, user_ids) -> Dict[str, Dict[MessageType, ChannelPreference]]:
+        """Preferences of every user, from the cache or one query for the misses"""
+        user_ids = list(set(user_ids))
+        serialized = self.cache.get_many(user_ids)
+        misses = [user_id for user_id in user_ids if user_id not in serialized]
+        if misses:
+            loaded: Dict[str, dict] = {user_id: {} for user_id in misses}
+            prefs = NotificationPreferences
+            try:
+                rows = (
+                    self.db.session.query(
+                        prefs.user_id, prefs.channel, prefs.enabled, prefs.frequency_cap,
+                        prefs.quiet_hours_start, prefs.quiet_hours_end, prefs.timezone,
+                    )
+                    .filter(prefs.user_id.in_(misses))
+                    .order_by(prefs.updatedAt)
+                    .all()
+                )
+            except Exception as e:
+                raise PreferenceHandlerException(f"failed to load preferences: {e}")
+            for user_id, channel, enabled, frequency_cap, quiet_start, quiet_end, timezone in rows:
+                # ordered by updatedAt, so the latest row of a channel wins
+                loaded[user_id][channel.value] = [
+                    enabled,
+                    frequency_cap,
+                    quiet_start.isoformat() if quiet_start else None,
+                    quiet_end.isoformat() if quiet_end else None,
+                    timezone,
+                ]
+            fresh = {user_id: json.dumps(channels, separators=(",", ":")) for user_id, channels in loaded.items()}
+            self.cache.fill_many(fresh)
+            serialized.update(fresh)
+
+        return {
+            user_id: {
+                MessageType(channel): ChannelPreference(*fields)
+                for channel, fields in json.loads(value).items()
+            }
+            for user_id, value in serialized.items()
+        }
+
+    def evaluate_many(self, items: List[Tuple[str, MessageType, int]],
+                      preferences: Dict[str, Dict[MessageType, ChannelPreference]] = None) -> List[Tuple[str, Optional[object]]]:
+        """
+        Decide each (user_id, channel, send time in ms): (ALLOW, None),
+        (DEFER, end of the quiet window in ms) or (SUPPRESS, reason).
+        Channels without a preference row are allowed.
+        """
+        if preferences is None:
+            preferences = self.load_many(user_id for user_id, _, _ in items)
+        decisions = []
+        for user_id, channel, at_ms in items:
+            preference = preferences.get(user_id, {}).get(channel)
+            if preference is None:
+                decisions.append((ALLOW, None))
+            elif not preference.enabled:
+                decisions.append((SUPPRESS, f"user opted out of {channel.value}"))
+            else:
+                until = preference.quiet_until(at_ms)
+                decisions.append((ALLOW, None) if until is None else (DEFER, until))
+        return decisions
+
+    def consume_frequency_caps(self, items: List[Tuple[str, str, MessageType, int]],
+                               preferences: Dict[str, Dict[MessageType, ChannelPreference]] = None) -> List[Optional[str]]:
+        """
+        Count each (notification_id, user_id, channel, send time in ms)
+        against the user's daily cap of the channel; returns None for sends
+        within the cap and the reason for those over it. A notification
+        already counted that day (a retry or a deferred send) passes without
+        being counted again. One Lua call for the whole batch.
+        """
+        if preferences is None:
+            preferences = self.load_many(user_id for _, user_id, _, _ in items)
+        results: List[Optional[str]] = [None] * len(items)
+        keys, args, positions = [], [2 * 86400], []
+        for position, (notification_id, user_id, channel, at_ms) in enumerate(items):
+            preference = preferences.get(user_id, {}).get(channel)
+            if preference is None or preference.frequency_cap is None:
+                continue
+            day = datetime.fromtimestamp(at_ms / 1000, preference.zone).date().isoformat()
+            keys.append(CAP_KEY.format(user_id=user_id, channel=channel.value, day=day))
+            args.extend([preference.frequency_cap, notification_id])
+            positions.append(position)
+        if not keys:
+            return results
+        try:
+            counted = self._consume_caps(keys=keys, args=args)
+        except Exception as e:
+            # a Redis outage should not stop deliveries, the cap is best effort then
+            print(f"frequency cap check failed: {e}")
+            return results
+        for index, (position, ok) in enumerate(zip(positions, counted)):
+            if not ok:
+                cap = args[2 * index + 1]
+                results[position] = f"frequency cap of {cap} per day reached for {items[position][2].value}"
+        return results
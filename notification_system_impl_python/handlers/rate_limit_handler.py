@@ -0,0 +1,269 @@
+from configs.db import db
+from configs.redis import get_redis_pool
+from helpers.custom_exceptions import RateLimitHandlerException
+from helpers.helpers import now_ms
+from models.api_keys import APIKeys
+from models.rate_limit import RateLimit
+from models.users import Users
+from sqlalchemy import or_
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import os
+import uuid
+
+PENDING_KEY = "ratelimit:api:pending"
+API_KEY_CACHE_KEY = "ratelimit:api:key:{key_hash}"
+# cached in place of an owner for keys that are unknown, inactive or expired
+UNKNOWN_API_KEY = "-"
+
+# KEYS: current and previous window counter of every subject, then PENDING_KEY
+# ARGV: now_ms, window_ms, then limit, cost and pending field of every subject
+# returns {allowed, retry_after_ms}
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = now % window
+local weight = 1 - elapsed / window
+local subjects = (#KEYS - 1) / 2
+local retry_after = 0
+
+for i = 1, subjects do
+    local limit = tonumber(ARGV[3 * i])
+    local cost = tonumber(ARGV[3 * i + 1])
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    if previous * weight + current + cost > limit then
+        local wait = window - elapsed
+        if current + cost <= limit and previous > 0 then
+            -- the previous window's share decays enough before this one ends
+            wait = math.ceil(window * (1 - (limit - current - cost) / previous)) - elapsed
+        end
+        retry_after = math.max(retry_after, wait)
+    end
+end
+if retry_after > 0 then
+    return {0, retry_after}
+end
+
+for i = 1, subjects do
+    local cost = tonumber(ARGV[3 * i + 1])
+    redis.call('INCRBY', KEYS[2 * i - 1], cost)
+    redis.call('PEXPIRE', KEYS[2 * i - 1], window * 2)
+    redis.call('HINCRBY', KEYS[#KEYS], ARGV[3 * i + 2], cost)
+end
+return {1, 0}
+"""
+
+
+class RateLimitHandler:
+    """
+    Sliding-window API rate limits, checked in one Redis round trip. A
+    request with a valid API key counts against the key and its owner;
+    anything else counts against the client address, so switching to an
+    unknown key or a made-up user id does not reset the limit. The same call
+    adds the request to a pending hash that flush_pending() moves into
+    rate_limits in batches, off the request path.
+    """
+
+    LIMIT_USER = "user"
+    LIMIT_API_KEY = "api_key"
+    LIMIT_CLIENT = "client"
+
+    def __init__(self):
+        self.db = db
+        self.redis_client = get_redis_pool()
+        if not self.db:
+            raise RateLimitHandlerException("cannot connect to database")
+        if not self.redis_client:
+            raise RateLimitHandlerException("cannot connect to redis")
+        self.window_ms = int(float(os.getenv("API_RATE_LIMIT_WINDOW_SECONDS", "60")) * 1000)
+        self.limits = {
+            self.LIMIT_USER: int(os.getenv("API_RATE_LIMIT_PER_USER", "600")),
+            self.LIMIT_API_KEY: int(os.getenv("API_RATE_LIMIT_PER_API_KEY", "1200")),
+            self.LIMIT_CLIENT: int(os.getenv("API_RATE_LIMIT_PER_CLIENT", "600")),
+        }
+        self.api_key_cache_seconds = int(os.getenv("API_KEY_CACHE_SECONDS", "60"))
+        self._check = self.redis_client.register_script(_SLIDING_WINDOW_SCRIPT)
+
+    @staticmethod
+    def hash_api_key(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    def resolve_api_key(self, api_key: str) -> Tuple[str, Optional[str]]:
+        """
+        Hash of the key and the id of its owner, or None when the key is
+        unknown, inactive or expired. Lookups are cached in Redis for
+        API_KEY_CACHE_SECONDS.
+        """
+        key_hash = self.hash_api_key(api_key)
+        cache_key = API_KEY_CACHE_KEY.format(key_hash=key_hash)
+        try:
+            owner = self.redis_client.get(cache_key)
+        except Exception as e:
+            print(f"api key cache read failed: {e}")
+            owner = None
+        if owner is not None:
+            return key_hash, None if owner == UNKNOWN_API_KEY else owner
+
+        now = now_ms()
+        try:
+            row = (
+                self.db.session.query(APIKeys.user_id)
+                .filter(
+                    APIKeys.key_hash == key_hash,
+                    APIKeys.isActive.is_(True),
+                    or_(APIKeys.expireAt.is_(None), APIKeys.expireAt > now),
+                )
+                .first()
+            )
+        except Exception as e:
+            self.db.session.rollback()
+            raise RateLimitHandlerException(f"failed to verify api key: {e}")
+        owner = row[0] if row else None
+        try:
+            self.redis_client.set(cache_key, owner or UNKNOWN_API_KEY, ex=self.api_key_cache_seconds)
+        except Exception as e:
+            print(f"api key cache write failed: {e}")
+        return key_hash, owner
+
+    def subjects_for(self, api_key: Optional[str], client_address: Optional[str], cost: int) -> List[Tuple[str, str, int]]:
+        """The (limit_type, subject_id, cost) a request counts against, see the class docstring"""
+        if api_key:
+            key_hash, owner = self.resolve_api_key(api_key)
+            if owner:
+                return [(self.LIMIT_API_KEY, key_hash, cost), (self.LIMIT_USER, owner, cost)]
+        return [(self.LIMIT_CLIENT, client_address or "unknown", cost)]
+
+    def over_limit(self, subjects: List[Tuple[str, str, int]]) -> Optional[int]:
+        """The smallest limit a single request of these costs exceeds on its own, if any"""
+        exceeded = [self.limits[limit_type] for limit_type, _, cost in subjects if cost > self.limits[limit_type]]
+        return min(exceeded) if exceeded else None
+
+    def check(self, subjects: List[Tuple[str, str, int]]) -> Tuple[bool, int]:
+        """
+        Count a request against every (limit_type, subject_id, cost) given.
+        Returns (allowed, retry_after_seconds); a denied request is not counted
+        against any subject. Fails open when Redis is unreachable.
+        """
+        subjects = [subject for subject in subjects if subject[1] and subject[2] > 0]
+        if not subjects:
+            return True, 0
+
+        now = now_ms()
+        window = now // self.window_ms
+        window_start = window * self.window_ms
+        keys = []
+        args = [now, self.window_ms]
+        for limit_type, subject_id, cost in subjects:
+            keys.append(f"ratelimit:api:{limit_type}:{subject_id}:{window}")
+            keys.append(f"ratelimit:api:{limit_type}:{subject_id}:{window - 1}")
+            args.extend([self.limits[limit_type], cost, f"{limit_type}|{subject_id}|{window_start}"])
+        keys.append(PENDING_KEY)
+
+        try:
+            allowed, retry_after_ms = self._check(keys=keys, args=args)
+        except Exception as e:
+            print(f"rate limit check failed, allowing request: {e}")
+            return True, 0
+        return bool(allowed), -(-int(retry_after_ms) // 1000)
+
+    def flush_pending(self) -> int:
+        """Move the pending request counts into rate_limits; returns the number of rows written"""
+        flushing_key = f"{PENDING_KEY}:flushing:{uuid.uuid4().hex}"
+        try:
+            # RENAME is atomic, so requests counted from here on land in a fresh hash
+            self.redis_client.rename(PENDING_KEY, flushing_key)
+        except Exception as e:
+            if "no such key" in str(e).lower():
+                return 0
+            raise RateLimitHandlerException(f"failed to read pending rate limit counts: {e}")
+
+        pending = self.redis_client.hgetall(flushing_key)
+        try:
+            written = self._write_counts(pending)
+        except Exception as e:
+            # put the counts back so the next flush retries them
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, count in pending.items():
+                pipe.hincrby(PENDING_KEY, field, int(count))
+            pipe.delete(flushing_key)
+            pipe.execute()
+            raise RateLimitHandlerException(f"failed to flush rate limit counts: {e}")
+
+        self.redis_client.delete(flushing_key)
+        return written
+
+    def _write_counts(self, pending: Dict[str, str]) -> int:
+        counts: Dict[Tuple[str, int, str], int] = {}
+        key_hashes = set()
+        user_ids = set()
+        for field, count in pending.items():
+            limit_type, subject_id, window_start = field.split("|")
+            if limit_type == self.LIMIT_CLIENT:
+                # rate_limits is keyed by user, anonymous clients are only limited
+                continue
+            (key_hashes if limit_type == self.LIMIT_API_KEY else user_ids).add(subject_id)
+            counts[(limit_type, subject_id, int(window_start))] = int(count)
+
+        key_owners = {}
+        if key_hashes:
+            key_owners = dict(
+                self.db.session.query(APIKeys.key_hash, APIKeys.user_id)
+                .filter(APIKeys.key_hash.in_(key_hashes))
+                .all()
+            )
+        known_users = set()
+        if user_ids:
+            known_users = {
+                user_id for (user_id,) in
+                self.db.session.query(Users.id).filter(Users.id.in_(user_ids)).all()
+            }
+
+        # rate_limits is keyed by user, so API key counts are summed per key owner
+        rows: Dict[Tuple[str, int, str], int] = {}
+        for (limit_type, subject_id, window_start), count in counts.items():
+            user_id = key_owners.get(subject_id) if limit_type == self.LIMIT_API_KEY else subject_id
+            if user_id is None or (limit_type == self.LIMIT_USER and user_id not in known_users):
+                continue
+            row_key = (user_id, window_start, limit_type)
+            rows[row_key] = rows.get(row_key, 0) + count
+
+        if not rows:
+            return 0
+
+        session = self.db.session
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise RateLimitHandlerException(f"rate limit flush does not support {dialect}")
+
+        now = now_ms()
+        statement = insert(RateLimit).values([
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "window_start": window_start,
+                "limit_type": limit_type,
+                "request_count": count,
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            for (user_id, window_start, limit_type), count in rows.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "window_start", "limit_type"],
+            set_={
+                "request_count": RateLimit.request_count + statement.excluded.request_count,
+                "updated_at": now,
+            },
+        )
+        try:
+            session.execute(statement)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return len(rows)
@@ -3,12 +3,17 @@ from configs.redis import get_redis_pool
 from helpers.custom_exceptions import RetryHandlerException
 from helpers.constants import Constants
 from helpers.helpers import now_ms
+from helpers.instrumentation import RETRIES_SCHEDULED, db_commit_timer
+from helpers.notification_cache import get_notification_cache
 from models.notification import Notification
 from helpers.enums import NotificationStatus
 from handlers.dlq_handler import DLQHandler
+from queues.queue_factory import get_notification_queue, get_delay_queue
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, select, update
+from typing import List
+import os
 import random
-import json
 
 class RetryHandler:
     def __init__(self):
@@ -19,49 +24,93 @@ class RetryHandler:
         
         if not self.redis_client:
             raise RetryHandlerException("cannot redis client")
+        self.queue = get_notification_queue(self.redis_client)
+        self.delay_queue = get_delay_queue(self.redis_client, self.queue)
+        self.cache = get_notification_cache()
     
     def clean_old_retry(self):
         try:
-            cutoff = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp())
-            self.redis_client.zremrangebyscore(
-                "notification:retries",
-                min="-inf",
-                max=cutoff,
-            )
+            # anything this overdue was missed by the mover; the DB backfill owns it now
+            cutoff = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp() * 1000)
+            self.delay_queue.clean_older_than(cutoff)
         except Exception as e:
             print(e)
             raise RetryHandlerException(str(e))
         
     def process_due_retries(self) -> int:
+        """
+        Move every due notification from the delay queue to the work queue,
+        then backfill it from the DB: PENDING rows whose send_at passed more
+        than DELAY_QUEUE_BACKFILL_GRACE_SECONDS ago were missed by the delay
+        queue (created before it, or lost with Redis) and are added back.
+
+        Each page of overdue rows is taken with one UPDATE ... RETURNING
+        that moves their send_at to now, so the next tick does not queue the
+        same rows again while they wait for a worker. Rows a worker claimed
+        within DELIVERY_CLAIM_LEASE_SECONDS are left alone; immediate rows
+        (no send_at) are backfilled once such a claim has run out, as the
+        worker holding it died before recording a result.
+        """
         try:
-            current_time = int(now_ms())
-            try:
-                notifications = (
-                    Notification.query.filter(
+            moved = self.delay_queue.move_due()
+            grace_ms = int(os.getenv("DELAY_QUEUE_BACKFILL_GRACE_SECONDS", "300")) * 1000
+            lease_ms = int(os.getenv("DELIVERY_CLAIM_LEASE_SECONDS", "300")) * 1000
+            backfilled = 0
+            session = self.db.session
+            while True:
+                now = now_ms()
+                overdue = (
+                    select(Notification.id)
+                    .where(
                         Notification.status == NotificationStatus.PENDING,
-                        Notification.send_at.isnot(None),
-                        Notification.send_at <= current_time,
-                    ).limit(100)
-                    .all()
+                        or_(
+                            and_(
+                                Notification.send_at <= now - grace_ms,
+                                or_(
+                                    Notification.last_attempted.is_(None),
+                                    Notification.last_attempted < Notification.send_at,
+                                    Notification.last_attempted <= now - lease_ms,
+                                ),
+                            ),
+                            and_(
+                                Notification.send_at.is_(None),
+                                Notification.last_attempted <= now - lease_ms,
+                            ),
+                        ),
+                    )
+                    .order_by(Notification.id)
+                    .limit(Constants.BACKFILL_PAGE_SIZE)
+                    .with_for_update(skip_locked=True)
                 )
-            except Exception as e:
-                raise RetryHandlerException(f"failed to fetch due notifications: {e}")
-            if not notifications:
-                return 0
-            processed = 0
-            for notification in notifications:
-                notification_data = json.dumps({
-                    "id" : notification.id,
-                    "action" : "send"
-                })
-                
                 try:
-                    self.redis_client.lpush("notification:queue", notification_data)
-                    processed += 1
+                    ids = session.execute(
+                        update(Notification)
+                        .where(Notification.id.in_(overdue.scalar_subquery()))
+                        .values(send_at=now)
+                        .returning(Notification.id)
+                        .execution_options(synchronize_session=False)
+                    ).scalars().all()
+                    if ids:
+                        # committed before the ZADD: a lost ZADD is backfilled again after the grace period
+                        with db_commit_timer("RetryHandler.process_due_retries"):
+                            session.commit()
+                    else:
+                        session.rollback()
                 except Exception as e:
-                    print(e)
-                    continue
-            return processed
+                    session.rollback()
+                    raise RetryHandlerException(f"failed to fetch due notifications: {e}")
+                if not ids:
+                    break
+                self.cache.invalidate(ids)
+                self.delay_queue.schedule_many({notification_id: now for notification_id in ids})
+                backfilled += len(ids)
+                if len(ids) < Constants.BACKFILL_PAGE_SIZE:
+                    break
+
+            if backfilled:
+                print(f"Backfilled {backfilled} overdue notifications into the delay queue")
+                moved += self.delay_queue.move_due()
+            return moved
         except Exception as e:
             print(e)
             raise RetryHandlerException(str(e))
@@ -77,6 +126,22 @@ class RetryHandler:
         jitter = random.random() * delay * 0.1
         return int(delay + jitter)
     
+    def next_retry_at(self, attempts: int) -> int:
+        """Epoch milliseconds of the next attempt after `attempts` failures"""
+        delay = self.calculate_delay(attempts=attempts)
+        return int((datetime.now(timezone.utc).timestamp() + delay) * 1000)
+
+    def track_retries(self, retries: List[dict]) -> None:
+        """Put scheduled retries ({notification_id, attempt, retry_at in ms}) on the delay queue with one ZADD"""
+        if not retries:
+            return
+        try:
+            self.delay_queue.schedule_many({retry_info["notification_id"]: retry_info["retry_at"] for retry_info in retries})
+        except Exception as e:
+            print(e)
+            raise RetryHandlerException(str(e))
+        RETRIES_SCHEDULED.inc(len(retries))
+
     def schedule_retry(self, notification_id: str, attempts : int, error_message: str):
         if not notification_id or notification_id == "":
             raise RetryHandlerException("notification id is missing")
@@ -94,20 +159,20 @@ class RetryHandler:
                 )
                 return {"status": "moved_to_dlq", "notification_id": notification_id}
 
-            delay = self.calculate_delay(attempts=attempts)
-            next_retry_time = datetime.now(timezone.utc).timestamp() + delay
             notification.attempt_count = attempts
             notification.last_attempted = now_ms()
-            notification.send_at = int(next_retry_time * 1000)
+            notification.send_at = self.next_retry_at(attempts)
             notification.status = NotificationStatus.PENDING
             notification.error_message = error_message
-            self.db.session.commit()
+            with db_commit_timer("RetryHandler.schedule_retry"):
+                self.db.session.commit()
+            self.cache.invalidate([notification_id])
             retry_info = {
                 "notification_id": notification_id,
                 "attempt": attempts,
-                "retry_at": int(next_retry_time),
+                "retry_at": notification.send_at,
             }
-            self.redis_client.zadd("notification:retries", {json.dumps(retry_info): next_retry_time})
+            self.track_retries([retry_info])
             return retry_info
         except Exception as e:
             print(e)
@@ -0,0 +1,166 @@
+from configs.db import db
+from helpers.custom_exceptions import TemplateHandlerException, TemplateRenderException
+from helpers.enums import MessageType
+from helpers.helpers import now_ms
+from helpers.template_engine import CompiledTemplate, compile_text, get_template_cache, render_bulk
+from models.notification_template import NotificationTemplate
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, Iterable, List, Optional
+import json
+
+_UNSET = object()
+
+
+class TemplateHandler:
+    """
+    Notification templates with {{var}} placeholders. Notifications store the
+    template id and their variables; workers render them at send time from
+    the process-wide LRU of compiled templates, which is keyed by
+    (template id, updatedAt) so an edited template is recompiled on first use.
+    """
+
+    def __init__(self):
+        self.db = db
+        if not self.db:
+            raise TemplateHandlerException("database not initialized")
+        self.cache = get_template_cache()
+
+    @staticmethod
+    def _parse_message_type(message_type) -> MessageType:
+        if isinstance(message_type, MessageType):
+            return message_type
+        try:
+            return MessageType(str(message_type).upper())
+        except ValueError:
+            raise TemplateHandlerException("invalid message_type")
+
+    @staticmethod
+    def _variables(subject: Optional[str], body: str) -> str:
+        return json.dumps(sorted(compile_text(subject)[1] | compile_text(body)[1]))
+
+    def create_template(
+        self,
+        name: str,
+        message_type,
+        body: str,
+        subject: Optional[str] = None,
+        created_by: Optional[str] = None,
+    ) -> NotificationTemplate:
+        if not name or not body or not message_type:
+            raise TemplateHandlerException("name, message_type and body are required")
+        template = NotificationTemplate(
+            name=name,
+            message_type=self._parse_message_type(message_type),
+            subject=subject,
+            body=body,
+            variables=self._variables(subject, body),
+            is_active=True,
+            created_by=created_by,
+        )
+        session = self.db.session
+        try:
+            session.add(template)
+            session.commit()
+        except IntegrityError as e:
+            session.rollback()
+            if "name" in str(e.orig).lower():
+                raise TemplateHandlerException(f"template {name} already exists")
+            raise TemplateHandlerException(str(e))
+        except Exception as e:
+            session.rollback()
+            raise TemplateHandlerException(str(e))
+        return template
+
+    def update_template(self, name: str, subject=_UNSET, body=_UNSET, is_active=_UNSET) -> NotificationTemplate:
+        """Change a template; the new updatedAt makes workers recompile it"""
+        template = self.get_template(name)
+        if subject is not _UNSET:
+            template.subject = subject
+        if body is not _UNSET:
+            if not body:
+                raise TemplateHandlerException("body cannot be empty")
+            template.body = body
+        if is_active is not _UNSET:
+            template.is_active = bool(is_active)
+        template.variables = self._variables(template.subject, template.body)
+        # updatedAt is the cache key, so it has to move even within the same millisecond
+        template.updatedAt = max(now_ms(), template.updatedAt + 1)
+        try:
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            raise TemplateHandlerException(str(e))
+        return template
+
+    def get_template(self, name: str) -> NotificationTemplate:
+        template = NotificationTemplate.query.filter_by(name=name).first()
+        if not template:
+            raise TemplateHandlerException("template not found")
+        return template
+
+    def list_templates(self, message_type=None, active: Optional[bool] = None) -> List[NotificationTemplate]:
+        query = NotificationTemplate.query
+        if message_type:
+            query = query.filter(NotificationTemplate.message_type == self._parse_message_type(message_type))
+        if active is not None:
+            query = query.filter(NotificationTemplate.is_active == active)
+        return query.order_by(NotificationTemplate.name).all()
+
+    def _compiled(self, criterion) -> List[CompiledTemplate]:
+        # the (id, updated_at) probe is enough for cache hits; bodies load only for misses
+        try:
+            rows = (
+                self.db.session.query(NotificationTemplate.id, NotificationTemplate.updatedAt)
+                .filter(criterion)
+                .all()
+            )
+            compiled = []
+            misses = []
+            for template_id, updated_at in rows:
+                hit = self.cache.get(template_id, updated_at)
+                if hit is None:
+                    misses.append(template_id)
+                else:
+                    compiled.append(hit)
+            if misses:
+                for template in NotificationTemplate.query.filter(NotificationTemplate.id.in_(misses)).all():
+                    compiled.append(self.cache.put(CompiledTemplate.from_model(template)))
+            return compiled
+        except Exception as e:
+            raise TemplateHandlerException(f"failed to load templates: {e}")
+
+    def compiled_by_name(self, names: Iterable[str]) -> Dict[str, CompiledTemplate]:
+        """Active templates by name, for creating notifications"""
+        names = set(names)
+        if not names:
+            return {}
+        return {
+            compiled.name: compiled
+            for compiled in self._compiled(and_(NotificationTemplate.name.in_(names), NotificationTemplate.is_active.is_(True)))
+        }
+
+    def compiled_by_id(self, template_ids: Iterable[str]) -> Dict[str, CompiledTemplate]:
+        """Templates by id, deactivated ones included, for rendering queued notifications"""
+        template_ids = set(template_ids)
+        if not template_ids:
+            return {}
+        return {compiled.id: compiled for compiled in self._compiled(NotificationTemplate.id.in_(template_ids))}
+
+    def render(self, name: str, variables: dict) -> dict:
+        compiled = self.compiled_by_name([name]).get(name)
+        if compiled is None:
+            raise TemplateHandlerException("template not found or inactive")
+        try:
+            return compiled.render(variables)
+        except TemplateRenderException as e:
+            raise TemplateHandlerException(str(e))
+
+    def render_many(self, name: str, variables_list: List[dict]) -> List[dict]:
+        """Render a campaign's variable sets; large lists go through the render process pool"""
+        compiled = self.compiled_by_name([name]).get(name)
+        if compiled is None:
+            raise TemplateHandlerException("template not found or inactive")
+        if not all(isinstance(variables, dict) for variables in variables_list):
+            raise TemplateHandlerException("variables must be objects")
+        return render_bulk(compiled, variables_list)
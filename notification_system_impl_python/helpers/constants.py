@@ -4,4 +4,11 @@ class Constants:
     MAX_ATTEMPTS : int = 5
     BASE_DELAY : int = 60 
     MAX_DELAY : int = 3600 
-    EXPONENTIAL_BASE : int = 2
\ No newline at end of file
+    EXPONENTIAL_BASE : int = 2
+    IDEMPOTENCY_TTL : int = 86400
+    BULK_COPY_THRESHOLD : int = 1000
+    ENQUEUE_CHUNK_SIZE : int = 5000
+    FCM_MULTICAST_LIMIT : int = 500
+    BACKFILL_PAGE_SIZE : int = 1000
+    EXPORT_YIELD_PER : int = 5000
+    EXPORT_FLUSH_BYTES : int = 256 * 1024
@@ -12,3 +12,27 @@ class NotificationHandlerException(Exception):
 
 class DLQHandlerException(Exception):
     pass
+
+class DeliveryHandlerException(Exception):
+    pass
+
+class MetricsHandlerException(Exception):
+    pass
+
+class RateLimitHandlerException(Exception):
+    pass
+
+class OutboxHandlerException(Exception):
+    pass
+
+class ExportHandlerException(Exception):
+    pass
+
+class TemplateHandlerException(Exception):
+    pass
+
+class TemplateRenderException(Exception):
+    pass
+
+class PreferenceHandlerException(Exception):
+    pass
@@ -0,0 +1,100 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+PENDING_KEY = "metrics:delivery:pending"
+COUNTERS = ("sent", "failed", "pending", "delivery_ms")
+
+
+class DeliveryMetrics:
+    """
+    Delivery counters of this process per (date, hour, provider, message_type),
+    kept in memory and added to the PENDING_KEY hash with one pipelined
+    HINCRBY per field at most every DELIVERY_METRICS_FLUSH_SECONDS. The
+    rollup_delivery_metrics beat task moves that hash into notification_metrics.
+
+    Every attempt counts once: sent (delivered, with its end-to-end delivery
+    time), pending (put back for a retry or deferred) or failed (out of
+    retries).
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.flush_seconds = float(os.getenv("DELIVERY_METRICS_FLUSH_SECONDS", "5"))
+        self.counts: Dict[Tuple[str, int, str, str], Dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+        return self._redis_client
+
+    def observe(self, at_ms: int, provider: str, message_type: str, outcome: str, delivery_ms: int = 0) -> None:
+        at = datetime.fromtimestamp(at_ms / 1000, tz=timezone.utc)
+        key = (at.date().isoformat(), at.hour, provider, message_type)
+        with self.lock:
+            counts = self.counts.get(key)
+            if counts is None:
+                counts = self.counts[key] = dict.fromkeys(COUNTERS, 0)
+            counts[outcome] += 1
+            if outcome == "sent":
+                counts["delivery_ms"] += max(0, delivery_ms)
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self.flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> int:
+        """Add the counters collected so far to Redis; returns the number of buckets flushed"""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            self.flushed_at = time.monotonic()
+        if not counts:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for (day, hour, provider, message_type), values in counts.items():
+                for counter, value in values.items():
+                    if value:
+                        pipe.hincrby(PENDING_KEY, f"{day}|{hour}|{provider}|{message_type}|{counter}", value)
+            pipe.execute()
+        except Exception as e:
+            # keep them for the next flush rather than losing the interval
+            with self.lock:
+                for key, values in counts.items():
+                    current = self.counts.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                    for counter, value in values.items():
+                        current[counter] += value
+            print(f"delivery metrics flush failed: {e}")
+            return 0
+        return len(counts)
+
+
+_delivery_metrics = None
+
+
+def get_delivery_metrics() -> DeliveryMetrics:
+    global _delivery_metrics
+    if _delivery_metrics is None:
+        _delivery_metrics = DeliveryMetrics()
+        atexit.register(_delivery_metrics.flush)
+    return _delivery_metrics
+
+
+def _reset_after_fork():
+    # counters collected by the parent are flushed by the parent; the child
+    # also inherits its atexit hook, so empty the inherited instance
+    global _delivery_metrics
+    if _delivery_metrics is not None:
+        _delivery_metrics.counts = {}
+        _delivery_metrics.lock = threading.Lock()
+    _delivery_metrics = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
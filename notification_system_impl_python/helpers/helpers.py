@@ -1,4 +1,7 @@
 from datetime import datetime, timezone
+from enum import Enum
+from typing import List, Optional, Tuple
+import base64
 import uuid
 
 def now_ms():
@@ -6,4 +9,42 @@ def now_ms():
 
 
 def get_id():
-    return str(uuid.uuid4())
\ No newline at end of file
+    return str(uuid.uuid4())
+
+
+def encode_cursor(sort_value: int, row_id: str) -> str:
+    """Opaque keyset cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(f"{sort_value}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_value, row_id = raw.split(":", 1)
+        return int(sort_value), row_id
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def project_columns(model, fields: Optional[List[str]], required: List[str]) -> List:
+    """
+    Column attributes of `model` for the given column names (as to_dict
+    names them), always including `required`; None selects every column
+    """
+    by_name = {attr.columns[0].name: attr for attr in model.__mapper__.column_attrs}
+    if not fields:
+        return list(by_name.values())
+    unknown = [field for field in fields if field not in by_name]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    names = list(dict.fromkeys(list(fields) + [name for name in required if name not in fields]))
+    return [by_name[name] for name in names]
+
+
+def row_to_dict(row, attrs: List) -> dict:
+    data = {}
+    for attr, value in zip(attrs, row):
+        if isinstance(value, Enum):
+            value = value.value
+        data[attr.columns[0].name] = value
+    return data
@@ -0,0 +1,127 @@
+"""
+Prometheus metrics shared by the API, the Celery workers, the queue
+consumer and the asyncio worker.
+
+With PROMETHEUS_MULTIPROC_DIR set (see .env.example), every process
+writes its samples to memory-mapped files in that directory and /metrics on
+the Flask app aggregates them, so it covers the workers on the same host.
+Queue depths are read from Redis when /metrics is scraped.
+"""
+
+import os
+import time
+from dotenv import load_dotenv
+
+# prometheus_client picks file-backed values at import when PROMETHEUS_MULTIPROC_DIR is set
+load_dotenv()
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+NOTIFICATIONS_DISPATCHED = Counter(
+    "notifications_dispatched_total",
+    "Notification ids taken off the work queue and handed to delivery",
+)
+DELIVERIES = Counter(
+    "notification_deliveries_total",
+    "Delivery attempts by provider and outcome (sent, retry, deferred, failed)",
+    ["provider", "outcome"],
+)
+PROVIDER_CALL_SECONDS = Histogram(
+    "provider_call_seconds",
+    "Duration of one provider send call (a batch or FCM multicast counts once)",
+    ["provider"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds",
+    "Duration of session.commit() by handler method",
+    ["method"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+RETRIES_SCHEDULED = Counter(
+    "notification_retries_scheduled_total",
+    "Notifications put on the delay queue for another attempt",
+)
+DLQ_MOVES = Counter(
+    "notification_dlq_moves_total",
+    "Notifications moved to the dead letter queue by reason",
+    ["reason"],
+)
+IDEMPOTENCY_REJECTS = Counter(
+    "notification_idempotency_rejects_total",
+    "Create requests rejected as duplicates of an earlier idempotency key",
+)
+
+
+class _CommitTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+_commit_histograms = {}
+
+
+def db_commit_timer(method: str) -> _CommitTimer:
+    """Context manager timing one commit into db_commit_seconds{method}"""
+    histogram = _commit_histograms.get(method)
+    if histogram is None:
+        histogram = _commit_histograms[method] = DB_COMMIT_SECONDS.labels(method)
+    return _CommitTimer(histogram)
+
+
+class QueueDepthCollector:
+    """Reports the work queue and delay queue depth when /metrics is scraped"""
+
+    def collect(self):
+        from configs.redis import get_redis_pool
+        from queues.queue_factory import get_notification_queue, get_delay_queue
+
+        depth = GaugeMetricFamily("notification_queue_depth", "Items waiting in each Redis queue", labels=["queue"])
+        try:
+            redis_client = get_redis_pool()
+            queue = get_notification_queue(redis_client)
+            delay_queue = get_delay_queue(redis_client, queue)
+            depth.add_metric([queue.key], queue.depth())
+            depth.add_metric([delay_queue.key], delay_queue.depth())
+        except Exception as e:
+            print(f"failed to read queue depth for metrics: {e}")
+        yield depth
+
+
+_queue_registry = CollectorRegistry()
+_queue_registry.register(QueueDepthCollector())
+
+
+def render_metrics():
+    """Exposition body and content type for /metrics"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_queue_registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live-gauge files of an exited worker process (multiprocess mode only)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
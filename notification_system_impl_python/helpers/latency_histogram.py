@@ -0,0 +1,145 @@
+import atexit
+import os
+import time
+from typing import Dict, List, Tuple
+
+HISTOGRAM_KEY = "metrics:latency:{series}:{window}"
+SERIES_KEY = "metrics:latency:series"
+
+CREATE_TO_SEND = "create_to_send"
+QUEUE_WAIT = "queue_wait"
+PROVIDER_CALL = "provider_call"
+METRICS = (CREATE_TO_SEND, QUEUE_WAIT, PROVIDER_CALL)
+
+# log-linear buckets: values below 32 ms get their own bucket, above that
+# every power of two is split into 16 buckets (relative error under 6.25%)
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS * 2
+BUCKET_COUNT = (64 - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+
+def bucket_index(value_ms: int) -> int:
+    if value_ms < LINEAR_LIMIT:
+        return value_ms if value_ms > 0 else 0
+    shift = value_ms.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value_ms >> shift)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Lowest and highest value (ms) that fall into a bucket"""
+    if index < LINEAR_LIMIT:
+        return index, index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+def percentiles(counts: Dict[int, int], quantiles: List[float]) -> Dict[float, int]:
+    """Value (bucket midpoint, ms) at each quantile of a merged histogram"""
+    total = sum(counts.values())
+    results = {}
+    if not total:
+        return {quantile: None for quantile in quantiles}
+    buckets = sorted(counts.items())
+    for quantile in quantiles:
+        rank = max(1, -(-int(quantile * total * 1000) // 1000))
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                results[quantile] = (low + high) // 2
+                break
+    return results
+
+
+class LatencyRecorder:
+    """
+    Latency histograms of this process per (metric, provider, message_type).
+    record() takes integer milliseconds and only bumps a list slot, so it
+    stays on in production; it is meant to be called from one thread (the
+    Celery task or the asyncio worker's DB thread). flush() adds the counts
+    to the current
+    LATENCY_WINDOW_SECONDS window in Redis with HINCRBY, so every worker's
+    histograms merge there.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.flush_seconds = float(os.getenv("DELIVERY_METRICS_FLUSH_SECONDS", "5"))
+        self.window_seconds = int(os.getenv("LATENCY_WINDOW_SECONDS", "60"))
+        self.retention_seconds = int(os.getenv("LATENCY_RETENTION_SECONDS", "86400"))
+        self.histograms: Dict[Tuple[str, str, str], List[int]] = {}
+        self.flushed_at = time.monotonic()
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+        return self._redis_client
+
+    def record(self, metric: str, provider: str, message_type: str, value_ms: int) -> None:
+        histogram = self.histograms.get((metric, provider, message_type))
+        if histogram is None:
+            histogram = self.histograms[(metric, provider, message_type)] = [0] * BUCKET_COUNT
+        if value_ms < LINEAR_LIMIT:
+            histogram[value_ms if value_ms > 0 else 0] += 1
+        else:
+            shift = value_ms.bit_length() - SUB_BUCKET_BITS - 1
+            histogram[(shift << SUB_BUCKET_BITS) + (value_ms >> shift)] += 1
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self.flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> int:
+        """Merge the histograms recorded so far into Redis; returns the number of series flushed"""
+        histograms, self.histograms = self.histograms, {}
+        self.flushed_at = time.monotonic()
+        if not histograms:
+            return 0
+        window = int(time.time()) // self.window_seconds * self.window_seconds
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for (metric, provider, message_type), histogram in histograms.items():
+                series = f"{metric}|{provider}|{message_type}"
+                key = HISTOGRAM_KEY.format(series=series, window=window)
+                for index, count in enumerate(histogram):
+                    if count:
+                        pipe.hincrby(key, index, count)
+                pipe.expire(key, self.retention_seconds)
+                pipe.sadd(SERIES_KEY, series)
+            pipe.execute()
+        except Exception as e:
+            # merge them back for the next flush
+            for series, histogram in histograms.items():
+                current = self.histograms.setdefault(series, [0] * BUCKET_COUNT)
+                for index, count in enumerate(histogram):
+                    current[index] += count
+            print(f"latency histogram flush failed: {e}")
+            return 0
+        return len(histograms)
+
+
+_latency_recorder = None
+
+
+def get_latency_recorder() -> LatencyRecorder:
+    global _latency_recorder
+    if _latency_recorder is None:
+        _latency_recorder = LatencyRecorder()
+        atexit.register(_latency_recorder.flush)
+    return _latency_recorder
+
+
+def _reset_after_fork():
+    # the child inherits the parent's atexit hook, so empty the inherited recorder
+    global _latency_recorder
+    if _latency_recorder is not None:
+        _latency_recorder.histograms = {}
+    _latency_recorder = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,75 @@
+import os
+from typing import Iterable, Optional
+
+CACHE_KEY = "notification:cache:{id}"
+# marks a notification whose status just changed; readers go to the DB and
+# may not cache until it expires, so a read that started before the change
+# cannot put the old row back
+INVALIDATED = "-"
+
+
+class NotificationCache:
+    """
+    Read-through cache of serialized notifications for GET /notifications/<id>,
+    kept for NOTIFICATION_CACHE_TTL_SECONDS. Every status change calls
+    invalidate(), which replaces the entry with a marker for
+    NOTIFICATION_CACHE_HOLD_MS; fills use SET NX, so they cannot overwrite
+    it. Redis errors never fail the caller: reads fall through to the DB
+    and a lost invalidation is bounded by the TTL.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.ttl_seconds = int(os.getenv("NOTIFICATION_CACHE_TTL_SECONDS", "5"))
+        self.hold_ms = int(os.getenv("NOTIFICATION_CACHE_HOLD_MS", "1000"))
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+        return self._redis_client
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, notification_id: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            cached = self.redis_client.get(CACHE_KEY.format(id=notification_id))
+        except Exception as e:
+            print(f"notification cache read failed: {e}")
+            return None
+        return None if cached is None or cached == INVALIDATED else cached
+
+    def fill(self, notification_id: str, serialized: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.redis_client.set(CACHE_KEY.format(id=notification_id), serialized, nx=True, ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"notification cache fill failed: {e}")
+
+    def invalidate(self, notification_ids: Iterable[str]) -> None:
+        notification_ids = list(notification_ids)
+        if not notification_ids or not self.enabled:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for notification_id in notification_ids:
+                pipe.set(CACHE_KEY.format(id=notification_id), INVALIDATED, px=self.hold_ms)
+            pipe.execute()
+        except Exception as e:
+            print(f"notification cache invalidation failed: {e}")
+
+
+_notification_cache = None
+
+
+def get_notification_cache() -> NotificationCache:
+    global _notification_cache
+    if _notification_cache is None:
+        _notification_cache = NotificationCache()
+    return _notification_cache
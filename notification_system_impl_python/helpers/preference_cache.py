@@ -0,0 +1,80 @@
+import os
+from typing import Dict, Iterable, List, Optional
+
+CACHE_KEY = "preferences:cache:{user_id}"
+# same marker as the notification cache: a user whose preferences just
+# changed is read from the DB and not cached until it expires
+INVALIDATED = "-"
+
+
+class PreferenceCache:
+    """
+    Per-user cache of notification preferences (every channel in one JSON
+    value, "{}" for users without any) kept for PREFERENCE_CACHE_TTL_SECONDS.
+    Lookups for a whole batch are one MGET. Updates call invalidate(), which
+    holds a marker for PREFERENCE_CACHE_HOLD_MS that SET NX fills cannot
+    overwrite. Redis errors fall through to the DB.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.ttl_seconds = int(os.getenv("PREFERENCE_CACHE_TTL_SECONDS", "300"))
+        self.hold_ms = int(os.getenv("PREFERENCE_CACHE_HOLD_MS", "1000"))
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+        return self._redis_client
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get_many(self, user_ids: List[str]) -> Dict[str, Optional[str]]:
+        if not user_ids or not self.enabled:
+            return {}
+        try:
+            values = self.redis_client.mget([CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+        except Exception as e:
+            print(f"preference cache read failed: {e}")
+            return {}
+        return {
+            user_id: value
+            for user_id, value in zip(user_ids, values)
+            if value is not None and value != INVALIDATED
+        }
+
+    def fill_many(self, serialized: Dict[str, str]) -> None:
+        if not serialized or not self.enabled:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id, value in serialized.items():
+                pipe.set(CACHE_KEY.format(user_id=user_id), value, nx=True, ex=self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            print(f"preference cache fill failed: {e}")
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        user_ids = list(user_ids)
+        if not user_ids or not self.enabled:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.set(CACHE_KEY.format(user_id=user_id), INVALIDATED, px=self.hold_ms)
+            pipe.execute()
+        except Exception as e:
+            print(f"preference cache invalidation failed: {e}")
+
+
+_preference_cache = None
+
+
+def get_preference_cache() -> PreferenceCache:
+    global _preference_cache
+    if _preference_cache is None:
+        _preference_cache = PreferenceCache()
+    return _preference_cache
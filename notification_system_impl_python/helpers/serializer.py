@@ -0,0 +1,103 @@
+from decimal import Decimal
+from enum import Enum
+from flask.json.provider import DefaultJSONProvider
+from typing import Dict, Iterable, List, Tuple
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+
+class _Plan:
+    """Column accessor plan of one model, compiled on first use"""
+
+    __slots__ = ("names", "keys", "enum_positions")
+
+    def __init__(self, model):
+        exclude = set(getattr(model, "__serialize_exclude__", ()))
+        attrs = [attr for attr in model.__mapper__.column_attrs if attr.columns[0].name not in exclude]
+        self.names: Tuple[str, ...] = tuple(attr.columns[0].name for attr in attrs)
+        self.keys: Tuple[str, ...] = tuple(attr.key for attr in attrs)
+        self.enum_positions: Tuple[int, ...] = tuple(
+            i for i, attr in enumerate(attrs) if getattr(attr.columns[0].type, "enum_class", None) is not None
+        )
+
+    def values(self, obj) -> list:
+        # loaded columns sit in the instance dict; expired or deferred ones
+        # go through the attribute so they still load
+        state = obj.__dict__
+        try:
+            values = [state[key] for key in self.keys]
+        except KeyError:
+            values = [state[key] if key in state else getattr(obj, key) for key in self.keys]
+        for i in self.enum_positions:
+            value = values[i]
+            if value is not None:
+                values[i] = value.value
+        return values
+
+
+_plans: Dict[type, _Plan] = {}
+
+
+def _plan(model) -> _Plan:
+    plan = _plans.get(model)
+    if plan is None:
+        plan = _plans[model] = _Plan(model)
+    return plan
+
+
+def serialize(obj) -> dict:
+    """
+    Columns of a model instance keyed by column name, enums as their values.
+    Columns listed in the model's __serialize_exclude__ are left out.
+    """
+    plan = _plan(type(obj))
+    return dict(zip(plan.names, plan.values(obj)))
+
+
+def serialize_many(objs: Iterable) -> List[dict]:
+    results = []
+    plan = None
+    model = None
+    for obj in objs:
+        if type(obj) is not model:
+            model = type(obj)
+            plan = _plan(model)
+        results.append(dict(zip(plan.names, plan.values(obj))))
+    return results
+
+
+def _default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_stdlib_encode = json.JSONEncoder(separators=(",", ":"), default=_default).encode
+
+
+def dumps(data) -> bytes:
+    """Compact JSON as UTF-8 bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return _stdlib_encode(data).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that renders jsonify responses through dumps()"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype=self.mimetype)
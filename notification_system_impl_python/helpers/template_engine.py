@@ -0,0 +1,173 @@
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import FrozenSet, List, Optional, Tuple
+from helpers.custom_exceptions import TemplateRenderException
+from helpers.enums import MessageType
+from helpers.serializer import dumps
+
+# {{ name }}; names are identifiers so they map straight onto str.format_map keys
+VARIABLE = re.compile(r"{{\s*([A-Za-z_][A-Za-z0-9_]*)\s*}}")
+
+# payload field the rendered subject goes to, per channel
+SUBJECT_FIELDS = {MessageType.EMAIL: "subject", MessageType.PUSH: "title"}
+
+
+def compile_text(text: Optional[str]) -> Tuple[Optional[str], FrozenSet[str]]:
+    """Turn {{var}} text into a str.format_map pattern and the variables it uses"""
+    if text is None:
+        return None, frozenset()
+    pattern = []
+    names = set()
+    position = 0
+    for match in VARIABLE.finditer(text):
+        pattern.append(text[position:match.start()].replace("{", "{{").replace("}", "}}"))
+        pattern.append("{" + match.group(1) + "}")
+        names.add(match.group(1))
+        position = match.end()
+    pattern.append(text[position:].replace("{", "{{").replace("}", "}}"))
+    return "".join(pattern), frozenset(names)
+
+
+class CompiledTemplate:
+    """
+    A NotificationTemplate compiled once per (id, updatedAt). render() fills
+    the subject and body in one format_map call each and returns the payload
+    a provider expects: the variables (recipient fields included) plus body
+    and the channel's subject field.
+    """
+
+    __slots__ = ("id", "updated_at", "name", "message_type", "subject", "body", "variables")
+
+    def __init__(self, template_id: str, updated_at: int, name: str, message_type: MessageType,
+                 subject: Optional[str], body: str):
+        self.id = template_id
+        self.updated_at = updated_at
+        self.name = name
+        self.message_type = message_type
+        self.subject, subject_names = compile_text(subject)
+        self.body, body_names = compile_text(body)
+        self.variables = subject_names | body_names
+
+    @classmethod
+    def from_model(cls, template) -> "CompiledTemplate":
+        return cls(template.id, template.updatedAt, template.name, template.message_type, template.subject, template.body)
+
+    def missing(self, variables: dict) -> List[str]:
+        return sorted(name for name in self.variables if name not in variables)
+
+    def render(self, variables: dict) -> dict:
+        try:
+            payload = dict(variables)
+            payload["body"] = self.body.format_map(variables)
+            if self.subject is not None and self.message_type in SUBJECT_FIELDS:
+                payload[SUBJECT_FIELDS[self.message_type]] = self.subject.format_map(variables)
+        except KeyError as e:
+            raise TemplateRenderException(f"template {self.name} is missing variable {e.args[0]}")
+        except (ValueError, TypeError) as e:
+            raise TemplateRenderException(f"template {self.name} failed to render: {e}")
+        return payload
+
+    def render_json(self, variables: dict) -> str:
+        return dumps(self.render(variables)).decode()
+
+
+class TemplateCache:
+    """LRU of compiled templates keyed by (template id, updatedAt), so an edit is a miss"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or int(os.getenv("TEMPLATE_CACHE_SIZE", "512"))
+        self._entries: "OrderedDict[Tuple[str, int], CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id: str, updated_at: int) -> Optional[CompiledTemplate]:
+        key = (template_id, updated_at)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+            return compiled
+
+    def put(self, compiled: CompiledTemplate) -> CompiledTemplate:
+        with self._lock:
+            self._entries[(compiled.id, compiled.updated_at)] = compiled
+            self._entries.move_to_end((compiled.id, compiled.updated_at))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_template_cache = None
+
+
+def get_template_cache() -> TemplateCache:
+    global _template_cache
+    if _template_cache is None:
+        _template_cache = TemplateCache()
+    return _template_cache
+
+
+def _render_chunk(compiled: CompiledTemplate, chunk: List[dict]) -> List[dict]:
+    rendered = []
+    for variables in chunk:
+        try:
+            rendered.append({"payload": compiled.render(variables)})
+        except TemplateRenderException as e:
+            rendered.append({"error": str(e)})
+    return rendered
+
+
+_render_pool = None
+
+
+def _render_processes() -> int:
+    return int(os.getenv("TEMPLATE_RENDER_PROCESSES", "0")) or os.cpu_count() or 1
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        # forkserver children start clean instead of copying the app's DB and Redis connections
+        _render_pool = ProcessPoolExecutor(
+            max_workers=_render_processes(),
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+        atexit.register(_render_pool.shutdown, wait=False, cancel_futures=True)
+    return _render_pool
+
+
+def render_bulk(compiled: CompiledTemplate, variables_list: List[dict]) -> List[dict]:
+    """
+    Render one template for many variable sets, in order. Each result is
+    {"payload": {...}} or {"error": "..."}. Campaign-sized lists (at least
+    TEMPLATE_POOL_MIN_ITEMS) are split into chunks across a process pool.
+    """
+    processes = _render_processes()
+    if processes < 2 or len(variables_list) < int(os.getenv("TEMPLATE_POOL_MIN_ITEMS", "5000")):
+        return _render_chunk(compiled, variables_list)
+    pool = _get_render_pool()
+    chunk_size = max(500, -(-len(variables_list) // (processes * 4)))
+    futures = [
+        pool.submit(_render_chunk, compiled, variables_list[start:start + chunk_size])
+        for start in range(0, len(variables_list), chunk_size)
+    ]
+    rendered = []
+    for future in futures:
+        rendered.extend(future.result())
+    return rendered
+
+
+def _reset_after_fork():
+    # a forked child cannot use the parent's pool processes
+    global _render_pool
+    _render_pool = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
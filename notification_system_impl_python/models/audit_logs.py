@@ -1,9 +1,9 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from helpers.enums import ResourceType, ActionType
 from sqlalchemy import Index
-from enum import Enum
 
 
 class AuditLogs(db.Model):
@@ -47,10 +47,4 @@ class AuditLogs(db.Model):
         return f"<AuditLogs id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
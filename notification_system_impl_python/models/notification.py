@@ -1,9 +1,9 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from sqlalchemy import Index
 from helpers.enums import MessageType, ProviderType, NotificationStatus
-from enum import Enum
 
 
 class Notification(db.Model):
@@ -12,6 +12,7 @@ class Notification(db.Model):
         Index("idx_user_type", "user_id", "message_type"),
         Index("idx_user_status", "user_id", "status"),
         Index("idx_status_created", "status", "created_at"),
+        Index("idx_user_created", "user_id", "created_at"),
         Index("idx_send_at", "send_at"),
         Index("idx_idempotency", "idempotency_key", unique=True),
     )
@@ -48,6 +49,8 @@ class Notification(db.Model):
         nullable=False,
         default=NotificationStatus.PENDING,
     )
+    # with a template the payload holds its variables and the recipient fields
+    template_id = db.Column(db.String(36), db.ForeignKey("notification_templates.id", onupdate="CASCADE", ondelete="RESTRICT"))
     payload = db.Column(db.Text, nullable=False)
     attempt_count = db.Column(db.Integer, nullable=False, default=0)
     max_retries = db.Column(db.Integer, nullable=False, default=5)
@@ -67,10 +70,4 @@ class Notification(db.Model):
         return f"<Notification id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
@@ -1,16 +1,17 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from datetime import date
 from sqlalchemy import Index
 from helpers.enums import MessageType
-from enum import Enum
 
 
 class NotificationMetrics(db.Model):
     __tablename__ = "notification_metrics"
     __table_args__ = (
         Index("idx_metrics_date", "date", "hour"),
+        Index("idx_metrics_bucket", "date", "hour", "provider", "message_type", unique=True),
         Index("idx_metrics_provider", "provider"),
         Index("idx_metrics_type", "message_type"),
     )
@@ -32,6 +33,8 @@ class NotificationMetrics(db.Model):
     total_failed = db.Column(db.Integer, nullable=False, default=0)
     total_pending = db.Column(db.Integer, nullable=False, default=0)
     avg_delivery_ms = db.Column(db.BigInteger)
+    # sum of the delivery times behind avg_delivery_ms, so averages over several rows stay exact
+    total_delivery_ms = db.Column(db.BigInteger)
     createdAt = db.Column("created_at", db.BigInteger, nullable=False, default=now_ms)
     updatedAt = db.Column("updated_at", db.BigInteger, nullable=False, default=now_ms, onupdate=now_ms)
 
@@ -39,10 +42,4 @@ class NotificationMetrics(db.Model):
         return f"<NotificationMetrics id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
@@ -0,0 +1,23 @@
+from configs.db import db
+from helpers.helpers import now_ms
+from helpers.serializer import serialize
+import uuid
+from sqlalchemy import Index
+
+
+class NotificationOutbox(db.Model):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("idx_outbox_created", "created_at"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    notification_id = db.Column(db.String(36), db.ForeignKey("notifications.id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
+    send_at = db.Column(db.BigInteger)
+    createdAt = db.Column("created_at", db.BigInteger, nullable=False, default=now_ms)
+
+    def __repr__(self):
+        return f"<NotificationOutbox id={self.id}>"
+
+    def to_dict(self):
+        return serialize(self)
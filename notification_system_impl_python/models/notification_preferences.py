@@ -1,9 +1,9 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from helpers.enums import MessageType
 from sqlalchemy import Index
-from enum import Enum
 
 
 class NotificationPreferences(db.Model):
@@ -37,10 +37,4 @@ class NotificationPreferences(db.Model):
         return f"<NotificationPreferences id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
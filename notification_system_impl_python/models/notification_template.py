@@ -1,9 +1,9 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from sqlalchemy import Index
 from helpers.enums import MessageType
-from enum import Enum
 
 
 class NotificationTemplate(db.Model):
@@ -38,10 +38,4 @@ class NotificationTemplate(db.Model):
         return f"<NotificationTemplate id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
@@ -1,8 +1,8 @@
 from configs.db import db
 import uuid
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 from sqlalchemy import Index
-from enum import Enum
 
 
 class NotificationWebhook(db.Model):
@@ -30,10 +30,4 @@ class NotificationWebhook(db.Model):
         return f"<NotificationWebhook id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
@@ -1,10 +1,11 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
-from enum import Enum
 
 class Users(db.Model):
     __tablename__ = "users"
+    __serialize_exclude__ = ("password",)
 
     id = db.Column(db.String(36), primary_key=True, nullable=False, default=lambda: str(uuid.uuid4()))
     email = db.Column(db.String(255), nullable=False, unique=True, index=True)
@@ -26,12 +27,4 @@ class Users(db.Model):
         return f"<Users id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            if column.name == "password":
-                continue
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
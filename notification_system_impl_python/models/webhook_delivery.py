@@ -1,8 +1,8 @@
 from configs.db import db
 from helpers.helpers import now_ms
+from helpers.serializer import serialize
 import uuid
 from sqlalchemy import Index
-from enum import Enum
 
 
 class WebhookDelivery(db.Model):
@@ -33,10 +33,4 @@ class WebhookDelivery(db.Model):
         return f"<WebhookDelivery id={self.id}>"
 
     def to_dict(self):
-        data = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, Enum):
-                value = value.value
-            data[column.name] = value
-        return data
+        return serialize(self)
@@ -0,0 +1,26 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List
+
+
+class AsyncNotificationProvider(ABC):
+    """asyncio counterpart of NotificationProvider, used by workers/async_worker.py"""
+
+    @abstractmethod
+    def provider_name(self) -> str:
+        pass
+
+    @abstractmethod
+    async def send(self, notification) -> Dict[str, Any]:
+        pass
+
+    def batches(self, notifications) -> List[List]:
+        """
+        Split notifications into the groups the worker hands to send_batch, each
+        holding one concurrency slot; one notification per group by default.
+        """
+        return [[notification] for notification in notifications]
+
+    async def send_batch(self, notifications) -> List[Dict[str, Any]]:
+        """Send several notifications concurrently, returning one result per notification in order"""
+        return list(await asyncio.gather(*(self.send(notification) for notification in notifications)))
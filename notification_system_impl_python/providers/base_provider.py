@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 
 class NotificationProvider(ABC):
+    """
+    send() returns {'success': bool, 'message': str, 'response': ...}. A
+    failure that no retry or other provider can fix (a malformed payload, a
+    rejected recipient) also carries 'permanent': True; other failures are
+    taken as transient and count against the provider's health.
+    """
+
     @abstractmethod
     def provider_name(self) -> str:
         pass
@@ -10,3 +17,7 @@ class NotificationProvider(ABC):
     @abstractmethod
     def send(self, notification) -> Dict[str, Any]:
         pass
+
+    def send_batch(self, notifications) -> List[Dict[str, Any]]:
+        """Send several notifications, returning one result per notification in order"""
+        return [self.send(notification) for notification in notifications]
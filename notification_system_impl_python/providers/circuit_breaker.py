@@ -0,0 +1,153 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from helpers.helpers import now_ms
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CIRCUIT_KEY = "circuit:{name}"
+TRANSITIONS_KEY = "circuit:transitions"
+
+# KEYS[1] circuit hash, KEYS[2] transitions hash
+# ARGV: now_ms, cooldown_ms, probe_timeout_ms, name
+# returns {allowed, probe, retry_at_ms}
+_ALLOW_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state or state == 'closed' then
+    return {1, 0, 0}
+end
+local now = tonumber(ARGV[1])
+if state == 'open' then
+    local reopen_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at')) + tonumber(ARGV[2])
+    if now < reopen_at then
+        return {0, 0, reopen_at}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_at', now)
+    redis.call('HINCRBY', KEYS[2], ARGV[4] .. ':open->half_open', 1)
+    return {1, 1, 0}
+end
+local probe_at = tonumber(redis.call('HGET', KEYS[1], 'probe_at') or '0')
+local probe_expires_at = probe_at + tonumber(ARGV[3])
+if now >= probe_expires_at then
+    redis.call('HSET', KEYS[1], 'probe_at', now)
+    return {1, 1, 0}
+end
+return {0, 0, probe_expires_at}
+"""
+
+# KEYS[1] circuit hash, KEYS[2] transitions hash
+# ARGV: successes, failures, now_ms, failure_threshold, name
+# returns {old_state, new_state}
+_RECORD_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local new_state = state
+if tonumber(ARGV[1]) > 0 then
+    new_state = 'closed'
+    redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', 0)
+elseif tonumber(ARGV[2]) > 0 then
+    if state == 'half_open' then
+        new_state = 'open'
+        redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', ARGV[3])
+    elseif state == 'closed' then
+        local failures = redis.call('HINCRBY', KEYS[1], 'failures', ARGV[2])
+        if failures >= tonumber(ARGV[4]) then
+            new_state = 'open'
+            redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', ARGV[3], 'failures', 0)
+        end
+    end
+end
+if new_state ~= state then
+    redis.call('HINCRBY', KEYS[2], ARGV[5] .. ':' .. state .. '->' .. new_state, 1)
+end
+return {state, new_state}
+"""
+
+
+class Admission:
+    def __init__(self, allowed: bool, probe: bool = False, retry_at: int = 0):
+        self.allowed = allowed
+        self.probe = probe
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker per provider, shared by every worker
+    through one Redis hash per provider.
+
+    CIRCUIT_FAILURE_THRESHOLD consecutive failed sends open the circuit.
+    After CIRCUIT_COOLDOWN_SECONDS one probe send is let through (half-open):
+    a success closes the circuit, a failure opens it for another cool-down.
+    A provider call with at least one successful result counts as a success.
+    Each check and each report is one Lua call. When Redis is unreachable the
+    breaker lets everything through.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self._allow = None
+        self._record = None
+        self.failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.cooldown_ms = int(float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30")) * 1000)
+        self.probe_timeout_ms = int(float(os.getenv("CIRCUIT_PROBE_TIMEOUT_SECONDS", "30")) * 1000)
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+            self._allow = None
+        if self._allow is None:
+            self._allow = self._redis_client.register_script(_ALLOW_SCRIPT)
+            self._record = self._redis_client.register_script(_RECORD_SCRIPT)
+        return self._redis_client
+
+    def allow(self, name: str) -> Admission:
+        try:
+            client = self.redis_client
+            allowed, probe, retry_at = self._allow(
+                keys=[CIRCUIT_KEY.format(name=name), TRANSITIONS_KEY],
+                args=[now_ms(), self.cooldown_ms, self.probe_timeout_ms, name],
+                client=client,
+            )
+        except Exception as e:
+            print(f"Circuit breaker check failed for {name}, allowing send: {e}")
+            return Admission(True)
+        if probe:
+            print(f"Circuit for {name} is half-open, sending a probe")
+        return Admission(bool(allowed), bool(probe), int(retry_at))
+
+    def record(self, name: str, successes: int, failures: int) -> Optional[Tuple[str, str]]:
+        """Report one provider call; returns (old_state, new_state) when the state changed"""
+        try:
+            client = self.redis_client
+            old_state, new_state = self._record(
+                keys=[CIRCUIT_KEY.format(name=name), TRANSITIONS_KEY],
+                args=[successes, failures, now_ms(), self.failure_threshold, name],
+                client=client,
+            )
+        except Exception as e:
+            print(f"Circuit breaker update failed for {name}: {e}")
+            return None
+        if old_state == new_state:
+            return None
+        print(f"Circuit for {name} changed from {old_state} to {new_state}")
+        return old_state, new_state
+
+    def states(self, names: List[str]) -> Dict[str, dict]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(CIRCUIT_KEY.format(name=name))
+        states = {}
+        for name, circuit in zip(names, pipe.execute()):
+            state = circuit.get("state", "closed")
+            states[name] = {
+                "state": state,
+                "consecutive_failures": int(circuit.get("failures", 0)),
+                "opened_at": int(circuit["opened_at"]) if state != "closed" and "opened_at" in circuit else None,
+            }
+        return states
+
+    def transitions(self) -> Dict[str, int]:
+        """Count of every state change so far, keyed by provider:old->new"""
+        return {transition: int(count) for transition, count in self.redis_client.hgetall(TRANSITIONS_KEY).items()}
@@ -1,83 +1,262 @@
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from helpers.constants import Constants
+from providers.async_provider import AsyncNotificationProvider
 from providers.base_provider import NotificationProvider
-import requests
+from providers.http_client import HTTP_ERRORS, get_http_client, get_async_http_client, is_permanent_status
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# per-token errors that may succeed later; the rest (invalid or unregistered
+# token, oversized message, bad data keys) fail the same way every time
+TRANSIENT_FCM_ERRORS = {'Unavailable', 'InternalServerError', 'DeviceMessageRateExceeded', 'TopicsMessageRateExceeded'}
+
 
 class FCMProvider(NotificationProvider):
-    def __init__(self, server_key: str):
+    def __init__(self, server_key: str, timeout: float = 10):
         self.server_key = server_key
         self.api_url = "https://fcm.googleapis.com/fcm/send"
+        self.timeout = timeout
 
     def provider_name(self) -> str:
         return "fcm"
 
-    def send(self, notification) -> Dict[str, Any]:
+    def headers(self) -> Dict[str, str]:
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'key={self.server_key}'
+        }
+
+    def build_message(self, notification) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Returns (fcm_message, None), or (None, error_result) when the payload is unusable"""
         try:
             payload = json.loads(notification.payload)
-            token = payload.get('token')
-            topic = payload.get('topic')
-
-            if not token and not topic:
-                return {'success': False, 'message': 'Missing "token" or "topic" field in payload'}
-            fcm_message = {
-                'notification': {
-                    'title': payload.get('title', 'Notification'),
-                    'body': payload.get('body', '')
-                }
+        except ValueError as e:
+            return None, {'success': False, 'permanent': True, 'message': f'Invalid FCM payload: {str(e)}'}
+        token = payload.get('token')
+        topic = payload.get('topic')
+
+        if not token and not topic:
+            return None, {'success': False, 'permanent': True, 'message': 'Missing "token" or "topic" field in payload'}
+        fcm_message = {
+            'notification': {
+                'title': payload.get('title', 'Notification'),
+                'body': payload.get('body', '')
             }
-            if 'data' in payload:
-                fcm_message['data'] = payload['data']
+        }
+        if 'data' in payload:
+            fcm_message['data'] = payload['data']
 
-            if token:
-                fcm_message['to'] = token
-            else:
-                fcm_message['to'] = f'/topics/{topic}'
+        if token:
+            fcm_message['to'] = token
+        else:
+            fcm_message['to'] = f'/topics/{topic}'
+        return fcm_message, None
 
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'key={self.server_key}'
+    def parse_response(self, response) -> Dict[str, Any]:
+        if response.status_code >= 400:
+            return {
+                'success': False,
+                'permanent': is_permanent_status(response.status_code),
+                'message': f'FCM returned error status {response.status_code}: {response.text}'
             }
 
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=fcm_message,
-                timeout=10
-            )
-            if response.status_code >= 400:
-                return {
-                    'success': False,
-                    'message': f'FCM returned error status {response.status_code}: {response.text}'
-                }
+        result = response.json()
+        success_count = result.get('success', 0)
+        failure_count = result.get('failure', 0)
+
+        if success_count > 0:
+            return {
+                'success': True,
+                'message': 'Push notification sent via FCM',
+                'response': result
+            }
+        error_msg = 'Unknown error'
+        if failure_count > 0 and 'results' in result:
+            results = result['results']
+            if results and 'error' in results[0]:
+                error_msg = results[0]['error']
 
-            result = response.json()
-            success_count = result.get('success', 0)
-            failure_count = result.get('failure', 0)
+        return {
+            'success': False,
+            'permanent': error_msg not in TRANSIENT_FCM_ERRORS and error_msg != 'Unknown error',
+            'message': f'FCM error: {error_msg}',
+            'response': result
+        }
 
-            if success_count > 0:
-                return {
+    def multicast_groups(self, notifications) -> List[List]:
+        """
+        Group notifications that push the same title, body and data to a device
+        token into lists of at most FCM_MULTICAST_LIMIT, in order of first
+        appearance. Topic pushes and unusable payloads get a list of their own.
+        Only the notifications of one delivery batch are grouped, so groups are
+        also bounded by DELIVERY_BATCH_SIZE and QUEUE_BATCH_SIZE.
+        """
+        groups = []
+        open_groups = {}
+        for notification in notifications:
+            try:
+                fcm_message, error = self.build_message(notification)
+            except Exception:
+                fcm_message, error = None, True
+            if error or fcm_message['to'].startswith('/topics/'):
+                groups.append([notification])
+                continue
+
+            del fcm_message['to']
+            key = json.dumps(fcm_message, sort_keys=True)
+            group = open_groups.get(key)
+            if group is None or len(group) >= Constants.FCM_MULTICAST_LIMIT:
+                group = open_groups[key] = []
+                groups.append(group)
+            group.append(notification)
+        return groups
+
+    def build_multicast(self, notifications) -> Dict[str, Any]:
+        """Message for a group from multicast_groups, addressed to every token in it"""
+        fcm_message, _ = self.build_message(notifications[0])
+        del fcm_message['to']
+        fcm_message['registration_ids'] = [json.loads(n.payload)['token'] for n in notifications]
+        return fcm_message
+
+    def parse_multicast_response(self, response, count: int) -> List[Dict[str, Any]]:
+        """One result per registration id, in the order they were sent"""
+        if response.status_code >= 400:
+            return [self.parse_response(response) for _ in range(count)]
+
+        result = response.json()
+        token_results = result.get('results', [])
+        results = []
+        for index in range(count):
+            token_result = token_results[index] if index < len(token_results) else {}
+            if 'message_id' in token_result:
+                results.append({
                     'success': True,
                     'message': 'Push notification sent via FCM',
-                    'response': result
-                }
-            error_msg = 'Unknown error'
-            if failure_count > 0 and 'results' in result:
-                results = result['results']
-                if results and 'error' in results[0]:
-                    error_msg = results[0]['error']
+                    'response': {'multicast_id': result.get('multicast_id'), **token_result}
+                })
+            else:
+                error_msg = token_result.get('error', 'Unknown error')
+                results.append({
+                    'success': False,
+                    'permanent': error_msg not in TRANSIENT_FCM_ERRORS and error_msg != 'Unknown error',
+                    'message': f"FCM error: {error_msg}",
+                    'response': {'multicast_id': result.get('multicast_id'), **token_result}
+                })
+        return results
+
+    def send_multicast(self, notifications) -> List[Dict[str, Any]]:
+        if len(notifications) == 1:
+            return [self.send(notifications[0])]
+        try:
+            response = get_http_client().post(
+                self.api_url,
+                headers=self.headers(),
+                json=self.build_multicast(notifications),
+                timeout=self.timeout
+            )
+            return self.parse_multicast_response(response, len(notifications))
+
+        except HTTP_ERRORS as e:
+            return [{'success': False, 'message': f'FCM request failed: {str(e)}'} for _ in notifications]
+        except Exception as e:
+            return [{'success': False, 'message': f'FCM send failed: {str(e)}'} for _ in notifications]
+
+    def send_batch(self, notifications) -> List[Dict[str, Any]]:
+        """Send pushes with identical content as multicasts and map each token's result back"""
+        results = {}
+        for group in self.multicast_groups(notifications):
+            for notification, result in zip(group, self.send_multicast(group)):
+                results[id(notification)] = result
+        return [results[id(notification)] for notification in notifications]
+
+    def send(self, notification) -> Dict[str, Any]:
+        try:
+            fcm_message, error = self.build_message(notification)
+            if error:
+                return error
+
+            response = get_http_client().post(
+                self.api_url,
+                headers=self.headers(),
+                json=fcm_message,
+                timeout=self.timeout
+            )
+            return self.parse_response(response)
 
+        except HTTP_ERRORS as e:
             return {
                 'success': False,
-                'message': f'FCM error: {error_msg}',
-                'response': result
+                'message': f'FCM request failed: {str(e)}'
             }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'FCM send failed: {str(e)}'
+            }
+
+
+class AsyncFCMProvider(AsyncNotificationProvider):
+    def __init__(self, provider: FCMProvider):
+        self.provider = provider
+
+    def provider_name(self) -> str:
+        return self.provider.provider_name()
+
+    def batches(self, notifications) -> List[List]:
+        return self.provider.multicast_groups(notifications)
+
+    async def send_batch(self, notifications) -> List[Dict[str, Any]]:
+        """Send one multicast per group of identical pushes, concurrently"""
+        groups = self.provider.multicast_groups(notifications)
+        group_results = await asyncio.gather(*(self.send_multicast(group) for group in groups))
+        results = {}
+        for group, group_result in zip(groups, group_results):
+            for notification, result in zip(group, group_result):
+                results[id(notification)] = result
+        return [results[id(notification)] for notification in notifications]
+
+    async def send_multicast(self, notifications) -> List[Dict[str, Any]]:
+        if len(notifications) == 1:
+            return [await self.send(notifications[0])]
+        client = get_async_http_client()
+        if client is None:
+            return await asyncio.to_thread(self.provider.send_multicast, notifications)
+        try:
+            response = await client.post(
+                self.provider.api_url,
+                headers=self.provider.headers(),
+                json=self.provider.build_multicast(notifications),
+                timeout=self.provider.timeout
+            )
+            return self.provider.parse_multicast_response(response, len(notifications))
+
+        except HTTP_ERRORS as e:
+            return [{'success': False, 'message': f'FCM request failed: {str(e)}'} for _ in notifications]
+        except Exception as e:
+            return [{'success': False, 'message': f'FCM send failed: {str(e)}'} for _ in notifications]
+
+    async def send(self, notification) -> Dict[str, Any]:
+        client = get_async_http_client()
+        if client is None:
+            return await asyncio.to_thread(self.provider.send, notification)
+        try:
+            fcm_message, error = self.provider.build_message(notification)
+            if error:
+                return error
+
+            response = await client.post(
+                self.provider.api_url,
+                headers=self.provider.headers(),
+                json=fcm_message,
+                timeout=self.provider.timeout
+            )
+            return self.provider.parse_response(response)
 
-        except requests.RequestException as e:
+        except HTTP_ERRORS as e:
             return {
                 'success': False,
                 'message': f'FCM request failed: {str(e)}'
@@ -0,0 +1,116 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Exceptions raised by either client for transport-level failures
+HTTP_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+
+def is_permanent_status(status_code: int) -> bool:
+    """
+    Whether an HTTP error status rejects the request itself, so neither a
+    retry nor another provider can help: 4xx other than timeouts, throttling
+    and auth errors (a bad credential is the provider's problem, not the
+    notification's)
+    """
+    return 400 <= status_code < 500 and status_code not in (401, 403, 408, 429)
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def _build_client():
+    pool_size = int(os.getenv("HTTP_POOL_SIZE", "20"))
+    use_http2 = os.getenv("HTTP_CLIENT_HTTP2", "false").lower() == "true"
+
+    if use_http2:
+        if httpx is None:
+            print("HTTP_CLIENT_HTTP2 is set but httpx is not installed, using HTTP/1.1 keep-alive")
+        else:
+            # one multiplexed connection per host carries concurrent requests
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60")),
+                ),
+            )
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=int(os.getenv("HTTP_POOL_HOSTS", "10")), pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_client():
+    """
+    Keep-alive HTTP client shared by the HTTP providers in this process.
+
+    A requests.Session with a sized connection pool by default, or an httpx
+    client with HTTP/2 multiplexing when HTTP_CLIENT_HTTP2=true and httpx
+    (with h2) is installed. Both expose post(url, headers=, json=, timeout=).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def async_http_available() -> bool:
+    return httpx is not None
+
+
+def get_async_http_client():
+    """
+    httpx.AsyncClient for the asyncio delivery worker, or None when httpx is
+    not installed (async providers then fall back to a thread; the worker
+    itself refuses to start without it, see workers/async_worker.py). The client
+    belongs to the event loop that first uses it; close it with
+    close_async_http_client() before that loop stops.
+    """
+    global _async_client
+    if httpx is None:
+        return None
+    if _async_client is None:
+        pool_size = int(os.getenv("HTTP_ASYNC_POOL_SIZE", "200"))
+        _async_client = httpx.AsyncClient(
+            http2=os.getenv("HTTP_CLIENT_HTTP2", "false").lower() == "true",
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60")),
+            ),
+        )
+    return _async_client
+
+
+async def close_async_http_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _reset_after_fork():
+    # pooled sockets opened by the parent must not be shared with forked workers
+    global _client, _client_lock, _async_client
+    _client = None
+    _client_lock = threading.Lock()
+    _async_client = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
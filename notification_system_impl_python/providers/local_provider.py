@@ -1,6 +1,7 @@
 import json
 from datetime import datetime
 from typing import Dict, Any
+from providers.async_provider import AsyncNotificationProvider
 from providers.base_provider import NotificationProvider
 from dotenv import load_dotenv
 
@@ -37,8 +38,26 @@ class LocalProvider(NotificationProvider):
                 'message': 'Notification logged locally',
                 'response': {'notification_id': notification.id, 'payload': payload}
             }
+        except ValueError as e:
+            return {
+                'success': False,
+                'permanent': True,
+                'message': f'Invalid payload: {str(e)}'
+            }
         except Exception as e:
             return {
                 'success': False,
                 'message': f'Local provider failed: {str(e)}'
             }
+
+
+class AsyncLocalProvider(AsyncNotificationProvider):
+    def __init__(self, provider: LocalProvider):
+        self.provider = provider
+
+    def provider_name(self) -> str:
+        return self.provider.provider_name()
+
+    async def send(self, notification) -> Dict[str, Any]:
+        # only writes to stdout, nothing to wait on
+        return self.provider.send(notification)
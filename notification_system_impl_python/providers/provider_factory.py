@@ -1,11 +1,13 @@
+import json
 import os
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from helpers.enums import ProviderType
+from providers.async_provider import AsyncNotificationProvider
 from providers.base_provider import NotificationProvider
-from providers.smtp_provider import GmailProvider, OutlookProvider, SMTPProvider
-from providers.sms_provider import ConsoleSMSProvider, TextbeltProvider
-from providers.fcm_provider import FCMProvider
-from providers.local_provider import LocalProvider
+from providers.smtp_provider import GmailProvider, OutlookProvider, SMTPProvider, AsyncSMTPProvider
+from providers.sms_provider import ConsoleSMSProvider, TextbeltProvider, AsyncConsoleSMSProvider, AsyncTextbeltProvider
+from providers.fcm_provider import FCMProvider, AsyncFCMProvider
+from providers.local_provider import LocalProvider, AsyncLocalProvider
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -84,9 +86,88 @@ def get_provider_map() -> Dict[ProviderType, NotificationProvider]:
         print("Using local provider for push (configure FCM_SERVER_KEY in .env)")
         providers[ProviderType.LOCAL] = LocalProvider()
 
+    apply_provider_timeouts(providers)
     return providers
 
 
+def apply_provider_timeouts(providers: Dict[ProviderType, NotificationProvider]):
+    """Use ProviderConfig.timeout_seconds for providers that make HTTP calls"""
+    try:
+        from models.provider_config import ProviderConfig
+        timeouts = {
+            config.provider_name.lower(): config.timeout_seconds
+            for config in ProviderConfig.query.filter_by(is_active=True).all()
+        }
+    except Exception as e:
+        print(f"Provider configs not loaded, using default timeouts: {e}")
+        return
+
+    for provider in providers.values():
+        timeout = timeouts.get(provider.provider_name())
+        if timeout and hasattr(provider, "timeout"):
+            provider.timeout = timeout
+
+
+def build_provider_from_config(config) -> Optional[Tuple[ProviderType, NotificationProvider]]:
+    """
+    Build the provider a ProviderConfig row describes, keyed by provider_name:
+    gmail / outlook (api_key = email, api_secret = password), custom_smtp
+    (api_key / api_secret = login, config_json = host, port, from_email,
+    use_tls), textbelt and fcm (api_key), console_sms and local
+    """
+    name = config.provider_name.lower()
+    options = json.loads(config.config_json) if config.config_json else {}
+    timeout = config.timeout_seconds
+
+    if name == "gmail":
+        return ProviderType.GMAIL, GmailProvider(config.api_key, config.api_secret)
+    if name == "outlook":
+        return ProviderType.OUTLOOK, OutlookProvider(config.api_key, config.api_secret)
+    if name in ("custom_smtp", "smtp"):
+        if not options.get("host"):
+            print(f"Provider config {config.provider_name} has no host in config_json")
+            return None
+        return ProviderType.CUSTOM_SMTP, SMTPProvider(
+            host=options["host"],
+            port=int(options.get("port", 587)),
+            username=config.api_key,
+            password=config.api_secret,
+            from_email=options.get("from_email"),
+            use_tls=options.get("use_tls", True)
+        )
+    if name == "textbelt":
+        return ProviderType.TEXTBELT, TextbeltProvider(config.api_key, timeout=timeout)
+    if name == "fcm":
+        return ProviderType.FCM, FCMProvider(config.api_key, timeout=timeout)
+    if name == "console_sms":
+        return ProviderType.CONSOLE_SMS, ConsoleSMSProvider()
+    if name == "local":
+        return ProviderType.LOCAL, LocalProvider()
+
+    print(f"Unknown provider in provider config: {config.provider_name}")
+    return None
+
+
+def to_async_provider(provider: NotificationProvider) -> AsyncNotificationProvider:
+    if isinstance(provider, SMTPProvider):
+        return AsyncSMTPProvider(provider)
+    if isinstance(provider, FCMProvider):
+        return AsyncFCMProvider(provider)
+    if isinstance(provider, TextbeltProvider):
+        return AsyncTextbeltProvider(provider)
+    if isinstance(provider, ConsoleSMSProvider):
+        return AsyncConsoleSMSProvider(provider)
+    if isinstance(provider, LocalProvider):
+        return AsyncLocalProvider(provider)
+    raise ValueError(f"No async variant for provider {provider.provider_name()}")
+
+
+def get_async_provider_map(providers: Dict[ProviderType, NotificationProvider] = None) -> Dict[ProviderType, AsyncNotificationProvider]:
+    """Async counterparts of the configured providers, for the asyncio delivery worker"""
+    providers = providers if providers is not None else get_provider_map()
+    return {provider_type: to_async_provider(provider) for provider_type, provider in providers.items()}
+
+
 def validate_provider_configuration():
     smtp_provider = os.getenv("SMTP_PROVIDER", "").lower()
 
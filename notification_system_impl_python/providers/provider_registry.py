@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from helpers.enums import ProviderType
+from providers.base_provider import NotificationProvider
+from providers.provider_factory import get_provider_map
+from providers.provider_router import ProviderRouter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RELOAD_KEY = "provider:registry:version"
+
+
+class ProviderRegistry:
+    """
+    Provider map and router built once per process and reused by every send.
+
+    The map is rebuilt when the reload version in Redis is bumped (see
+    request_provider_reload) or when the ProviderConfig rows change. Both
+    are checked at most once every PROVIDER_REGISTRY_CHECK_SECONDS, so the
+    common path is a dictionary lookup.
+    """
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = check_interval if check_interval is not None else float(
+            os.getenv("PROVIDER_REGISTRY_CHECK_SECONDS", "30")
+        )
+        self.providers: Optional[Dict[ProviderType, NotificationProvider]] = None
+        self.router: Optional[ProviderRouter] = None
+        self.generation = 0
+        self._fingerprint: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_providers(self) -> Dict[ProviderType, NotificationProvider]:
+        if self.providers is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self.providers
+
+        with self._lock:
+            if self.providers is None:
+                self._load(self._current_fingerprint())
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                fingerprint = self._current_fingerprint()
+                if fingerprint != self._fingerprint:
+                    print("Provider configuration changed, reloading providers")
+                    self._load(fingerprint)
+                self._checked_at = time.monotonic()
+        return self.providers
+
+    def get_router(self) -> ProviderRouter:
+        self.get_providers()
+        return self.router
+
+    def reload(self) -> Dict[ProviderType, NotificationProvider]:
+        with self._lock:
+            self._load(self._current_fingerprint())
+        return self.providers
+
+    def _load(self, fingerprint: Tuple):
+        self.router = ProviderRouter.from_provider_configs(get_provider_map())
+        self.providers = self.router.providers
+        self.generation += 1
+        self._fingerprint = fingerprint
+        self._checked_at = time.monotonic()
+        print(f"Loaded {len(self.providers)} notification providers")
+
+    def _current_fingerprint(self) -> Tuple:
+        # a failed lookup yields None for that part, so an outage does not force a reload
+        # once it clears unless the value actually changed meanwhile
+        version = None
+        try:
+            from configs.redis import get_redis_pool
+            version = get_redis_pool().get(RELOAD_KEY)
+        except Exception as e:
+            print(f"Provider reload version not read: {e}")
+
+        configs = None
+        try:
+            from configs.db import db
+            from models.provider_config import ProviderConfig
+            # own connection, so the check never touches the caller's session
+            with db.engine.connect() as connection:
+                configs = tuple(connection.execute(
+                    db.select(db.func.count(ProviderConfig.id), db.func.max(ProviderConfig.updatedAt))
+                ).one())
+        except Exception as e:
+            print(f"Provider configs not checked: {e}")
+
+        if self._fingerprint is not None:
+            version = version if version is not None else self._fingerprint[0]
+            configs = configs if configs is not None else self._fingerprint[1]
+        return version, configs
+
+
+_registry: Optional[ProviderRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_provider_registry() -> ProviderRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderRegistry()
+    return _registry
+
+
+def request_provider_reload(redis_client=None) -> int:
+    """Ask every worker process to rebuild its providers at its next check"""
+    if redis_client is None:
+        from configs.redis import get_redis_pool
+        redis_client = get_redis_pool()
+    return redis_client.incr(RELOAD_KEY)
+
+
+def _reset_after_fork():
+    # providers hold pooled connections, so a forked worker builds its own
+    global _registry, _registry_lock
+    _registry = None
+    _registry_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
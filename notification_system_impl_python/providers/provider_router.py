@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from helpers.enums import MessageType, ProviderType
+from helpers.helpers import now_ms
+from helpers.instrumentation import PROVIDER_CALL_SECONDS
+from providers.base_provider import NotificationProvider
+from providers.circuit_breaker import CircuitBreaker
+from providers.provider_factory import build_provider_from_config
+from providers.rate_limiter import ProviderRateLimiter, bucket_key
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# providers able to deliver each channel
+CHANNEL_PROVIDERS: Dict[MessageType, List[ProviderType]] = {
+    MessageType.EMAIL: [ProviderType.GMAIL, ProviderType.OUTLOOK, ProviderType.CUSTOM_SMTP, ProviderType.LOCAL],
+    MessageType.SMS: [ProviderType.TEXTBELT, ProviderType.CONSOLE_SMS],
+    MessageType.PUSH: [ProviderType.FCM, ProviderType.LOCAL],
+}
+
+
+class ProviderHealth:
+    """Rolling (EWMA) latency and error rate of one provider in this process"""
+
+    def __init__(self):
+        self.alpha = float(os.getenv("ROUTING_EWMA_ALPHA", "0.2"))
+        self.ttl = float(os.getenv("ROUTING_STATS_TTL_SECONDS", "60"))
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.updated_at = 0.0
+
+    def observe(self, latency_ms: float, successes: List[bool]):
+        if self.stale():
+            self.latency_ms = None
+            self.error_rate = 0.0
+        self.latency_ms = latency_ms if self.latency_ms is None else (
+            self.alpha * latency_ms + (1 - self.alpha) * self.latency_ms
+        )
+        for success in successes:
+            self.error_rate = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * self.error_rate
+        self.updated_at = time.monotonic()
+
+    def stale(self) -> bool:
+        # a provider that has not been used for a while gets a clean slate, so a
+        # demoted primary is tried again instead of staying behind its backup
+        return time.monotonic() - self.updated_at > self.ttl
+
+    def degraded(self, max_error_rate: float, slow_ms: float) -> bool:
+        if self.stale():
+            return False
+        return self.error_rate >= max_error_rate or (self.latency_ms or 0) >= slow_ms
+
+    def snapshot(self) -> dict:
+        stale = self.stale()
+        return {
+            "latency_ms": None if stale or self.latency_ms is None else round(self.latency_ms, 1),
+            "error_rate": 0.0 if stale else round(self.error_rate, 3),
+        }
+
+
+_health: Dict[ProviderType, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_provider_health(provider_type: ProviderType) -> ProviderHealth:
+    health = _health.get(provider_type)
+    if health is None:
+        with _health_lock:
+            health = _health.setdefault(provider_type, ProviderHealth())
+    return health
+
+
+class ProviderRouter:
+    """
+    Picks a provider per notification from a chain built from ProviderConfig.
+
+    Each channel's chain holds its active configured providers in ascending
+    priority, followed by the provider the notification was created with.
+    Providers whose error rate or latency crosses ROUTING_MAX_ERROR_RATE /
+    ROUTING_SLOW_MS are moved to the back of the chain, and providers of equal
+    priority are ordered by latency. A failed send moves on to the next
+    provider in the same attempt, before the notification falls back to the
+    retry schedule. Providers whose circuit is open (see CircuitBreaker) are
+    skipped without a call; when every provider of the chain is open the
+    result is deferred to the end of the earliest cool-down. Providers with a
+    ProviderConfig.rate_limit (per minute) defer what exceeds their limit
+    to a slot reserved for it (see ProviderRateLimiter). A
+    permanent failure (malformed payload, rejected recipient) neither fails
+    over nor counts against the provider.
+    """
+
+    def __init__(self, providers: Dict[ProviderType, NotificationProvider], configs: List = (),
+                 breaker: CircuitBreaker = None, limiter: ProviderRateLimiter = None):
+        self.providers = dict(providers)
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or ProviderRateLimiter()
+        self.priorities: Dict[ProviderType, int] = {}
+        self.rate_limits: Dict[ProviderType, Tuple[int, str]] = {}
+        self.disabled: Set[ProviderType] = set()
+        self.max_error_rate = float(os.getenv("ROUTING_MAX_ERROR_RATE", "0.5"))
+        self.slow_ms = float(os.getenv("ROUTING_SLOW_MS", "2000"))
+
+        for config in configs:
+            built = build_provider_from_config(config)
+            if not built:
+                continue
+            provider_type, provider = built
+            if not config.is_active:
+                self.disabled.add(provider_type)
+                continue
+            self.providers[provider_type] = provider
+            self.priorities[provider_type] = config.priority
+            if config.rate_limit:
+                self.rate_limits[provider_type] = (config.rate_limit, bucket_key(config.provider_name, config.api_key))
+
+        self.chains: Dict[MessageType, List[ProviderType]] = {
+            channel: sorted(
+                (provider_type for provider_type in members if provider_type in self.priorities),
+                key=lambda provider_type: self.priorities[provider_type],
+            )
+            for channel, members in CHANNEL_PROVIDERS.items()
+        }
+
+    @classmethod
+    def from_provider_configs(cls, providers: Dict[ProviderType, NotificationProvider]) -> "ProviderRouter":
+        try:
+            from models.provider_config import ProviderConfig
+            configs = ProviderConfig.query.all()
+        except Exception as e:
+            print(f"Provider configs not loaded, routing to the requested provider only: {e}")
+            configs = []
+        return cls(providers, configs)
+
+    def chain(self, notification) -> List[ProviderType]:
+        chain = list(self.chains.get(notification.message_type, []))
+        requested = notification.provider
+        if requested not in chain and requested not in self.disabled and requested in self.providers:
+            chain.append(requested)
+        return chain
+
+    def next_provider(self, notification, tried: Set[ProviderType]) -> Optional[ProviderType]:
+        candidates = [provider_type for provider_type in self.chain(notification) if provider_type not in tried]
+        if not candidates:
+            return None
+
+        def rank(provider_type):
+            health = get_provider_health(provider_type)
+            return (
+                health.degraded(self.max_error_rate, self.slow_ms),
+                self.priorities.get(provider_type, float("inf")),
+                health.latency_ms if not health.stale() and health.latency_ms is not None else 0.0,
+            )
+        return min(candidates, key=rank)
+
+    def plan(self, notifications: List, indexes: List[int], tried: List[Set[ProviderType]],
+             results: List[Optional[dict]]) -> Dict[ProviderType, List[int]]:
+        """
+        Group the given notifications by the provider each should try next.
+        A notification whose remaining providers all have an open circuit, or
+        that finds no token in its provider's rate limit, is left out with a
+        deferred result unless an earlier send already failed.
+        """
+        groups: Dict[ProviderType, List[int]] = {}
+        admissions = {}
+        for index in indexes:
+            while True:
+                provider_type = self.next_provider(notifications[index], tried[index])
+                if provider_type is None:
+                    break
+                tried[index].add(provider_type)
+
+                admission = admissions.get(provider_type)
+                if admission is None:
+                    admission = admissions[provider_type] = self.breaker.allow(provider_type.value)
+                if admission.allowed:
+                    if admission.probe:
+                        # a half-open circuit gets a single notification as its probe
+                        admission.allowed = False
+                        admission.retry_at = now_ms() + self.breaker.probe_timeout_ms
+                    groups.setdefault(provider_type, []).append(index)
+                    break
+
+                self._defer(results, index, provider_type, admission.retry_at, f"Circuit open for {provider_type.value}")
+
+        for provider_type, group in groups.items():
+            if provider_type not in self.rate_limits:
+                continue
+            rate_limit, key = self.rate_limits[provider_type]
+            retry_ats = self.limiter.acquire(key, rate_limit, [notifications[index].id for index in group])
+            # throttled notifications wait for their reserved slot instead of failing over
+            for index, retry_at in zip(group, retry_ats):
+                if retry_at is not None:
+                    self._defer(results, index, provider_type, retry_at, f"Rate limit of {rate_limit}/min reached for {provider_type.value}")
+            group[:] = [index for index, retry_at in zip(group, retry_ats) if retry_at is None]
+        return {provider_type: group for provider_type, group in groups.items() if group}
+
+    def _defer(self, results: List[Optional[dict]], index: int, provider_type: ProviderType, retry_at: int, message: str):
+        result = results[index]
+        if result is not None and not result.get("deferred"):
+            return
+        if result is not None and result["retry_at"] <= retry_at:
+            return
+        results[index] = {
+            "success": False,
+            "deferred": True,
+            "retry_at": retry_at,
+            "message": message,
+            "provider": provider_type,
+        }
+
+    def settle(self, provider_type: ProviderType, indexes: List[int], batch_results: List[dict],
+               elapsed: float, results: List[Optional[dict]]) -> List[int]:
+        """
+        Record one provider call and return the indexes that should fail
+        over. Permanent failures (see NotificationProvider) say nothing about
+        the provider: they stay out of its health and circuit and keep their
+        failed result instead of failing over.
+        """
+        successes = [
+            bool(result.get("success")) for result in batch_results
+            if result.get("success") or not result.get("permanent")
+        ]
+        if successes:
+            get_provider_health(provider_type).observe(elapsed * 1000 / len(successes), successes)
+            self.breaker.record(provider_type.value, successes.count(True), successes.count(False))
+        PROVIDER_CALL_SECONDS.labels(provider_type.value).observe(elapsed)
+
+        failed = []
+        elapsed_ms = int(elapsed * 1000)
+        for index, result in zip(indexes, batch_results):
+            result["provider"] = provider_type
+            result["elapsed_ms"] = elapsed_ms
+            results[index] = result
+            if not result.get("success") and not result.get("permanent"):
+                failed.append(index)
+        return failed
+
+    def finish(self, notifications: List, results: List[Optional[dict]]) -> List[dict]:
+        return [
+            result if result is not None else {
+                "success": False,
+                "message": f"No provider configured for {notification.provider.value}",
+            }
+            for notification, result in zip(notifications, results)
+        ]
+
+    def send_batch(self, notifications: List) -> List[dict]:
+        """
+        Send every notification through its chain and return one result per
+        notification, in order, with the provider that produced it
+        """
+        results: List[Optional[dict]] = [None] * len(notifications)
+        tried: List[Set[ProviderType]] = [set() for _ in notifications]
+        pending = list(range(len(notifications)))
+
+        while pending:
+            groups = self.plan(notifications, pending, tried, results)
+            pending = []
+            for provider_type, indexes in groups.items():
+                provider = self.providers[provider_type]
+                batch = [notifications[index] for index in indexes]
+                start = time.perf_counter()
+                try:
+                    batch_results = provider.send_batch(batch)
+                except Exception as e:
+                    batch_results = [
+                        {"success": False, "message": f"{provider.provider_name()} send failed: {str(e)}"}
+                        for _ in batch
+                    ]
+                pending.extend(self.settle(provider_type, indexes, batch_results, time.perf_counter() - start, results))
+
+        return self.finish(notifications, results)
+
+    def health(self) -> Dict[str, dict]:
+        return {provider_type.value: get_provider_health(provider_type).snapshot() for provider_type in self.providers}
+
+
+def _reset_after_fork():
+    global _health_lock
+    _health_lock = threading.Lock()
+    _health.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
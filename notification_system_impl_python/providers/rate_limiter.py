@@ -0,0 +1,97 @@
+import hashlib
+from typing import List, Optional
+from helpers.helpers import now_ms
+
+BUCKET_KEY = "ratelimit:provider:{name}:{credential}"
+RESERVATIONS_KEY = "{bucket}:reserved"
+
+# KEYS[1] bucket hash, KEYS[2] reservations ZSET (notification id -> slot)
+# ARGV: interval_ms (one token), burst_ms (capacity * interval), now_ms, then
+# the notification ids asking for a token
+# returns one value per id: 0 when it may go now, else the epoch ms of its slot.
+# The bucket is a theoretical arrival time (GCRA): every id is debited, the
+# ones beyond the burst into the future, so later callers queue behind them.
+# A reserved id coming back at its slot is let through without a new debit;
+# reservations not used within burst_ms of their slot are dropped
+_ACQUIRE_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call('HGET', KEYS[1], 'tat') or '0') or 0, now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - burst)
+local results = {}
+for i = 4, #ARGV do
+    local reserved = tonumber(redis.call('ZSCORE', KEYS[2], ARGV[i]))
+    if reserved and reserved <= now then
+        redis.call('ZREM', KEYS[2], ARGV[i])
+        results[#results + 1] = 0
+    elseif reserved then
+        results[#results + 1] = reserved
+    else
+        tat = tat + interval
+        local slot = math.ceil(tat - burst)
+        if slot <= now then
+            results[#results + 1] = 0
+        else
+            redis.call('ZADD', KEYS[2], slot, ARGV[i])
+            results[#results + 1] = slot
+        end
+    end
+end
+redis.call('HSET', KEYS[1], 'tat', tostring(tat))
+redis.call('PEXPIRE', KEYS[1], math.ceil(tat - now) + 1000)
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('PEXPIRE', KEYS[2], math.ceil(tat - now + burst) + 1000)
+end
+return results
+"""
+
+
+def bucket_key(provider_name: str, credential: str) -> str:
+    credential_hash = hashlib.sha256((credential or "").encode()).hexdigest()[:16]
+    return BUCKET_KEY.format(name=provider_name.lower(), credential=credential_hash)
+
+
+class ProviderRateLimiter:
+    """
+    Rate limit per provider credential, shared by every worker through
+    Redis: bursts of up to rate_limit sends, rate_limit per minute on
+    average. One Lua call covers a whole provider group. A notification
+    left without a token reserves the next free slot, so it goes at that
+    exact time without being charged again, and later callers queue behind
+    it. When Redis is unreachable, sends are not throttled.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self._acquire = None
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            from configs.redis import get_redis_pool
+            self._redis_client = get_redis_pool()
+        if self._acquire is None:
+            self._acquire = self._redis_client.register_script(_ACQUIRE_SCRIPT)
+        return self._redis_client
+
+    def acquire(self, key: str, rate_per_minute: int, notification_ids: List[str],
+                now: int = None) -> List[Optional[int]]:
+        """
+        Ask for a token for each notification. Returns, in order, None for
+        those that may be sent now and the epoch ms of the reserved slot for
+        the others
+        """
+        now = now or now_ms()
+        interval_ms = 60000.0 / rate_per_minute
+        try:
+            client = self.redis_client
+            slots = self._acquire(
+                keys=[key, RESERVATIONS_KEY.format(bucket=key)],
+                args=[repr(interval_ms), repr(interval_ms * rate_per_minute), now, *notification_ids],
+                client=client,
+            )
+        except Exception as e:
+            print(f"Rate limiter check failed for {key}, not throttling: {e}")
+            return [None] * len(notification_ids)
+        return [int(slot) or None for slot in slots]
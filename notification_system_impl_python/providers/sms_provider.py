@@ -1,9 +1,11 @@
+import asyncio
 import json
 import os
-import requests
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from providers.async_provider import AsyncNotificationProvider
 from providers.base_provider import NotificationProvider
+from providers.http_client import HTTP_ERRORS, get_http_client, get_async_http_client, is_permanent_status
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,10 +24,10 @@ class ConsoleSMSProvider(NotificationProvider):
             body = payload.get('body', '')
 
             if not to:
-                return {'success': False, 'message': 'Missing "to" field in payload'}
+                return {'success': False, 'permanent': True, 'message': 'Missing "to" field in payload'}
 
             if not body:
-                return {'success': False, 'message': 'Missing "body" field in payload'}
+                return {'success': False, 'permanent': True, 'message': 'Missing "body" field in payload'}
 
             print("\n" + "-" * 55)
             print("SMS NOTIFICATION")
@@ -41,6 +43,12 @@ class ConsoleSMSProvider(NotificationProvider):
                 'response': {'to': to, 'body': body}
             }
 
+        except ValueError as e:
+            return {
+                'success': False,
+                'permanent': True,
+                'message': f'Invalid SMS payload: {str(e)}'
+            }
         except Exception as e:
             return {
                 'success': False,
@@ -49,54 +57,119 @@ class ConsoleSMSProvider(NotificationProvider):
 
 
 class TextbeltProvider(NotificationProvider):
-    def __init__(self, api_key: str = "textbelt"):
+    def __init__(self, api_key: str = "textbelt", timeout: float = 10):
         self.api_key = api_key or "textbelt"  
         self.api_url = "https://textbelt.com/text"
+        self.timeout = timeout
 
     def provider_name(self) -> str:
         return "textbelt"
 
-    def send(self, notification) -> Dict[str, Any]:
+    def build_request(self, notification) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Returns (request_data, None), or (None, error_result) when the payload is unusable"""
         try:
             payload = json.loads(notification.payload)
+        except ValueError as e:
+            return None, {'success': False, 'permanent': True, 'message': f'Invalid SMS payload: {str(e)}'}
 
-            to = payload.get('to')
-            body = payload.get('body', '')
+        to = payload.get('to')
+        body = payload.get('body', '')
 
-            if not to:
-                return {'success': False, 'message': 'Missing "to" field in payload'}
+        if not to:
+            return None, {'success': False, 'permanent': True, 'message': 'Missing "to" field in payload'}
 
-            if not body:
-                return {'success': False, 'message': 'Missing "body" field in payload'}
+        if not body:
+            return None, {'success': False, 'permanent': True, 'message': 'Missing "body" field in payload'}
+
+        return {
+            'phone': to,
+            'message': body,
+            'key': self.api_key
+        }, None
 
-            request_data = {
-                'phone': to,
-                'message': body,
-                'key': self.api_key
+    def parse_response(self, response, to: str) -> Dict[str, Any]:
+        if is_permanent_status(response.status_code):
+            return {
+                'success': False,
+                'permanent': True,
+                'message': f'Textbelt returned error status {response.status_code}: {response.text}'
+            }
+        result = response.json()
+        if result.get('success'):
+            return {
+                'success': True,
+                'message': f'SMS sent via Textbelt to {to}',
+                'response': result
+            }
+        else:
+            error_msg = result.get('error', 'Unknown error')
+            return {
+                'success': False,
+                'message': f'Textbelt error: {error_msg}',
+                'response': result
             }
 
-            response = requests.post(
+    def send(self, notification) -> Dict[str, Any]:
+        try:
+            request_data, error = self.build_request(notification)
+            if error:
+                return error
+
+            response = get_http_client().post(
                 self.api_url,
                 json=request_data,
-                timeout=10
+                timeout=self.timeout
+            )
+            return self.parse_response(response, request_data['phone'])
+
+        except HTTP_ERRORS as e:
+            return {
+                'success': False,
+                'message': f'Textbelt request failed: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Textbelt send failed: {str(e)}'
+            }
+
+
+class AsyncConsoleSMSProvider(AsyncNotificationProvider):
+    def __init__(self, provider: ConsoleSMSProvider):
+        self.provider = provider
+
+    def provider_name(self) -> str:
+        return self.provider.provider_name()
+
+    async def send(self, notification) -> Dict[str, Any]:
+        # only writes to stdout, nothing to wait on
+        return self.provider.send(notification)
+
+
+class AsyncTextbeltProvider(AsyncNotificationProvider):
+    def __init__(self, provider: TextbeltProvider):
+        self.provider = provider
+
+    def provider_name(self) -> str:
+        return self.provider.provider_name()
+
+    async def send(self, notification) -> Dict[str, Any]:
+        client = get_async_http_client()
+        if client is None:
+            return await asyncio.to_thread(self.provider.send, notification)
+        try:
+            request_data, error = self.provider.build_request(notification)
+            if error:
+                return error
+
+            response = await client.post(
+                self.provider.api_url,
+                json=request_data,
+                timeout=self.provider.timeout
             )
+            return self.provider.parse_response(response, request_data['phone'])
 
-            result = response.json()
-            if result.get('success'):
-                return {
-                    'success': True,
-                    'message': f'SMS sent via Textbelt to {to}',
-                    'response': result
-                }
-            else:
-                error_msg = result.get('error', 'Unknown error')
-                return {
-                    'success': False,
-                    'message': f'Textbelt error: {error_msg}',
-                    'response': result
-                }
-
-        except requests.RequestException as e:
+        except HTTP_ERRORS as e:
             return {
                 'success': False,
                 'message': f'Textbelt request failed: {str(e)}'
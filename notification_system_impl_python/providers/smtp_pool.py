@@ -0,0 +1,207 @@
+import atexit
+import os
+import smtplib
+import ssl
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_pools: Dict[Tuple[str, int, str, bool], "SMTPConnectionPool"] = {}
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """SSL context shared by every SMTP session in this process"""
+    global _ssl_context
+    if _ssl_context is None:
+        with _registry_lock:
+            if _ssl_context is None:
+                _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+class _PooledSession:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP sessions reused across sends.
+
+    Idle sessions are checked with NOOP before reuse once they have been idle
+    longer than noop_after_seconds, sessions are retired after
+    max_messages_per_session messages, and a send that hits a 421 or a
+    dropped connection on a reused session is retried once on a fresh one.
+    The number of open sessions per host is capped by a slot semaphore
+    shared by every pool for that host.
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str, use_tls: bool,
+                 slots: threading.BoundedSemaphore, max_messages_per_session: int = 100,
+                 noop_after_seconds: float = 30, timeout: float = 30, acquire_timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_messages_per_session = max_messages_per_session
+        self.noop_after_seconds = noop_after_seconds
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self._slots = slots
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _PooledSession:
+        context = get_ssl_context()
+        if self.use_tls:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                server.starttls(context=context)
+                server.login(self.username, self.password)
+            except Exception:
+                server.close()
+                raise
+        else:
+            server = smtplib.SMTP_SSL(self.host, self.port, context=context, timeout=self.timeout)
+            try:
+                server.login(self.username, self.password)
+            except Exception:
+                server.close()
+                raise
+        return _PooledSession(server)
+
+    def _is_alive(self, session: _PooledSession) -> bool:
+        if time.monotonic() - session.last_used < self.noop_after_seconds:
+            return True
+        try:
+            return session.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self) -> Tuple[_PooledSession, bool]:
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise smtplib.SMTPException(f"no SMTP connection available for {self.host}")
+        try:
+            while True:
+                with self._lock:
+                    session = self._idle.pop() if self._idle else None
+                if session is None:
+                    return self._connect(), True
+                if self._is_alive(session):
+                    return session, False
+                session.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, session: _PooledSession, reusable: bool):
+        try:
+            if reusable and session.messages_sent < self.max_messages_per_session:
+                session.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(session)
+            else:
+                session.close()
+        finally:
+            self._slots.release()
+
+    def send_message(self, message) -> None:
+        while True:
+            session, fresh = self._acquire()
+            try:
+                session.server.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._release(session, reusable=False)
+                if fresh:
+                    raise
+                continue
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code == 421:
+                    self._release(session, reusable=False)
+                    if fresh:
+                        raise
+                    continue
+                self._release(session, reusable=True)
+                raise
+            except smtplib.SMTPException:
+                # sendmail already issued RSET, the session is still usable
+                self._release(session, reusable=True)
+                raise
+            except Exception:
+                self._release(session, reusable=False)
+                raise
+            session.messages_sent += 1
+            self._release(session, reusable=True)
+            return
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+
+def get_smtp_pool(host: str, port: int, username: str, password: str, use_tls: bool) -> SMTPConnectionPool:
+    """Per-process pool for one SMTP account, created on first use"""
+    key = (host, port, username, use_tls)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _registry_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            slots = _host_slots.get(host)
+            if slots is None:
+                slots = threading.BoundedSemaphore(int(os.getenv("SMTP_POOL_MAX_CONNECTIONS", "2")))
+                _host_slots[host] = slots
+            pool = SMTPConnectionPool(
+                host=host,
+                port=port,
+                username=username,
+                password=password,
+                use_tls=use_tls,
+                slots=slots,
+                max_messages_per_session=int(os.getenv("SMTP_POOL_MAX_MESSAGES_PER_SESSION", "100")),
+                noop_after_seconds=float(os.getenv("SMTP_POOL_NOOP_AFTER_SECONDS", "30")),
+                timeout=float(os.getenv("SMTP_TIMEOUT_SECONDS", "30")),
+            )
+            _pools[key] = pool
+    return pool
+
+
+def close_smtp_pools():
+    with _registry_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _reset_after_fork():
+    # sessions opened by the parent must not be shared with forked workers
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    _pools.clear()
+    _host_slots.clear()
+
+
+atexit.register(close_smtp_pools)
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,11 +1,13 @@
-import smtplib
-import ssl
+import asyncio
 import json
 import os
+import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any, Optional
+from providers.async_provider import AsyncNotificationProvider
 from providers.base_provider import NotificationProvider
+from providers.smtp_pool import SMTPConnectionPool, get_smtp_pool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,6 +26,9 @@ class SMTPProvider(NotificationProvider):
     def provider_name(self) -> str:
         return "smtp"
 
+    def _get_pool(self) -> SMTPConnectionPool:
+        return get_smtp_pool(self.host, self.port, self.username, self.password, self.use_tls)
+
     def send(self, notification) -> Dict[str, Any]:
         try:
             payload = json.loads(notification.payload)
@@ -34,10 +39,10 @@ class SMTPProvider(NotificationProvider):
             from_email = payload.get('from', self.from_email)
 
             if not to_email:
-                return {'success': False, 'message': 'Missing "to" field in payload'}
+                return {'success': False, 'permanent': True, 'message': 'Missing "to" field in payload'}
 
             if not body:
-                return {'success': False, 'message': 'Missing "body" field in payload'}
+                return {'success': False, 'permanent': True, 'message': 'Missing "body" field in payload'}
 
             message = MIMEMultipart("alternative")
             message["Subject"] = subject
@@ -46,16 +51,7 @@ class SMTPProvider(NotificationProvider):
 
             html_part = MIMEText(body, "html")
             message.attach(html_part)
-            context = ssl.create_default_context()
-            if self.use_tls:
-                with smtplib.SMTP(self.host, self.port) as server:
-                    server.starttls(context=context)
-                    server.login(self.username, self.password)
-                    server.send_message(message)
-            else:
-                with smtplib.SMTP_SSL(self.host, self.port, context=context) as server:
-                    server.login(self.username, self.password)
-                    server.send_message(message)
+            self._get_pool().send_message(message)
 
             return {
                 'success': True,
@@ -63,6 +59,25 @@ class SMTPProvider(NotificationProvider):
                 'response': {'to': to_email, 'subject': subject}
             }
 
+        except smtplib.SMTPRecipientsRefused as e:
+            # 5xx for every recipient: the address is rejected, not the server unwell
+            return {
+                'success': False,
+                'permanent': all(code >= 500 for code, _ in e.recipients.values()),
+                'message': f'SMTP recipients refused: {str(e)}'
+            }
+        except smtplib.SMTPDataError as e:
+            return {
+                'success': False,
+                'permanent': e.smtp_code >= 500,
+                'message': f'SMTP message rejected: {str(e)}'
+            }
+        except ValueError as e:
+            return {
+                'success': False,
+                'permanent': True,
+                'message': f'Invalid email payload: {str(e)}'
+            }
         except Exception as e:
             return {
                 'success': False,
@@ -70,6 +85,22 @@ class SMTPProvider(NotificationProvider):
             }
 
 
+class AsyncSMTPProvider(AsyncNotificationProvider):
+    """
+    smtplib has no asyncio API, so sends run on the default executor against
+    the shared session pool; SMTP_POOL_MAX_CONNECTIONS bounds them per host.
+    """
+
+    def __init__(self, provider: SMTPProvider):
+        self.provider = provider
+
+    def provider_name(self) -> str:
+        return self.provider.provider_name()
+
+    async def send(self, notification) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.provider.send, notification)
+
+
 class GmailProvider(SMTPProvider):
 
     def __init__(self, email: str, app_password: str):
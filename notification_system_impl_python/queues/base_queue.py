@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Tuple
+import json
+
+
+class NotificationQueue(ABC):
+    """
+    Work queue between the API/retry scheduler and the dispatcher.
+
+    drain() returns (message_id, notification_id) pairs; message ids are
+    passed back to ack() once the notifications have been handed to Celery,
+    and a batch that could not be handled is passed to requeue().
+    Backends without delivery tracking return None message ids.
+    """
+
+    @abstractmethod
+    def backend_name(self) -> str:
+        pass
+
+    @abstractmethod
+    def publish_many(self, notification_ids: List[str], pipe=None) -> int:
+        pass
+
+    @abstractmethod
+    def drain(self, block: bool = True) -> List[Tuple[Optional[str], str]]:
+        pass
+
+    @abstractmethod
+    def depth(self) -> int:
+        pass
+
+    def publish(self, notification_id: str) -> None:
+        self.publish_many([notification_id])
+
+    def ack(self, message_ids: List[str]) -> None:
+        pass
+
+    def requeue(self, batch: List[Tuple[Optional[str], str]]) -> None:
+        # drained items are gone from backends without delivery tracking, so push them again
+        self.publish_many([notification_id for _, notification_id in batch])
+
+    def reclaim_idle(self) -> List[Tuple[Optional[str], str]]:
+        return []
+
+    def pending_summary(self) -> Dict[str, Any]:
+        return {}
+
+    @staticmethod
+    def queue_item(notification_id: str) -> str:
+        return json.dumps({"id": notification_id, "action": "send"})
@@ -0,0 +1,87 @@
+import os
+from typing import Dict, List, Optional
+from helpers.helpers import now_ms
+from queues.base_queue import NotificationQueue
+
+# KEYS[1] delay ZSET, KEYS[2] work queue (list or stream)
+# ARGV: now_ms, batch size, backend name
+# Moves up to ARGV[2] due ids to the work queue and returns how many were
+# taken off the ZSET. Members left by the old JSON format are dropped; the
+# DB backfill in RetryHandler.process_due_retries picks their rows up.
+MOVE_DUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #ids == 0 then
+    return 0
+end
+local items = {}
+for _, id in ipairs(ids) do
+    if string.sub(id, 1, 1) ~= '{' then
+        if ARGV[3] == 'stream' then
+            redis.call('XADD', KEYS[2], '*', 'id', id, 'action', 'send')
+        else
+            items[#items + 1] = '{"id": "' .. id .. '", "action": "send"}'
+        end
+    end
+end
+if #items > 0 then
+    redis.call('LPUSH', KEYS[2], unpack(items))
+end
+redis.call('ZREM', KEYS[1], unpack(ids))
+return #ids
+"""
+
+
+class DelayQueue:
+    """
+    Notifications waiting for a future send time, as notification ids in the
+    notification:retries sorted set scored by epoch milliseconds. Covers
+    both retries and notifications created with a future send_at.
+
+    move_due() moves everything that is due to the work queue, batch_size
+    ids per atomic Lua call, until nothing due is left.
+    """
+
+    def __init__(self, redis_client, queue: NotificationQueue, key: str = "notification:retries",
+                 batch_size: int = None):
+        self.redis_client = redis_client
+        self.queue = queue
+        self.key = key
+        self.batch_size = batch_size or int(os.getenv("DELAY_QUEUE_BATCH_SIZE", "1000"))
+        self._move_due = redis_client.register_script(MOVE_DUE_SCRIPT)
+
+    def schedule_many(self, send_times: Dict[str, int], pipe=None, nx: bool = False) -> int:
+        """Add or reschedule notifications, {notification_id: epoch ms}; with nx, scheduled ones keep their time"""
+        if not send_times:
+            return 0
+        target = pipe if pipe is not None else self.redis_client
+        target.zadd(self.key, {notification_id: int(send_at) for notification_id, send_at in send_times.items()}, nx=nx)
+        return len(send_times)
+
+    def schedule(self, notification_id: str, send_at: int) -> None:
+        self.schedule_many({notification_id: send_at})
+
+    def cancel(self, notification_ids: List[str]) -> None:
+        if notification_ids:
+            self.redis_client.zrem(self.key, *notification_ids)
+
+    def move_due(self, now: int = None) -> int:
+        now = now or now_ms()
+        moved = 0
+        while True:
+            count = self._move_due(
+                keys=[self.key, self.queue.key],
+                args=[now, self.batch_size, self.queue.backend_name()],
+            )
+            moved += count
+            if count < self.batch_size:
+                return moved
+
+    def next_due_at(self) -> Optional[int]:
+        first = self.redis_client.zrange(self.key, 0, 0, withscores=True)
+        return int(first[0][1]) if first else None
+
+    def depth(self) -> int:
+        return self.redis_client.zcard(self.key)
+
+    def clean_older_than(self, cutoff_ms: int) -> int:
+        return self.redis_client.zremrangebyscore(self.key, "-inf", cutoff_ms)
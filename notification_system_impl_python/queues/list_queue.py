@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+from helpers.constants import Constants
+from queues.base_queue import NotificationQueue
+
+logger = logging.getLogger(__name__)
+
+
+class ListQueue(NotificationQueue):
+    """
+    notification:queue as a plain Redis list.
+
+    Pops up to batch_size items per round trip (RPOP with count). When the
+    queue is empty it blocks on BRPOP for the first item, then lingers at
+    most max_linger_ms for the rest of the batch to fill. Items are removed
+    on pop, so a consumer that crashes mid-batch loses them; a batch that
+    fails is pushed back with requeue().
+    """
+
+    def __init__(self, redis_client, key: str = "notification:queue", batch_size: int = None,
+                 max_linger_ms: int = None, block_timeout: float = 1, chunk_size: int = Constants.ENQUEUE_CHUNK_SIZE):
+        self.redis_client = redis_client
+        self.key = key
+        self.batch_size = batch_size or int(os.getenv("QUEUE_BATCH_SIZE", "100"))
+        self.max_linger_ms = max_linger_ms if max_linger_ms is not None else int(os.getenv("QUEUE_MAX_LINGER_MS", "50"))
+        self.block_timeout = block_timeout
+        self.chunk_size = chunk_size
+
+    def backend_name(self) -> str:
+        return "list"
+
+    def publish_many(self, notification_ids: List[str], pipe=None) -> int:
+        if not notification_ids:
+            return 0
+        target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+        for start in range(0, len(notification_ids), self.chunk_size):
+            chunk = notification_ids[start:start + self.chunk_size]
+            target.lpush(self.key, *[self.queue_item(notification_id) for notification_id in chunk])
+        if pipe is None:
+            target.execute()
+        return len(notification_ids)
+
+    def drain(self, block: bool = True) -> List[Tuple[Optional[str], str]]:
+        batch: List[Tuple[Optional[str], str]] = []
+        first_item_at = None
+
+        while len(batch) < self.batch_size:
+            items = self.redis_client.rpop(self.key, self.batch_size - len(batch))
+            if items:
+                batch.extend((None, notification_id) for notification_id in self._parse(items))
+                first_item_at = first_item_at or time.monotonic()
+                continue
+
+            if not block:
+                break
+            if first_item_at is None:
+                wait = self.block_timeout
+            else:
+                wait = self.max_linger_ms / 1000 - (time.monotonic() - first_item_at)
+                if wait <= 0:
+                    break
+
+            item = self.redis_client.brpop(self.key, timeout=wait)
+            if not item:
+                break
+            _, payload = item
+            batch.extend((None, notification_id) for notification_id in self._parse([payload]))
+            first_item_at = first_item_at or time.monotonic()
+
+        return batch
+
+    def depth(self) -> int:
+        return self.redis_client.llen(self.key)
+
+    @staticmethod
+    def _parse(items) -> List[str]:
+        ids = []
+        for payload in items:
+            try:
+                data = json.loads(payload)
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON in queue: {e}")
+                continue
+            notification_id = data.get("id")
+            if notification_id and data.get("action", "send") == "send":
+                ids.append(notification_id)
+        return ids
@@ -0,0 +1,25 @@
+import os
+from configs.redis import get_redis_pool
+from queues.base_queue import NotificationQueue
+from queues.delay_queue import DelayQueue
+from queues.list_queue import ListQueue
+from queues.stream_queue import StreamQueue
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_notification_queue(redis_client=None) -> NotificationQueue:
+    """Creates the work queue backend selected by NOTIFICATION_QUEUE_BACKEND (list or stream)"""
+    redis_client = redis_client or get_redis_pool()
+    backend = os.getenv("NOTIFICATION_QUEUE_BACKEND", "list").lower()
+
+    if backend == "stream":
+        return StreamQueue(redis_client)
+    return ListQueue(redis_client)
+
+
+def get_delay_queue(redis_client=None, queue: NotificationQueue = None) -> DelayQueue:
+    """Delay queue (notification:retries) feeding the configured work queue"""
+    redis_client = redis_client or get_redis_pool()
+    return DelayQueue(redis_client, queue or get_notification_queue(redis_client))
@@ -0,0 +1,154 @@
+import logging
+import os
+import socket
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import redis
+from queues.base_queue import NotificationQueue
+
+logger = logging.getLogger(__name__)
+
+class StreamQueue(NotificationQueue):
+    """
+    notification queue on a Redis Stream read through a consumer group.
+
+    Each consumer process reads with XREADGROUP, so any number of them can
+    share the stream. Entries stay in the group's pending list until ack()
+    (XACK + XDEL), and entries left pending longer than
+    QUEUE_RECLAIM_IDLE_MS by a crashed consumer are taken over with
+    XAUTOCLAIM on the next drain.
+    """
+
+    def __init__(self, redis_client, key: str = "notification:stream", group: str = "notification-dispatchers",
+                 consumer: str = None, batch_size: int = None, max_linger_ms: int = None,
+                 block_timeout: float = 1, reclaim_idle_ms: int = None, reclaim_interval_seconds: float = None):
+        self.redis_client = redis_client
+        self.key = key
+        self.group = group
+        self.consumer = consumer or os.getenv("QUEUE_CONSUMER_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or int(os.getenv("QUEUE_BATCH_SIZE", "100"))
+        self.max_linger_ms = max_linger_ms if max_linger_ms is not None else int(os.getenv("QUEUE_MAX_LINGER_MS", "50"))
+        self.block_timeout = block_timeout
+        self.reclaim_idle_ms = reclaim_idle_ms or int(os.getenv("QUEUE_RECLAIM_IDLE_MS", "60000"))
+        self.reclaim_interval_seconds = reclaim_interval_seconds or float(os.getenv("QUEUE_RECLAIM_INTERVAL_SECONDS", "30"))
+        self._group_ready = False
+        self._reclaim_cursor = "0-0"
+        self._last_reclaim = 0.0
+
+    def backend_name(self) -> str:
+        return "stream"
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.redis_client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def publish_many(self, notification_ids: List[str], pipe=None) -> int:
+        if not notification_ids:
+            return 0
+        target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+        for notification_id in notification_ids:
+            target.xadd(self.key, {"id": notification_id, "action": "send"})
+        if pipe is None:
+            target.execute()
+        return len(notification_ids)
+
+    def drain(self, block: bool = True) -> List[Tuple[Optional[str], str]]:
+        self._ensure_group()
+        batch = []
+        if time.monotonic() - self._last_reclaim >= self.reclaim_interval_seconds:
+            batch.extend(self.reclaim_idle())
+        first_item_at = time.monotonic() if batch else None
+
+        while len(batch) < self.batch_size:
+            if not block:
+                block_ms = None
+            elif first_item_at is None:
+                block_ms = int(self.block_timeout * 1000)
+            else:
+                remaining = self.max_linger_ms / 1000 - (time.monotonic() - first_item_at)
+                if remaining <= 0:
+                    break
+                block_ms = max(1, int(remaining * 1000))
+
+            response = self.redis_client.xreadgroup(
+                self.group,
+                self.consumer,
+                {self.key: ">"},
+                count=self.batch_size - len(batch),
+                block=block_ms,
+            )
+            entries = self._entries(response)
+            if not entries:
+                break
+            batch.extend(entries)
+            first_item_at = first_item_at or time.monotonic()
+
+        return batch
+
+    def ack(self, message_ids: List[str]) -> None:
+        message_ids = [message_id for message_id in message_ids if message_id]
+        if not message_ids:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.xack(self.key, self.group, *message_ids)
+        pipe.xdel(self.key, *message_ids)
+        pipe.execute()
+
+    def requeue(self, batch: List[Tuple[Optional[str], str]]) -> None:
+        # unacknowledged entries stay pending and drain() reclaims them after reclaim_idle_ms
+        pass
+
+    def reclaim_idle(self) -> List[Tuple[Optional[str], str]]:
+        """Take over entries another consumer left pending for longer than reclaim_idle_ms"""
+        self._ensure_group()
+        self._last_reclaim = time.monotonic()
+        response = self.redis_client.xautoclaim(
+            self.key,
+            self.group,
+            self.consumer,
+            min_idle_time=self.reclaim_idle_ms,
+            start_id=self._reclaim_cursor,
+            count=self.batch_size,
+        )
+        self._reclaim_cursor = response[0] or "0-0"
+        claimed = self._parse_entries(response[1])
+        if claimed:
+            logger.warning(f"Reclaimed {len(claimed)} idle entries from {self.key} for {self.consumer}")
+        return claimed
+
+    def depth(self) -> int:
+        return self.redis_client.xlen(self.key)
+
+    def pending_summary(self) -> Dict[str, Any]:
+        self._ensure_group()
+        info = self.redis_client.xpending(self.key, self.group)
+        return {
+            "pending": info.get("pending", 0),
+            "consumers": {consumer["name"]: consumer["pending"] for consumer in info.get("consumers") or []},
+        }
+
+    def _entries(self, response) -> List[Tuple[Optional[str], str]]:
+        batch = []
+        for _, entries in response or []:
+            batch.extend(self._parse_entries(entries))
+        return batch
+
+    def _parse_entries(self, entries) -> List[Tuple[Optional[str], str]]:
+        batch = []
+        malformed = []
+        for message_id, fields in entries or []:
+            notification_id = (fields or {}).get("id")
+            if notification_id and (fields or {}).get("action", "send") == "send":
+                batch.append((message_id, notification_id))
+            else:
+                malformed.append(message_id)
+        if malformed:
+            logger.error(f"Dropping {len(malformed)} malformed entries from {self.key}")
+            self.ack(malformed)
+        return batch
@@ -0,0 +1,87 @@
+from flask_smorest import Blueprint
+from flask import Response, request, jsonify, stream_with_context
+from handlers.export_handler import ExportHandler, FORMAT_NDJSON, FORMAT_CSV
+from helpers.enums import NotificationStatus, ProviderType
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+API_VERSION = os.getenv("API_VERSION", "/api/v1")
+export_blp = Blueprint("Exports", __name__, "Notification and DLQ Exports")
+export_handler = ExportHandler()
+
+MIMETYPES = {
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_CSV: "text/csv",
+}
+
+
+def _export_args():
+    fmt = request.args.get("format", FORMAT_NDJSON).lower()
+    if fmt not in MIMETYPES:
+        raise ValueError("format must be ndjson or csv")
+    fields = [field.strip() for field in request.args.get("fields", "").split(",") if field.strip()]
+    return fmt, fields or None
+
+
+def _int_arg(name: str):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer (epoch ms)")
+
+
+def _enum_arg(name: str, enum_cls):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return enum_cls(value.upper())
+    except ValueError:
+        raise ValueError(f"invalid {name}: {value}")
+
+
+def _gzip_response(chunks, fmt: str, name: str):
+    response = Response(stream_with_context(chunks), mimetype=MIMETYPES[fmt])
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Content-Disposition"] = f"attachment; filename={name}.{fmt}.gz"
+    return response
+
+
+@export_blp.route(f"{API_VERSION}/exports/notifications", methods=["GET"])
+def export_notifications():
+    try:
+        fmt, fields = _export_args()
+        chunks = export_handler.export_notifications(
+            fmt=fmt,
+            user_id=request.args.get("user_id"),
+            status=_enum_arg("status", NotificationStatus),
+            provider=_enum_arg("provider", ProviderType),
+            created_from=_int_arg("from"),
+            created_to=_int_arg("to"),
+            fields=fields,
+        )
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+    return _gzip_response(chunks, fmt, "notifications")
+
+
+@export_blp.route(f"{API_VERSION}/exports/dlq", methods=["GET"])
+def export_dlq():
+    resolved = request.args.get("resolved")
+    try:
+        fmt, fields = _export_args()
+        chunks = export_handler.export_dlq(
+            fmt=fmt,
+            resolved=None if resolved is None else resolved.lower() in ("1", "true", "yes"),
+            moved_from=_int_arg("from"),
+            moved_to=_int_arg("to"),
+            fields=fields,
+        )
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+    return _gzip_response(chunks, fmt, "dlq")
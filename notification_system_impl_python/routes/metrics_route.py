@@ -0,0 +1,77 @@
+from flask_smorest import Blueprint
+from flask import Response, request, jsonify
+from handlers.metrics_handler import MetricsHandler, GRANULARITY_HOUR
+from helpers.enums import MessageType
+from helpers.instrumentation import render_metrics
+from datetime import date, datetime, timezone
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+API_VERSION = os.getenv("API_VERSION", "/api/v1")
+metrics_blp = Blueprint("Metrics", __name__, "Delivery Metrics")
+metrics_handler = MetricsHandler()
+
+
+@metrics_blp.route(f"{API_VERSION}/metrics/providers", methods=["GET"])
+def provider_circuits():
+    try:
+        return jsonify({"status": True, "data": metrics_handler.provider_circuits()}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 500
+
+
+@metrics_blp.route(f"{API_VERSION}/metrics/delivery", methods=["GET"])
+def delivery_metrics():
+    today = datetime.now(timezone.utc).date()
+    try:
+        start = date.fromisoformat(request.args["from"]) if "from" in request.args else today
+        end = date.fromisoformat(request.args["to"]) if "to" in request.args else today
+    except ValueError:
+        return jsonify({"status": False, "error": "from and to must be dates (YYYY-MM-DD)"}), 400
+    message_type = request.args.get("message_type")
+    try:
+        message_type = MessageType(message_type.upper()) if message_type else None
+    except ValueError:
+        return jsonify({"status": False, "error": f"invalid message_type: {message_type}"}), 400
+    provider = request.args.get("provider")
+
+    try:
+        data = metrics_handler.delivery_totals(
+            start=start,
+            end=end,
+            granularity=request.args.get("granularity", GRANULARITY_HOUR).lower(),
+            provider=provider.upper() if provider else None,
+            message_type=message_type,
+        )
+        return jsonify({"status": True, "data": data}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@metrics_blp.route(f"{API_VERSION}/metrics/latency", methods=["GET"])
+def latency_metrics():
+    try:
+        window_seconds = int(request.args.get("window", 300))
+    except ValueError:
+        return jsonify({"status": False, "error": "window must be an integer (seconds)"}), 400
+    provider = request.args.get("provider")
+    message_type = request.args.get("message_type")
+
+    try:
+        data = metrics_handler.latency_percentiles(
+            window_seconds=max(1, window_seconds),
+            metric=request.args.get("metric"),
+            provider=provider.upper() if provider else None,
+            message_type=message_type.upper() if message_type else None,
+        )
+        return jsonify({"status": True, "data": data, "window_seconds": window_seconds}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@metrics_blp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -1,6 +1,7 @@
 from flask_smorest import Blueprint
-from flask import request, jsonify
+from flask import Response, request, jsonify
 from handlers.notification_handler import NotificationHandler
+from handlers.rate_limit_handler import RateLimitHandler
 from helpers.enums import MessageType, ProviderType, NotificationStatus
 from dotenv import load_dotenv
 import os
@@ -10,6 +11,7 @@ load_dotenv()
 API_VERSION = os.getenv("API_VERSION", "/api/v1")
 notification_blp = Blueprint("Notifications", __name__, "Notification Service")
 notification_handler = NotificationHandler()
+rate_limit_handler = RateLimitHandler()
 
 
 def _parse_enum(value, enum_cls):
@@ -27,8 +29,37 @@ def _parse_enum(value, enum_cls):
         return None
 
 
+def _rate_limited(cost: int):
+    """
+    Count the request (cost units) against the caller: the API key of
+    X-API-Key and its owner when the key is valid, else the client address.
+    Returns a 413 response for a request larger than the limit itself and a
+    429 response when over a limit
+    """
+    subjects = rate_limit_handler.subjects_for(request.headers.get("X-API-Key"), request.remote_addr, cost)
+    limit = rate_limit_handler.over_limit(subjects)
+    if limit is not None:
+        return jsonify({
+            "status": False,
+            "error": f"request of {cost} notifications exceeds the rate limit of {limit} per "
+                     f"{rate_limit_handler.window_ms // 1000}s, split it into smaller requests",
+        }), 413
+    allowed, retry_after = rate_limit_handler.check(subjects)
+    if allowed:
+        return None
+    response = jsonify({"status": False, "error": "rate limit exceeded", "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
 @notification_blp.route(f"{API_VERSION}/notifications", methods=["POST"])
 def create_notification():
+    try:
+        limited = _rate_limited(1)
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 500
+    if limited:
+        return limited
     data = request.get_json() or {}
     user_id = data.get("user_id")
     payload = data.get("payload")
@@ -37,6 +68,8 @@ def create_notification():
     idempotency_key = data.get("idempotency_key")
     send_at = data.get("send_at")
     max_retries = data.get("max_retries")
+    enqueue = bool(data.get("enqueue", False))
+    template = data.get("template")
 
     try:
         notification = notification_handler.create_notification(
@@ -47,6 +80,8 @@ def create_notification():
             idempotency_key=idempotency_key,
             send_at=send_at,
             max_retries=max_retries,
+            enqueue=enqueue,
+            template=template,
         )
         return jsonify({"status": True, "data": notification.to_dict()}), 201
     except Exception as e:
@@ -56,11 +91,23 @@ def create_notification():
 @notification_blp.route(f"{API_VERSION}/notifications/bulk", methods=["POST"])
 def bulk_create():
     items = request.get_json() or []
+    enqueue = request.args.get("enqueue", "false").lower() == "true"
+    # a bulk request costs one unit per item it creates
+    try:
+        limited = _rate_limited(len(items) if isinstance(items, list) else 1)
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 500
+    if limited:
+        return limited
     try:
-        created = notification_handler.bulk_create(items)
+        results = notification_handler.bulk_create(items, enqueue=enqueue)
+        summary = {"created": 0, "duplicate": 0, "invalid": 0, "suppressed": 0}
+        for result in results:
+            summary[result["status"]] += 1
         return jsonify({
             "status": True,
-            "data": [n.to_dict() for n in created],
+            "data": results,
+            "summary": summary,
         }), 201
     except Exception as e:
         return jsonify({"status": False, "error": str(e)}), 400
@@ -69,8 +116,9 @@ def bulk_create():
 @notification_blp.route(f"{API_VERSION}/notifications/<string:notification_id>", methods=["GET"])
 def get_notification(notification_id):
     try:
-        notif = notification_handler.get_notification(notification_id)
-        return jsonify({"status": True, "data": notif.to_dict()}), 200
+        data = notification_handler.get_notification_json(notification_id)
+        # the cached JSON is embedded as is instead of being decoded and re-encoded
+        return Response(f'{{"status":true,"data":{data}}}\n', status=200, mimetype="application/json")
     except Exception as e:
         return jsonify({"status": False, "error": str(e)}), 404
 
@@ -79,6 +127,8 @@ def get_notification(notification_id):
 def list_notifications():
     user_id = request.args.get("user_id")
     status = _parse_enum(request.args.get("status"), NotificationStatus)
+    cursor = request.args.get("cursor")
+    fields = [field.strip() for field in request.args.get("fields", "").split(",") if field.strip()]
     try:
         limit = int(request.args.get("limit", 20))
         offset = int(request.args.get("offset", 0))
@@ -86,15 +136,18 @@ def list_notifications():
         return jsonify({"status": False, "error": "limit and offset must be integers"}), 400
 
     try:
-        notifs = notification_handler.list_notifications(
+        notifs, next_cursor = notification_handler.list_notifications(
             user_id=user_id,
             status=status,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            fields=fields or None,
         )
         return jsonify({
             "status": True,
-            "data": [n.to_dict() for n in notifs],
+            "data": notifs,
+            "next_cursor": next_cursor,
         }), 200
     except Exception as e:
         return jsonify({"status": False, "error": str(e)}), 400
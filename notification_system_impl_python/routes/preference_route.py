@@ -0,0 +1,42 @@
+from flask_smorest import Blueprint
+from flask import request, jsonify
+from handlers.preference_handler import PreferenceHandler
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+API_VERSION = os.getenv("API_VERSION", "/api/v1")
+preference_blp = Blueprint("Preferences", __name__, "Notification Preferences")
+preference_handler = PreferenceHandler()
+
+PREFERENCE_FIELDS = ("enabled", "frequency_cap", "quiet_hours_start", "quiet_hours_end", "timezone")
+
+
+@preference_blp.route(f"{API_VERSION}/users/<string:user_id>/preferences", methods=["GET"])
+def list_preferences(user_id):
+    try:
+        preferences = preference_handler.list_preferences(user_id)
+        return jsonify({"status": True, "data": [preference.to_dict() for preference in preferences]}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@preference_blp.route(f"{API_VERSION}/users/<string:user_id>/preferences/<string:channel>", methods=["PUT"])
+def set_preference(user_id, channel):
+    data = request.get_json() or {}
+    changes = {field: data[field] for field in PREFERENCE_FIELDS if field in data}
+    try:
+        preference = preference_handler.set_preference(user_id, channel, **changes)
+        return jsonify({"status": True, "data": preference.to_dict()}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@preference_blp.route(f"{API_VERSION}/users/<string:user_id>/preferences/<string:channel>", methods=["DELETE"])
+def delete_preference(user_id, channel):
+    try:
+        preference_handler.delete_preference(user_id, channel)
+        return jsonify({"status": True, "data": None}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 404
@@ -0,0 +1,78 @@
+from flask_smorest import Blueprint
+from flask import request, jsonify
+from handlers.template_handler import TemplateHandler
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+API_VERSION = os.getenv("API_VERSION", "/api/v1")
+template_blp = Blueprint("Templates", __name__, "Notification Templates")
+template_handler = TemplateHandler()
+
+
+@template_blp.route(f"{API_VERSION}/templates", methods=["POST"])
+def create_template():
+    data = request.get_json() or {}
+    try:
+        template = template_handler.create_template(
+            name=data.get("name"),
+            message_type=data.get("message_type"),
+            body=data.get("body"),
+            subject=data.get("subject"),
+            created_by=request.headers.get("X-User-Id") or data.get("created_by"),
+        )
+        return jsonify({"status": True, "data": template.to_dict()}), 201
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@template_blp.route(f"{API_VERSION}/templates", methods=["GET"])
+def list_templates():
+    active = request.args.get("active")
+    try:
+        templates = template_handler.list_templates(
+            message_type=request.args.get("message_type"),
+            active=None if active is None else active.lower() == "true",
+        )
+        return jsonify({"status": True, "data": [template.to_dict() for template in templates]}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@template_blp.route(f"{API_VERSION}/templates/<string:name>", methods=["GET"])
+def get_template(name):
+    try:
+        return jsonify({"status": True, "data": template_handler.get_template(name).to_dict()}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 404
+
+
+@template_blp.route(f"{API_VERSION}/templates/<string:name>", methods=["PATCH"])
+def update_template(name):
+    data = request.get_json() or {}
+    changes = {field: data[field] for field in ("subject", "body", "is_active") if field in data}
+    try:
+        template = template_handler.update_template(name, **changes)
+        return jsonify({"status": True, "data": template.to_dict()}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
+
+
+@template_blp.route(f"{API_VERSION}/templates/<string:name>/render", methods=["POST"])
+def render_template(name):
+    """Preview one variable set ({"variables": {...}}) or render a campaign ({"variables": [...]})"""
+    variables = (request.get_json() or {}).get("variables")
+    try:
+        if isinstance(variables, list):
+            rendered = template_handler.render_many(name, variables)
+            return jsonify({
+                "status": True,
+                "data": rendered,
+                "summary": {"rendered": sum(1 for item in rendered if "payload" in item), "failed": sum(1 for item in rendered if "error" in item)},
+            }), 200
+        if not isinstance(variables, dict):
+            return jsonify({"status": False, "error": "variables must be an object or a list of objects"}), 400
+        return jsonify({"status": True, "data": template_handler.render(name, variables)}), 200
+    except Exception as e:
+        return jsonify({"status": False, "error": str(e)}), 400
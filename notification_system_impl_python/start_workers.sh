@@ -2,6 +2,12 @@
 
 echo "Starting Notification System Workers..."
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    # samples of earlier runs would be added to the new ones
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting Celery worker..."
 celery -A celery_app worker --loglevel=info --concurrency=4 &
 CELERY_WORKER_PID=$!
@@ -10,18 +16,38 @@ echo "Starting Celery Beat scheduler..."
 celery -A celery_app beat --loglevel=info &
 CELERY_BEAT_PID=$!
 
-echo "Starting Redis Queue Consumer..."
-python workers/consumer.py &
-CONSUMER_PID=$!
+echo "Starting Delay Queue Mover..."
+python -m workers.delay_mover &
+DELAY_MOVER_PID=$!
+
+if [ "$NOTIFICATION_CREATE_MODE" = "outbox" ]; then
+    echo "Starting Outbox Relay..."
+    python -m workers.outbox_relay &
+    OUTBOX_RELAY_PID=$!
+fi
+
+if [ "$DELIVERY_MODE" = "async" ]; then
+    echo "Starting asyncio Delivery Worker..."
+    python -m workers.async_worker &
+    CONSUMER_PID=$!
+else
+    echo "Starting Redis Queue Consumer..."
+    python workers/consumer.py &
+    CONSUMER_PID=$!
+fi
 
 echo ""
 echo "All workers started!"
 echo "  - Celery Worker PID: $CELERY_WORKER_PID"
 echo "  - Celery Beat PID: $CELERY_BEAT_PID"
 echo "  - Queue Consumer PID: $CONSUMER_PID"
+echo "  - Delay Queue Mover PID: $DELAY_MOVER_PID"
+if [ -n "$OUTBOX_RELAY_PID" ]; then
+    echo "  - Outbox Relay PID: $OUTBOX_RELAY_PID"
+fi
 echo ""
 echo "Press Ctrl+C to stop all workers"
 
-trap "kill $CELERY_WORKER_PID $CELERY_BEAT_PID $CONSUMER_PID; exit" INT TERM
+trap "kill $CELERY_WORKER_PID $CELERY_BEAT_PID $CONSUMER_PID $DELAY_MOVER_PID $OUTBOX_RELAY_PID; exit" INT TERM
 
 wait
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test the Redis-side delivery limits for Python implementation
+Runs against the Redis in REDIS_URL; no API server or workers needed, and
+the keys each test creates are removed afterwards
+
+Usage: python test_delivery_limits.py
+"""
+
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from configs.redis import get_redis_pool
+from handlers.preference_handler import CAP_KEY, ChannelPreference, PreferenceHandler
+from helpers.enums import MessageType
+from helpers.helpers import now_ms
+from providers.rate_limiter import RESERVATIONS_KEY, ProviderRateLimiter
+
+class Colors:
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    END = '\033[0m'
+
+def print_test(name):
+    print(f"\n{Colors.BLUE}{'='*70}{Colors.END}")
+    print(f"{Colors.YELLOW}{name}{Colors.END}")
+    print(f"{Colors.BLUE}{'='*70}{Colors.END}")
+
+def print_success(msg):
+    print(f"{Colors.GREEN}SUCCESS: {msg}{Colors.END}")
+
+def print_error(msg):
+    print(f"{Colors.RED}ERROR: {msg}{Colors.END}")
+
+def test_frequency_cap_counts_retries_once():
+    """A notification retried or deferred several times uses one unit of the daily cap"""
+    print_test("Frequency cap counts each notification once")
+
+    handler = PreferenceHandler()
+    user_id = f"test-cap-{uuid.uuid4().hex}"
+    preferences = {user_id: {MessageType.EMAIL: ChannelPreference(True, 2, None, None, "UTC")}}
+    day = datetime.now(timezone.utc).date().isoformat()
+    now = now_ms()
+
+    def consume(notification_id):
+        return handler.consume_frequency_caps([(notification_id, user_id, MessageType.EMAIL, now)], preferences)[0]
+
+    try:
+        for attempt in range(3):
+            assert consume("retried") is None, f"attempt {attempt + 1} of the retried notification was capped"
+        assert consume("second") is None, "the second notification of a cap of 2 was capped"
+        assert consume("third") is not None, "the third notification of a cap of 2 was sent"
+        assert consume("retried") is None, "a retry of a counted notification was capped"
+        print_success("3 attempts of one notification used 1 unit of a cap of 2")
+    finally:
+        handler.redis_client.delete(CAP_KEY.format(user_id=user_id, channel=MessageType.EMAIL.value, day=day))
+
+def test_rate_limit_slots_are_reserved():
+    """A caller arriving while throttled sends wait for their slots queues behind them"""
+    print_test("Provider rate limit reserves the slots it hands out")
+
+    limiter = ProviderRateLimiter(get_redis_pool())
+    key = f"ratelimit:provider:test:{uuid.uuid4().hex}"
+    now = now_ms()
+
+    try:
+        # 60/min: a burst of 60, then one token a second
+        first = limiter.acquire(key, 60, [f"first-{i}" for i in range(61)], now=now)
+        assert first[:60] == [None] * 60, "the burst was throttled"
+        waiting_slot = first[60]
+        assert waiting_slot == now + 1000, f"the first waiter got slot {waiting_slot}, expected {now + 1000}"
+
+        later = limiter.acquire(key, 60, ["later-0", "later-1"], now=now + 10)
+        assert later == [waiting_slot + 1000, waiting_slot + 2000], f"a later caller got slots {later}"
+
+        early = limiter.acquire(key, 60, ["first-60"], now=now + 500)
+        assert early == [waiting_slot], "a waiter coming back early lost its slot"
+
+        # at its slot the waiter goes without a new token; a newcomer queues behind every slot handed out
+        at_slot = limiter.acquire(key, 60, ["first-60", "newcomer"], now=waiting_slot)
+        assert at_slot[0] is None, "the waiter was throttled again at its own slot"
+        assert at_slot[1] == waiting_slot + 3000, f"the newcomer got slot {at_slot[1]}, expected {waiting_slot + 3000}"
+        print_success("waiters keep their slots and newcomers queue behind them")
+    finally:
+        limiter.redis_client.delete(key, RESERVATIONS_KEY.format(bucket=key))
+
+if __name__ == "__main__":
+    get_redis_pool().ping()
+    failed = 0
+    for test in (test_frequency_cap_counts_retries_once, test_rate_limit_slots_are_reserved):
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print_error(str(e))
+
+    if failed:
+        print(f"\n{Colors.RED}{failed} test(s) failed{Colors.END}\n")
+        sys.exit(1)
+    print(f"\n{Colors.GREEN}All tests passed!{Colors.END}\n")
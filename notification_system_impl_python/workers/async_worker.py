@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+asyncio Delivery Worker
+Drains the work queue and keeps hundreds of sends in flight per process,
+bounded by a semaphore per provider. Replaces the queue consumer and the
+Celery send workers for delivery; Celery beat and its periodic tasks still
+run as before.
+
+Usage: python -m workers.async_worker
+Tuning: ASYNC_MAX_IN_FLIGHT, ASYNC_PROVIDER_CONCURRENCY, ASYNC_THREAD_POOL_SIZE
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from configs.redis import get_redis_pool
+from handlers.delivery_handler import DeliveryHandler
+from helpers.instrumentation import NOTIFICATIONS_DISPATCHED
+from providers.http_client import async_http_available, close_async_http_client
+from providers.provider_factory import get_async_provider_map
+from providers.provider_registry import get_provider_registry
+from queues.queue_factory import get_notification_queue
+from workers.queue_drain import DispatchStats
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class AsyncDeliveryWorker:
+    def __init__(self, app, queue, max_in_flight: int = None, provider_concurrency: int = None):
+        self.app = app
+        self.queue = queue
+        self.registry = get_provider_registry()
+        self.providers = {}
+        self.router = None
+        self.generation = None
+        self.delivery = DeliveryHandler()
+        self.max_in_flight = max_in_flight or int(os.getenv('ASYNC_MAX_IN_FLIGHT', '500'))
+        self.provider_concurrency = provider_concurrency or int(os.getenv('ASYNC_PROVIDER_CONCURRENCY', '100'))
+        self.semaphores = {}
+        self.batch_slots = asyncio.Semaphore(max(1, self.max_in_flight // queue.batch_size))
+        # Flask-SQLAlchemy sessions are not thread-safe, so all DB work runs on one thread
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-worker-db')
+        self.stats = DispatchStats(queue)
+        self.tasks = set()
+        self.running = True
+
+    def stop(self):
+        logger.info("Received shutdown signal, finishing in-flight sends...")
+        self.running = False
+
+    async def _run_db(self, fn, *args):
+        def call():
+            with self.app.app_context():
+                return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, call)
+
+    def _refresh_providers(self):
+        # runs on the DB thread: the registry may check ProviderConfig
+        providers = self.registry.get_providers()
+        if self.registry.generation != self.generation:
+            self.providers = get_async_provider_map(providers)
+            self.router = self.registry.router
+            self.generation = self.registry.generation
+
+    async def run(self):
+        await self._run_db(self._refresh_providers)
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_THREAD_POOL_SIZE', '64'))))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        logger.info(
+            f"Async delivery worker started: queue {self.queue.backend_name()}, "
+            f"max in flight {self.max_in_flight}, providers {[p.value for p in self.providers]}"
+        )
+        try:
+            while self.running:
+                await self.batch_slots.acquire()
+                try:
+                    batch = await asyncio.to_thread(self.queue.drain)
+                except Exception as e:
+                    self.batch_slots.release()
+                    logger.error(f"Error draining queue: {e}")
+                    await asyncio.sleep(1)
+                    continue
+
+                if not batch:
+                    self.batch_slots.release()
+                    self.stats.record(0)
+                    continue
+
+                task = asyncio.create_task(self._process(batch))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+        finally:
+            await close_async_http_client()
+            self.db_executor.shutdown(wait=True)
+            logger.info(f"Async delivery worker stopped. Total processed: {self.stats.total}")
+
+    async def _process(self, batch):
+        try:
+            notification_ids = [notification_id for _, notification_id in batch]
+            await self._deliver(notification_ids)
+            await asyncio.to_thread(self.queue.ack, [message_id for message_id, _ in batch])
+            self.stats.record(len(notification_ids))
+            NOTIFICATIONS_DISPATCHED.inc(len(notification_ids))
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(batch)} notifications, requeueing it: {e}")
+            try:
+                # claim() skips notifications of the batch that were already sent
+                await asyncio.to_thread(self.queue.requeue, batch)
+            except Exception as requeue_error:
+                logger.error(
+                    f"Failed to requeue {[notification_id for _, notification_id in batch]}: {requeue_error}"
+                )
+            # keep a failing database or Redis from being hit in a tight loop
+            await asyncio.sleep(1)
+        finally:
+            self.batch_slots.release()
+
+    async def _deliver(self, notification_ids):
+        outcomes = {
+            notification_id: {'status': 'missing', 'message': 'notification not found'}
+            for notification_id in notification_ids
+        }
+        await self._run_db(self._refresh_providers)
+        notifications = await self._run_db(self.delivery.claim, notification_ids, outcomes)
+        if notifications:
+            results = await self._route(notifications)
+            await self._run_db(self.delivery.record, list(zip(notifications, results)), outcomes)
+        return outcomes
+
+    async def _route(self, notifications):
+        """
+        Same failover rounds as ProviderRouter.send_batch, with each round's
+        sends in flight together; the breaker's Redis calls run off the loop
+        """
+        router = self.router
+        results = [None] * len(notifications)
+        tried = [set() for _ in notifications]
+        pending = list(range(len(notifications)))
+
+        while pending:
+            calls = []
+            groups = await asyncio.to_thread(router.plan, notifications, pending, tried, results)
+            for provider_type, indexes in groups.items():
+                provider = self.providers[provider_type]
+                position = {id(notifications[index]): index for index in indexes}
+                for batch in provider.batches([notifications[index] for index in indexes]):
+                    calls.append((provider_type, [position[id(notification)] for notification in batch]))
+
+            call_results = await asyncio.gather(*(
+                self._send(provider_type, [notifications[index] for index in indexes])
+                for provider_type, indexes in calls
+            ))
+            pending = []
+            for (provider_type, indexes), (batch_results, elapsed) in zip(calls, call_results):
+                pending.extend(await asyncio.to_thread(router.settle, provider_type, indexes, batch_results, elapsed, results))
+
+        return router.finish(notifications, results)
+
+    async def _send(self, provider_type, notifications):
+        provider = self.providers[provider_type]
+        semaphore = self.semaphores.setdefault(provider_type, asyncio.Semaphore(self.provider_concurrency))
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                batch_results = await provider.send_batch(notifications)
+            except Exception as e:
+                batch_results = [{'success': False, 'message': f'{provider.provider_name()} send failed: {e}'} for _ in notifications]
+            return batch_results, time.perf_counter() - start
+
+
+def main():
+    if not async_http_available():
+        # without httpx every HTTP send would block a thread of the default
+        # executor, which caps the sends in flight far below ASYNC_MAX_IN_FLIGHT
+        raise SystemExit("httpx is not installed; install requirements.txt (httpx[http2]) to run the asyncio worker")
+    app = create_app()
+    queue = get_notification_queue(get_redis_pool())
+    asyncio.run(AsyncDeliveryWorker(app, queue).run())
+
+
+if __name__ == '__main__':
+    main()
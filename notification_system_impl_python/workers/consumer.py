@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 """
 Redis Queue Consumer
-Continuously consumes from notification:queue and dispatches to Celery workers
+Continuously drains notification:queue in batches and dispatches to Celery workers
+
+Batch size and linger time come from QUEUE_BATCH_SIZE and QUEUE_MAX_LINGER_MS,
+the queue backend (list or stream) from NOTIFICATION_QUEUE_BACKEND
 """
 
 import time
 import logging
 from configs.redis import get_redis_pool
-from workers.tasks import send_notification
-import json
+from workers.tasks import send_notification_batch
+from queues.queue_factory import get_notification_queue
+from workers.queue_drain import DispatchStats, drain_and_dispatch
 import signal
 import sys
 
@@ -38,33 +42,22 @@ def consume_queue():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    processed_count = 0
+    queue = get_notification_queue(redis_client)
+    stats = DispatchStats(queue)
+    logger.info(
+        f"Queue backend {queue.backend_name()}, batch size {queue.batch_size}, "
+        f"max linger {queue.max_linger_ms}ms"
+    )
 
     while running:
         try:
-            item = redis_client.brpop('notification:queue', timeout=1)
-
-            if item:
-                _, payload = item
-                data = json.loads(payload)
-                notification_id = data.get('id')
-                action = data.get('action', 'send')
-
-                if notification_id and action == 'send':
-                    send_notification.delay(notification_id)
-                    processed_count += 1
-
-                    if processed_count % 10 == 0:
-                        logger.info(f"Dispatched {processed_count} notifications")
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in queue: {e}")
+            stats.record(drain_and_dispatch(queue, send_notification_batch))
 
         except Exception as e:
             logger.error(f"Error consuming queue: {e}")
             time.sleep(1)
 
-    logger.info(f"Consumer stopped. Total processed: {processed_count}")
+    logger.info(f"Consumer stopped. Total processed: {stats.total}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Delay Queue Mover
+Moves retries and scheduled notifications from the notification:retries
+sorted set to the work queue as soon as they are due
+
+Sleeps until the earliest due time, but never longer than
+DELAY_QUEUE_POLL_MS so newly scheduled items are picked up; the
+process_retry_queue beat task still runs as a backstop and DB backfill
+"""
+
+import time
+import logging
+import os
+from configs.redis import get_redis_pool
+from queues.queue_factory import get_delay_queue
+from helpers.helpers import now_ms
+import signal
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+running = True
+
+
+def signal_handler(sig, frame):
+    """Handle shutdown signals"""
+    global running
+    logger.info("Received shutdown signal, stopping delay queue mover...")
+    running = False
+
+
+def move_forever():
+    """Main mover loop"""
+    global running
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    delay_queue = get_delay_queue(get_redis_pool())
+    poll_ms = int(os.getenv('DELAY_QUEUE_POLL_MS', '100'))
+    total = 0
+    logger.info(f"Starting delay queue mover (poll {poll_ms}ms, batch {delay_queue.batch_size})")
+
+    while running:
+        try:
+            moved = delay_queue.move_due()
+            if moved:
+                total += moved
+                logger.info(f"Moved {moved} due notifications to the work queue")
+
+            next_due_at = delay_queue.next_due_at()
+            wait_ms = poll_ms if next_due_at is None else min(poll_ms, max(0, next_due_at - now_ms()))
+            if wait_ms:
+                time.sleep(wait_ms / 1000)
+
+        except Exception as e:
+            logger.error(f"Error moving due notifications: {e}")
+            time.sleep(1)
+
+    logger.info(f"Delay queue mover stopped. Total moved: {total}")
+
+
+if __name__ == '__main__':
+    move_forever()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Outbox Relay
+Publishes notifications created in outbox mode (NOTIFICATION_CREATE_MODE=outbox)
+from the notification_outbox table to the work queue or the delay queue
+
+Relays back to back while the outbox is full and sleeps OUTBOX_POLL_MS
+once it is drained; the relay_outbox beat task runs as a backstop
+"""
+
+import time
+import logging
+import os
+from app import create_app
+from handlers.outbox_handler import OutboxHandler
+import signal
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+running = True
+
+
+def signal_handler(sig, frame):
+    """Handle shutdown signals"""
+    global running
+    logger.info("Received shutdown signal, stopping outbox relay...")
+    running = False
+
+
+def relay_forever():
+    """Main relay loop"""
+    global running
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    app = create_app()
+    poll_ms = int(os.getenv('OUTBOX_POLL_MS', '50'))
+    total = 0
+
+    with app.app_context():
+        handler = OutboxHandler()
+        logger.info(f"Starting outbox relay (poll {poll_ms}ms, batch {handler.batch_size})")
+
+        while running:
+            try:
+                relayed = handler.relay_batch()
+                if relayed:
+                    total += relayed
+                    logger.info(f"Relayed {relayed} notifications from the outbox")
+                if relayed < handler.batch_size:
+                    time.sleep(poll_ms / 1000)
+
+            except Exception as e:
+                logger.error(f"Error relaying outbox: {e}")
+                time.sleep(1)
+
+    logger.info(f"Outbox relay stopped. Total relayed: {total}")
+
+
+if __name__ == '__main__':
+    relay_forever()
@@ -0,0 +1,79 @@
+"""
+Batch draining of the notification work queue
+Shared by workers/consumer.py and workers.tasks.consume_notification_queue
+"""
+
+import logging
+import os
+import time
+from typing import List
+from helpers.instrumentation import NOTIFICATIONS_DISPATCHED
+from queues.base_queue import NotificationQueue
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch_batch(batch_task, notification_ids: List[str]) -> int:
+    """
+    Publish the ids as send_notification_batch tasks of at most
+    DELIVERY_BATCH_SIZE ids each. Queue items carry no channel, so pushes
+    share these batches and an FCM multicast never spans two of them.
+    """
+    if not notification_ids:
+        return 0
+    batch_size = int(os.getenv('DELIVERY_BATCH_SIZE', '100'))
+    with batch_task.app.producer_or_acquire() as producer:
+        for start in range(0, len(notification_ids), batch_size):
+            batch_task.apply_async((notification_ids[start:start + batch_size],), producer=producer)
+    return len(notification_ids)
+
+
+def drain_and_dispatch(queue: NotificationQueue, batch_task, block: bool = True) -> int:
+    """Drain one batch, hand it to Celery and acknowledge it on the queue"""
+    batch = queue.drain(block=block)
+    if not batch:
+        return 0
+    try:
+        dispatched = dispatch_batch(batch_task, [notification_id for _, notification_id in batch])
+    except Exception:
+        queue.requeue(batch)
+        raise
+    queue.ack([message_id for message_id, _ in batch])
+    NOTIFICATIONS_DISPATCHED.inc(dispatched)
+    return dispatched
+
+
+class DispatchStats:
+    """Periodic dispatch rate, queue depth and pending work reporting"""
+
+    def __init__(self, queue: NotificationQueue, interval_seconds: float = None):
+        self.queue = queue
+        self.interval_seconds = interval_seconds or float(os.getenv('QUEUE_STATS_INTERVAL_SECONDS', '10'))
+        self.total = 0
+        self._window_count = 0
+        self._window_start = time.monotonic()
+
+    def record(self, count: int):
+        self.total += count
+        self._window_count += count
+        elapsed = time.monotonic() - self._window_start
+        if elapsed >= self.interval_seconds:
+            self.report(elapsed)
+
+    def report(self, elapsed: float):
+        try:
+            depth = self.queue.depth()
+            pending = self.queue.pending_summary()
+        except Exception as e:
+            logger.error(f"Failed to read queue stats: {e}")
+            depth, pending = -1, {}
+        rate = self._window_count / elapsed if elapsed else 0.0
+        message = (
+            f"Dispatch rate {rate:.1f}/s ({self._window_count} in {elapsed:.1f}s), "
+            f"total {self.total}, queue depth {depth}"
+        )
+        if pending:
+            message += f", pending {pending['pending']} {pending['consumers']}"
+        logger.info(message)
+        self._window_count = 0
+        self._window_start = time.monotonic()
@@ -1,18 +1,60 @@
 from celery_app import celery_app
+from celery.exceptions import Retry
+from celery.signals import worker_process_init, worker_process_shutdown
 from configs.db import db
 from configs.redis import get_redis_pool
-from handlers.notification_handler import NotificationHandler
-from handlers.notification_provider_handler import NotificationHandler as ProviderHandler
+from handlers.delivery_handler import DeliveryHandler
+from handlers.metrics_handler import MetricsHandler
+from handlers.outbox_handler import OutboxHandler
+from handlers.rate_limit_handler import RateLimitHandler
 from handlers.retry_handlers import RetryHandler
-from handlers.dlq_handler import DLQHandler
-from models.notification import Notification
-from helpers.enums import NotificationStatus
-from helpers.helpers import now_ms
-import json
+from helpers.instrumentation import mark_process_dead
+from providers.http_client import get_http_client
+from providers.provider_registry import get_provider_registry
+from providers.smtp_pool import get_ssl_context
+from queues.queue_factory import get_notification_queue
+from workers.queue_drain import drain_and_dispatch
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+_app_context = None
+
+
+@worker_process_init.connect
+def warm_worker_process(**kwargs):
+    """
+    Prepare a freshly forked worker process before it takes its first task:
+    push an app context for the process lifetime, open the DB and Redis
+    connections, build the SSL context, HTTP client and provider registry
+    """
+    global _app_context
+    from app import create_app
+    from sqlalchemy import text
+
+    app = create_app()
+    _app_context = app.app_context()
+    _app_context.push()
+
+    try:
+        db.session.execute(text("SELECT 1"))
+        db.session.commit()
+        get_redis_pool().ping()
+        get_ssl_context()
+        get_http_client()
+        get_provider_registry().get_providers()
+        logger.info(f"Worker process {os.getpid()} warmed up")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Worker warm-up incomplete, continuing lazily: {str(e)}")
+
+
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    """Tell the multiprocess metrics registry this pool process is gone"""
+    mark_process_dead(pid or os.getpid())
+
 
 @celery_app.task(name='workers.tasks.send_notification', bind=True, max_retries=3)
 def send_notification(self, notification_id: str):
@@ -25,45 +67,33 @@ def send_notification(self, notification_id: str):
     try:
         logger.info(f"Processing notification {notification_id}")
 
-        notification = Notification.query.filter_by(id=notification_id).first()
+        outcome = DeliveryHandler().deliver([notification_id])[notification_id]
 
-        if not notification:
+        if outcome['status'] == 'missing':
             logger.error(f"Notification {notification_id} not found")
             return {'status': 'error', 'message': 'notification not found'}
 
-        if notification.status in [NotificationStatus.SENT, NotificationStatus.CANCELLED]:
-            logger.info(f"Notification {notification_id} already {notification.status.value}")
-            return {'status': 'skipped', 'message': f'already {notification.status.value}'}
+        if outcome['status'] == 'skipped':
+            logger.info(f"Notification {notification_id} {outcome['message']}")
+            return {'status': 'skipped', 'message': outcome['message']}
 
-        notification.attempt_count += 1
-        notification.last_attempted = now_ms()
-        db.session.commit()
-
-        provider_handler = ProviderHandler()
-        result = provider_handler.send_notification(notification)
-
-        if result.get('success'):
-            notification.status = NotificationStatus.SENT
-            notification.sent_at = now_ms()
-            notification.provider_response = json.dumps(result.get('response', {}))
-            db.session.commit()
+        if outcome['status'] == 'suppressed':
+            logger.info(f"Notification {notification_id} suppressed: {outcome['message']}")
+            return {'status': 'suppressed', 'message': outcome['message']}
 
+        if outcome['status'] == 'success':
             logger.info(f"Notification {notification_id} sent successfully")
             return {'status': 'success', 'notification_id': notification_id}
 
-        else:
-            error_message = result.get('message', 'Unknown error')
-            logger.error(f"Notification {notification_id} failed: {error_message}")
-
-            retry_handler = RetryHandler()
-            retry_handler.schedule_retry(
-                notification_id=notification_id,
-                attempts=notification.attempt_count,
-                error_message=error_message
-            )
+        if outcome['status'] == 'deferred':
+            logger.info(f"Notification {notification_id} deferred: {outcome['message']}")
+            return {'status': 'deferred', 'message': outcome['message'], 'retry_at': outcome['retry_at']}
 
-            return {'status': 'failed', 'message': error_message, 'will_retry': True}
+        logger.error(f"Notification {notification_id} failed: {outcome['message']}")
+        return {'status': 'failed', 'message': outcome['message'], 'will_retry': outcome['will_retry']}
 
+    except Retry:
+        raise
     except Exception as e:
         logger.error(f"Error processing notification {notification_id}: {str(e)}")
         db.session.rollback()
@@ -75,31 +105,59 @@ def send_notification(self, notification_id: str):
             return {'status': 'error', 'message': str(e)}
 
 
-@celery_app.task(name='workers.tasks.consume_notification_queue')
-def consume_notification_queue():
+@celery_app.task(name='workers.tasks.send_notification_batch', bind=True, max_retries=3)
+def send_notification_batch(self, notification_ids: list):
     """
-    Consume notifications from Redis queue and dispatch to workers
+    Send a batch of notifications with one load query, one attempt UPDATE,
+    one send per provider group and one bulk status UPDATE
+
+    Args:
+        notification_ids: IDs of the notifications to send
     """
     try:
-        redis_client = get_redis_pool()
-        processed = 0
+        logger.info(f"Processing batch of {len(notification_ids)} notifications")
 
-        while True:
-            item = redis_client.brpop('notification:queue', timeout=1)
+        outcomes = DeliveryHandler().deliver(notification_ids)
 
-            if not item:
-                break
+        summary = {'success': 0, 'failed': 0, 'deferred': 0, 'suppressed': 0, 'skipped': 0, 'missing': 0}
+        for outcome in outcomes.values():
+            summary[outcome['status']] += 1
+        logger.info(
+            f"Batch done: {summary['success']} sent, {summary['failed']} failed, {summary['deferred']} deferred, "
+            f"{summary['suppressed']} suppressed, {summary['skipped']} skipped, {summary['missing']} missing"
+        )
 
-            _, payload = item
-            data = json.loads(payload)
-            notification_id = data.get('id')
+        return summary
 
-            if notification_id:
-                send_notification.delay(notification_id)
-                processed += 1
+    except Retry:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing notification batch: {str(e)}")
+        db.session.rollback()
 
-            if processed >= 100:
+        try:
+            raise self.retry(exc=e, countdown=60)
+        except self.MaxRetriesExceededError:
+            logger.error(f"Max retries exceeded for batch of {len(notification_ids)} notifications")
+            return {'status': 'error', 'message': str(e)}
+
+
+@celery_app.task(name='workers.tasks.consume_notification_queue')
+def consume_notification_queue():
+    """
+    Consume notifications from Redis queue and dispatch to workers
+    Drains in batches until the queue is empty or QUEUE_DRAIN_MAX_ITEMS is reached
+    """
+    try:
+        queue = get_notification_queue(get_redis_pool())
+        max_items = int(os.getenv('QUEUE_DRAIN_MAX_ITEMS', '10000'))
+        processed = 0
+
+        while processed < max_items:
+            dispatched = drain_and_dispatch(queue, send_notification_batch, block=False)
+            if not dispatched:
                 break
+            processed += dispatched
 
         logger.info(f"Dispatched {processed} notifications to workers")
         return {'processed': processed}
@@ -112,7 +170,8 @@ def consume_notification_queue():
 @celery_app.task(name='workers.tasks.process_retry_queue')
 def process_retry_queue():
     """
-    Process notifications due for retry
+    Backstop for workers/delay_mover.py: move due notifications from the
+    delay queue and backfill overdue rows the delay queue missed
     Runs periodically (every 60 seconds)
     """
     try:
@@ -145,6 +204,58 @@ def cleanup_old_retries():
         return {'error': str(e)}
 
 
+@celery_app.task(name='workers.tasks.flush_rate_limits')
+def flush_rate_limits():
+    """
+    Write the API request counts collected in Redis to rate_limits
+    Runs periodically (every 10 seconds)
+    """
+    try:
+        written = RateLimitHandler().flush_pending()
+
+        logger.info(f"Flushed {written} rate limit counters")
+        return {'written': written}
+
+    except Exception as e:
+        logger.error(f"Error flushing rate limits: {str(e)}")
+        return {'error': str(e)}
+
+
+@celery_app.task(name='workers.tasks.rollup_delivery_metrics')
+def rollup_delivery_metrics():
+    """
+    Write the delivery counters workers collected in Redis to notification_metrics
+    Runs periodically (every 30 seconds)
+    """
+    try:
+        written = MetricsHandler().rollup_delivery_metrics()
+
+        logger.info(f"Rolled up {written} delivery metric buckets")
+        return {'written': written}
+
+    except Exception as e:
+        logger.error(f"Error rolling up delivery metrics: {str(e)}")
+        return {'error': str(e)}
+
+
+@celery_app.task(name='workers.tasks.relay_outbox')
+def relay_outbox():
+    """
+    Publish notifications left in the outbox to Redis
+    Runs periodically (every 5 seconds, outbox mode only) as a backstop for workers/outbox_relay.py
+    """
+    try:
+        relayed = OutboxHandler().relay_all()
+
+        if relayed:
+            logger.info(f"Relayed {relayed} notifications from the outbox")
+        return {'relayed': relayed}
+
+    except Exception as e:
+        logger.error(f"Error relaying outbox: {str(e)}")
+        return {'error': str(e)}
+
+
 @celery_app.task(name='workers.tasks.process_dlq_notifications')
 def process_dlq_notifications():
     """
@@ -170,13 +281,15 @@ def process_dlq_notifications():
 def bulk_send_notifications(notification_ids: list):
     """
     Send multiple notifications in bulk
+    Splits the ids into send_notification_batch tasks of DELIVERY_BATCH_SIZE
 
     Args:
         notification_ids: List of notification IDs to send
     """
+    batch_size = int(os.getenv('DELIVERY_BATCH_SIZE', '100'))
     results = []
-    for notification_id in notification_ids:
-        result = send_notification.delay(notification_id)
+    for start in range(0, len(notification_ids), batch_size):
+        result = send_notification_batch.delay(notification_ids[start:start + batch_size])
         results.append(result.id)
 
-    return {'task_ids': results, 'count': len(results)}
+    return {'task_ids': results, 'count': len(notification_ids)}